@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the time to resolve a small slice on the blocks of an array for
+an increasing number of blocks, scanning the list of blocks against the
+binary search of a BlockMap, and the memory used by both representations.
+Runs without MPI.
+
+    python3 bench/blockmap.py repeat
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from blockmap import BlockMap
+from master import split_blocks
+
+block_counts = [10, 100, 1000, 10000, 100000]
+# blocks of the array, striped over the slaves
+stripe_unit  = 64
+nb_slaves    = 16
+
+
+def stripes(count):
+    """
+    Builds the blocks of an array striped over the slaves
+
+    Params:
+        :count  -- int: number of blocks
+
+    Return:
+        :blocks -- [(int, int, int)]: [(rank, start, offset)]
+    """
+
+    return [(2 + i % nb_slaves, i * stripe_unit, stripe_unit) for i in range(count)]
+
+
+def list_bytes(blocks):
+    """
+    Gets the memory used by a list of block tuples
+
+    Params:
+        :blocks -- [(int, int, int)]: [(rank, start, offset)]
+
+    Return:
+        :nbytes -- int: bytes of the list, the tuples and the integers
+    """
+
+    nbytes = sys.getsizeof(blocks)
+    for block in blocks:
+        nbytes += sys.getsizeof(block) + sum(sys.getsizeof(value) for value in block)
+    return nbytes
+
+
+def resolve(blocks, starts, width):
+    """
+    Splits small slices on the blocks
+
+    Params:
+        :blocks -- BlockMap or [(int, int, int)]: blocks of the array
+        :starts -- ndarray: first index of each slice
+        :width  -- int: number of elements per slice
+
+    Return:
+        :usec   -- float: mean time per slice in microseconds
+    """
+
+    begin = time.perf_counter()
+    for start in starts.tolist():
+        split_blocks(blocks, [0, start, start + width, 1])
+    return (time.perf_counter() - begin) / len(starts) * 1e6
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Format: {} repeat".format(sys.argv[0]))
+        exit(1)
+
+    repeat = int(sys.argv[1])
+    random = np.random.RandomState(0)
+
+    print("{:>8} {:>10} {:>10} {:>12} {:>12} {:>10}".format("blocks", "list us", "map us",
+        "list bytes", "map bytes", "build ms"))
+    for count in block_counts:
+        blocks = stripes(count)
+        begin  = time.perf_counter()
+        mapped = BlockMap(blocks)
+        build  = (time.perf_counter() - begin) * 1e3
+        starts = random.randint(count * stripe_unit - 16, size=repeat)
+        assert all(split_blocks(blocks, [0, start, start + 16, 1]) == mapped.split([0, start, start + 16, 1])
+                   for start in starts[:100].tolist())
+        print("{:>8} {:>10.2f} {:>10.2f} {:>12} {:>12} {:>10.2f}".format(count,
+            resolve(blocks, starts[:max(10, repeat * 100 // count)], 16), resolve(mapped, starts, 16),
+            list_bytes(blocks), mapped.nbytes, build))
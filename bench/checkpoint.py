@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Measures memory.checkpoint, full and incremental after changing 1% of the
+array, against re-ingesting the data with memory.load, then the time to
+restore the memory with launch(..., restore=directory) in a second run.
+
+    for n in 1000000 10000000 50000000; do
+        mpirun -n 6 python3 bench/checkpoint.py save $n directory
+        mpirun -n 6 python3 bench/checkpoint.py restore $n directory
+    done
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+import binfile
+
+
+def timed(function, *args):
+    """
+    Calls a function and measures its duration
+
+    Params:
+        :function -- function: function to call
+        :args     -- (...): arguments of the function
+
+    Return:
+        :elapsed  -- float: seconds spent in the call
+    """
+
+    begin = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - begin
+
+
+def row(method, size, elapsed):
+    """
+    Prints a line of the result table
+
+    Params:
+        :method  -- str: measured operation
+        :size    -- int: number of elements of the array
+        :elapsed -- float: seconds spent
+    """
+
+    print("{:<12} {:>10} {:>10.3f} {:>10.3f}".format(method, size, elapsed, size * 8 / 1e9 / elapsed))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("save", "restore"):
+        print("Format: {} save|restore size directory".format(sys.argv[0]))
+        exit(1)
+
+    mode       = sys.argv[1]
+    size       = int(sys.argv[2])
+    directory  = sys.argv[3]
+    nb_slaves  = MPI.COMM_WORLD.Get_size() - 2
+    capacity   = size // nb_slaves + 1
+    checkpoint = os.path.join(directory, "checkpoint")
+
+    if (mode == "restore"):
+        begin   = time.perf_counter()
+        memory  = allocator.launch(capacity, 0, direct=True, restore=checkpoint)
+        elapsed = time.perf_counter() - begin
+        print("{:<12} {:>10} {:>10} {:>10}".format("method", "size", "seconds", "GB/s"))
+        row("restore", size, elapsed)
+        memory.close()
+        exit(0)
+
+    memory = allocator.launch(capacity, 0, direct=True)
+    data   = os.path.join(directory, "bench.bin")
+    binfile.save(data, np.random.RandomState(0).randint(size, size=size))
+
+    print("{:<12} {:>10} {:>10} {:>10}".format("method", "size", "seconds", "GB/s"))
+    begin = time.perf_counter()
+    key   = memory.load(data)
+    row("load", size, time.perf_counter() - begin)
+    row("full", size, timed(memory.checkpoint, checkpoint))
+
+    # 10 scattered updates touching 1% of the elements
+    for i in range(0, size, size // 10 + 1):
+        memory[key, i: min(size, i + size // 1000 + 1)] = -1
+    row("incremental", size, timed(memory.checkpoint, checkpoint, True))
+
+    os.remove(data)
+    memory.close()
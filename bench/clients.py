@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the aggregate get/set throughput of several clients sharing one
+array. Each client works on its own part of the array, the first client
+allocates it and shares the key with the others.
+
+    for c in 1 2 4 8; do
+        mpirun --oversubscribe -n $((c + 5)) python3 bench/clients.py $c size chunk repeat direct
+    done
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def run(memory, key, start, stop, chunk, repeat):
+    """
+    Sets then gets [start:stop] by chunks repeat times
+
+    Params:
+        :memory -- Manager: memory manager
+        :key    -- int: key of the shared array
+        :start  -- int: first index of the client part
+        :stop   -- int: last index of the client part (excluded)
+        :chunk  -- int: number of elements per request
+        :repeat -- int: number of passes
+
+    Return:
+        :set    -- float: seconds spent setting
+        :get    -- float: seconds spent getting
+    """
+
+    array = np.arange(start, stop, dtype=np.int64)
+    memory.clients.Barrier()
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(start, stop, chunk):
+            memory[key, i: min(i + chunk, stop)] = array[i - start: i - start + chunk]
+    memory.clients.Barrier()
+    elapsed_set = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(start, stop, chunk):
+            memory[key, i: min(i + chunk, stop)]
+    memory.clients.Barrier()
+    elapsed_get = time.perf_counter() - begin
+    return elapsed_set, elapsed_get
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 6:
+        print("Format: {} clients size chunk repeat direct".format(sys.argv[0]))
+        exit(1)
+
+    clients   = int(sys.argv[1])
+    size      = int(sys.argv[2])
+    chunk     = int(sys.argv[3])
+    repeat    = int(sys.argv[4])
+    direct    = bool(int(sys.argv[5]))
+    nb_slaves = MPI.COMM_WORLD.Get_size() - clients - 1
+    memory    = allocator.launch(max(chunk, size // nb_slaves + 1), 0, direct, clients=clients)
+
+    rank = memory.clients.Get_rank()
+    key  = memory.malloc(size) if (rank == 0) else None
+    key  = memory.clients.bcast(key, root=0)
+    part = size // clients
+    start, stop = rank * part, size if (rank == clients - 1) else (rank + 1) * part
+
+    elapsed_set, elapsed_get = run(memory, key, start, stop, chunk, repeat)
+    mbytes   = size * 8 * repeat / 1e6
+    requests = (size // chunk + clients) * repeat
+    if (rank == 0):
+        print("{:>8} {:>8} {:>8} {:>10} {:>10} {:>10} {:>10}".format("clients", "slaves",
+            "direct", "set MB/s", "get MB/s", "set req/s", "get req/s"))
+        print("{:>8} {:>8} {:>8} {:>10.1f} {:>10.1f} {:>10.0f} {:>10.0f}".format(clients,
+            nb_slaves, str(direct), mbytes / elapsed_set, mbytes / elapsed_get,
+            requests / elapsed_set, requests / elapsed_get))
+    memory.close()
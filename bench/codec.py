@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the bytes sent by the slaves and the throughput of gets and sets of
+one array with each codec, for sorted keys, small counters, small counters
+stored big-endian, random integers and floats.
+
+    mpirun -n 6 python3 bench/codec.py size repeat direct
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+from codec import codecs
+
+
+def datasets(size):
+    """
+    Builds the arrays measured
+
+    Params:
+        :size     -- int: number of elements of each array
+
+    Return:
+        :datasets -- [(str, ndarray)]: [(name, elements)]
+    """
+
+    random = np.random.RandomState(0)
+    return [("sorted", np.sort(random.randint(0, 10**12, size=size))),
+            ("counters", random.randint(0, 1000, size=size)),
+            ("swapped", random.randint(0, 1000, size=size).astype(">i4")),
+            ("random", random.randint(-2**62, 2**62, size=size)),
+            ("float", random.rand(size))]
+
+
+def timed(function, repeat):
+    """
+    Measures the mean duration of a call
+
+    Params:
+        :function -- function: function called without arguments
+        :repeat   -- int: number of calls
+
+    Return:
+        :elapsed  -- float: mean seconds per call
+    """
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - begin) / repeat
+
+
+def bytes_out(memory):
+    """
+    Gets the bytes sent by all slaves since their launch
+
+    Params:
+        :memory -- Manager: memory manager
+
+    Return:
+        :nbytes -- int: bytes of get responses
+    """
+
+    return sum(slave["bytes_out"] for slave in memory.stats()["slaves"])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} size repeat direct".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    direct    = bool(int(sys.argv[3]))
+    memory    = allocator.launch(size, 0, direct, policy="round_robin", stripe_unit=65536)
+
+    print("{:<9} {:<12} {:>8} {:>10} {:>10}".format("data", "codec", "wire %", "get MB/s", "set MB/s"))
+    for name, array in datasets(size):
+        key = memory.malloc(size, array.dtype)
+        # raw buffers of MPI are in native byte order, swapped arrays are only sent encoded
+        for codec in ((None, ) if (array.dtype.isnative) else ()) + codecs:
+            memory.set_codec(key, codec)
+            memory[key] = array
+            before = bytes_out(memory)
+            result = memory[key][0]
+            wire   = bytes_out(memory) - before
+            assert np.array_equal(result, array)
+            get = timed(lambda: memory[key], repeat)
+            put = timed(lambda: memory.__setitem__(key, array), repeat)
+            print("{:<9} {:<12} {:>8.1f} {:>10.1f} {:>10.1f}".format(name, str(codec), 100 * wire / array.nbytes,
+                array.nbytes / get / 1e6, array.nbytes / put / 1e6))
+        del memory[key]
+    memory.close()
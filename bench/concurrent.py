@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the latency of small gets of one client through the master, alone,
+while a second client reads a large array through the master with several
+large gets in flight, and while the second client leaves a large get
+unread for half a second.
+
+    mpirun --oversubscribe -n 7 python3 bench/concurrent.py size repeat
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+# large gets in flight of the bulk client
+depth = 4
+# seconds before the slow client reads its get
+delay = 0.5
+
+
+def latencies(memory, key, repeat):
+    """
+    Measures the latency of one element gets
+
+    Params:
+        :memory  -- Manager: memory manager
+        :key     -- int: key of the array
+        :repeat  -- int: number of gets
+
+    Return:
+        :elapsed -- ndarray: seconds per get
+    """
+
+    elapsed = np.empty(repeat)
+    for i in range(repeat):
+        begin = time.perf_counter()
+        memory[key, i % 1000]
+        elapsed[i] = time.perf_counter() - begin
+    return elapsed
+
+
+def bulk(memory, key, repeat):
+    """
+    Reads a whole array repeat times with depth gets in flight
+
+    Params:
+        :memory  -- Manager: memory manager
+        :key     -- int: key of the array
+        :repeat  -- int: number of gets
+
+    Return:
+        :elapsed -- float: seconds spent
+    """
+
+    begin   = time.perf_counter()
+    futures = []
+    for _ in range(repeat):
+        if (len(futures) == depth):
+            futures.pop(0).result()
+        futures.append(memory.get_async(key))
+    allocator.wait_all(futures)
+    return time.perf_counter() - begin
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Format: {} size repeat".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 3
+    memory    = allocator.launch(size, 0, False, clients=2, policy="round_robin",
+                                 stripe_unit=size // nb_slaves + 1)
+    rank      = memory.clients.Get_rank()
+    keys      = [memory.malloc(size), memory.malloc(1000)] if (rank == 0) else None
+    large, small = memory.clients.bcast(keys, root=0)
+
+    memory.clients.Barrier()
+    alone = latencies(memory, small, repeat) if (rank == 1) else None
+    memory.clients.Barrier()
+    if (rank == 0):
+        elapsed = bulk(memory, large, repeat // 10 + depth)
+        memory.clients.send(elapsed, dest=1)
+    else:
+        loaded  = latencies(memory, small, repeat)
+        elapsed = memory.clients.recv(source=0)
+
+    memory.clients.Barrier()
+    if (rank == 0):
+        future = memory.get_async(large)
+        time.sleep(delay)
+        future.result()
+    else:
+        # the slow client has sent its get
+        time.sleep(delay / 10)
+        stalled = latencies(memory, small, 50)
+        print("{:<12} {:>10} {:>10} {:>10} {:>12}".format("small gets", "p50 us", "p99 us", "max us",
+            "bulk MB/s"))
+        for name, measured in (("alone", alone), ("during bulk", loaded), ("slow reader", stalled)):
+            print("{:<12} {:>10.1f} {:>10.1f} {:>10.1f} {:>12}".format(name, np.percentile(measured, 50) * 1e6,
+                np.percentile(measured, 99) * 1e6, measured.max() * 1e6,
+                "{:.1f}".format(size * 8 * (repeat // 10 + depth) / elapsed / 1e6) if (measured is loaded) else "-"))
+    memory.close()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the copy of an array into another array with memory.copy against
+a get and a set through the client, for arrays striped on all slaves and
+for a copy shifted by half a stripe, where every block pairs with two slaves.
+
+    for n in 4 6 10; do mpirun --oversubscribe -n $n python3 bench/copy.py size repeat direct; done
+"""
+
+import os
+import sys
+import time
+
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def timed(function, repeat):
+    """
+    Measures the mean duration of a call
+
+    Params:
+        :function -- function: function called without arguments
+        :repeat   -- int: number of calls
+
+    Return:
+        :elapsed  -- float: mean seconds per call
+    """
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - begin) / repeat
+
+
+def get_set(memory, target, start, source, count):
+    """
+    Copies elements through the client
+
+    Params:
+        :memory -- Manager: memory manager
+        :target -- int: key of the array written
+        :start  -- int: first index written
+        :source -- int: key of the array read
+        :count  -- int: number of elements, read from the first one
+    """
+
+    memory[target, start: start + count] = memory[source, 0: count][0]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} size repeat direct".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    direct    = bool(int(sys.argv[3]))
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    stripe    = size // nb_slaves + 1
+    memory    = allocator.launch(max(size, 2 * stripe + 1), 0, direct, policy="round_robin", stripe_unit=stripe)
+    source    = memory.malloc(size)
+    target    = memory.malloc(size)
+    memory.arange(source)
+
+    print("{:>7} {:<8} {:>14} {:>12} {:>8}".format("slaves", "copy", "get+set MB/s", "copy MB/s", "speedup"))
+    for name, shift in (("aligned", 0), ("shifted", stripe // 2)):
+        count   = size - shift
+        manual  = timed(lambda: get_set(memory, target, shift, source, count), repeat)
+        applied = timed(lambda: memory.copy(target, slice(shift, size), source, slice(0, count)), repeat)
+        assert (memory[target, shift: size][0] == memory[source, 0: count][0]).all()
+        print("{:>7} {:<8} {:>14.1f} {:>12.1f} {:>8.2f}".format(nb_slaves, name, count * 8 / manual / 1e6,
+            count * 8 / applied / 1e6, manual / applied))
+    memory.close()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Compares get/set bandwidth when data is routed through the master against
+the direct path where the client exchanges data with the slaves itself.
+Run with an increasing number of ranks to see how each path scales with
+the number of slaves. Also measures the latency of small slice gets with
+and without the client-side block map cache.
+
+    mpirun -n 6 python3 bench/direct.py size repeat
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def bandwidth(memory, key, array, repeat, chunk):
+    """
+    Sets then gets the whole array by chunks repeat times
+
+    Params:
+        :memory -- Manager: memory manager
+        :key    -- int: key of the array
+        :array  -- ndarray: values to set
+        :repeat -- int: number of passes
+        :chunk  -- int: number of elements per request
+
+    Return:
+        :set    -- float: set bandwidth in GB/s
+        :get    -- float: get bandwidth in GB/s
+    """
+
+    gbytes = array.nbytes * repeat / 1e9
+    begin  = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(0, len(array), chunk):
+            memory[key, i: i + chunk] = array[i: i + chunk]
+    elapsed_set = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(0, len(array), chunk):
+            memory[key, i: i + chunk]
+    elapsed_get = time.perf_counter() - begin
+    return gbytes / elapsed_set, gbytes / elapsed_get
+
+
+def latency(memory, key, size, count, width):
+    """
+    Gets count small slices spread over the array
+
+    Params:
+        :memory -- Manager: memory manager
+        :key    -- int: key of the array
+        :size   -- int: size of the array
+        :count  -- int: number of gets
+        :width  -- int: number of elements per get
+
+    Return:
+        :usec   -- float: mean latency of a get in microseconds
+    """
+
+    shift = max(1, (size - width) // count)
+    begin = time.perf_counter()
+    for i in range(count):
+        start = i * shift % (size - width)
+        memory[key, start: start + width]
+    return (time.perf_counter() - begin) / count * 1e6
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Format: {} size repeat".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    array     = np.random.RandomState(0).randint(1 << 40, size=size).astype(np.int64)
+
+    # the array fills all slaves, the master path is limited to node_size per request
+    node_size = size // nb_slaves + 1
+    memory    = allocator.launch(node_size, 0)
+    key       = memory.malloc(size)
+
+    print("{:<8} {:>8} {:>10} {:>10} {:>10}".format("path", "slaves", "chunk", "set GB/s", "get GB/s"))
+    for direct, chunk in ((False, node_size), (True, node_size), (True, size)):
+        memory.direct = direct
+        print("{:<8} {:>8} {:>10} {:>10.3f} {:>10.3f}".format("direct" if direct else "master",
+            nb_slaves, chunk, *bandwidth(memory, key, array, repeat, chunk)))
+
+    print("{:<8} {:>8} {:>10}".format("path", "cache", "get usec"))
+    for direct, cache in ((False, False), (True, False), (True, True)):
+        memory.direct = direct
+        memory.cache  = cache
+        print("{:<8} {:>8} {:>10.1f}".format("direct" if direct else "master",
+            str(cache), latency(memory, key, size, 1000 * repeat, 16)))
+    memory.close()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Compares initializing an array from the client, which sends every element
+to the slaves, against memory.fill, memory.arange and memory.random where
+each slave generates its own part and only a small request is sent.
+
+    for n in 1000000 10000000 100000000; do
+        mpirun -n 6 python3 bench/fill.py $n 1000000
+    done
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def client_random(memory, key, size, chunk):
+    """
+    Sets random values generated on the client by chunks
+
+    Params:
+        :memory -- Manager: memory manager
+        :key    -- int: key of the array
+        :size   -- int: size of the array
+        :chunk  -- int: number of elements per request
+    """
+
+    random = np.random.RandomState(0)
+    for i in range(0, size, chunk):
+        memory[key, i: min(size, i + chunk)] = random.randint(size, size=min(chunk, size - i))
+
+
+def timed(function, *args):
+    """
+    Calls a function and measures its duration
+
+    Params:
+        :function -- function: function to call
+        :args     -- (...): arguments of the function
+
+    Return:
+        :elapsed  -- float: seconds spent in the call
+    """
+
+    begin = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - begin
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Format: {} size chunk".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    chunk     = int(sys.argv[2])
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    memory    = allocator.launch(max(chunk, size // nb_slaves + 1), 0, direct=True)
+    key       = memory.malloc(size)
+
+    print("{:<14} {:>10} {:>10} {:>10}".format("method", "size", "seconds", "GB/s"))
+    for method, elapsed in (("client random", timed(client_random, memory, key, size, chunk)),
+                            ("fill", timed(memory.fill, key, 7)),
+                            ("arange", timed(memory.arange, key, 0, 1)),
+                            ("random", timed(memory.random, key, 0, 0, size))):
+        print("{:<14} {:>10} {:>10.3f} {:>10.3f}".format(method, size, elapsed, size * 8 / 1e9 / elapsed))
+    memory.close()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Measures gathers and scatters of random indexes of one array, from 1k to
+1M indexes per request, against a loop of one get per element for the
+smallest count.
+
+    mpirun -n 6 python3 bench/gather.py size repeat direct
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+counts = [1000, 10000, 100000, 1000000]
+
+
+def timed(function, repeat):
+    """
+    Measures the mean duration of a call
+
+    Params:
+        :function -- function: function called without arguments
+        :repeat   -- int: number of calls
+
+    Return:
+        :elapsed  -- float: mean seconds per call
+    """
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - begin) / repeat
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} size repeat direct".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    direct    = bool(int(sys.argv[3]))
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    memory    = allocator.launch(max(counts[-1], size // nb_slaves + 1), 0, direct, policy="round_robin",
+                                 stripe_unit=65536)
+    key       = memory.malloc(size)
+    memory.arange(key)
+    random    = np.random.RandomState(0)
+
+    print("{:>8} {:>11} {:>11} {:>12} {:>12}".format("indexes", "gather ms", "scatter ms", "gather M/s",
+        "per get ms"))
+    for count in counts:
+        indices = random.randint(size, size=count)
+        values  = random.randint(size, size=count)
+        assert (memory[key, indices][0] == indices).all()
+        gather  = timed(lambda: memory[key, indices], repeat)
+        scatter = timed(lambda: memory.__setitem__((key, indices), values), repeat)
+        memory[key, indices] = indices
+        # one request per element, only for the smallest count
+        loop    = timed(lambda: [memory[key, int(index)] for index in indices], 1) if (count == counts[0]) else None
+        print("{:>8} {:>11.3f} {:>11.3f} {:>12.2f} {:>12}".format(count, gather * 1e3, scatter * 1e3,
+            count / gather / 1e6, "-" if (loop is None) else "{:.3f}".format(loop * 1e3)))
+    memory.close()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Compares loading an array from the text file of generator.py, one line per
+element through the client, against memory.load / memory.dump of a binary
+array file where each slave reads or writes its own range.
+
+    mpirun -n 6 python3 bench/io.py size node_size directory
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+import binfile
+
+
+def load_text(memory, path, node_size):
+    """
+    Loads a text file by groups of node_size as main.py used to
+
+    Params:
+        :memory    -- Manager: memory manager
+        :path      -- str: path of the text file
+        :node_size -- int: number of elements per request
+
+    Return:
+        :key       -- int: key of the loaded array
+    """
+
+    f    = open(path, "r")
+    size = int(f.readline())
+    key  = memory.malloc(size)
+    for i in range(0, size, node_size):
+        array = np.empty(min(node_size, size - i), dtype=np.int64)
+        for j in range(len(array)):
+            array[j] = int(f.readline())
+        memory[key, i: i + len(array)] = array
+    f.close()
+    return key
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} size node_size directory".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    node_size = int(sys.argv[2])
+    directory = sys.argv[3]
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    memory    = allocator.launch(max(node_size, size // nb_slaves + 1), 0, direct=True)
+
+    array = np.random.RandomState(0).randint(size, size=size)
+    text  = os.path.join(directory, "bench.txt")
+    data  = os.path.join(directory, "bench.bin")
+    np.savetxt(text, np.concatenate(([size], array)), fmt="%d")
+    binfile.save(data, array)
+    gbytes = size * 8 / 1e9
+
+    print("{:<12} {:>10} {:>10} {:>10}".format("method", "size", "seconds", "GB/s"))
+    begin = time.perf_counter()
+    key   = load_text(memory, text, node_size)
+    elapsed = time.perf_counter() - begin
+    print("{:<12} {:>10} {:>10.3f} {:>10.3f}".format("text load", size, elapsed, gbytes / elapsed))
+    del memory[key]
+
+    begin = time.perf_counter()
+    key   = memory.load(data)
+    elapsed = time.perf_counter() - begin
+    print("{:<12} {:>10} {:>10.3f} {:>10.3f}".format("binary load", size, elapsed, gbytes / elapsed))
+
+    begin = time.perf_counter()
+    memory.dump(key, data)
+    elapsed = time.perf_counter() - begin
+    print("{:<12} {:>10} {:>10.3f} {:>10.3f}".format("binary dump", size, elapsed, gbytes / elapsed))
+
+    os.remove(text)
+    os.remove(data)
+    memory.close()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the placement policies of the master.
+For each policy, runs a malloc/free churn workload and reports failed
+allocations, blocks per array and how free memory is spread on slaves,
+then measures the parallel read bandwidth of one large array.
+
+    mpirun -n 10 python3 bench/placement.py node_size steps repeat
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+from master import Master
+
+
+def churn(memory, policy, node_size, nb_slaves, steps):
+    """
+    Allocates and frees random sized arrays
+
+    Params:
+        :memory    -- Manager: memory manager
+        :policy    -- str: placement policy
+        :node_size -- int: size of each slave
+        :nb_slaves -- int: number of slaves
+        :steps     -- int: number of malloc/free operations
+
+    Return:
+        :failed    -- int: number of failed mallocs
+        :blocks    -- float: mean number of blocks per live array
+        :spread    -- float: fraction of free memory out of the largest free slave
+        :imbalance -- float: (max used - min used) / node_size
+    """
+
+    random = np.random.RandomState(0)
+    live   = {}
+    failed = 0
+    for _ in range(steps):
+        if (live and random.rand() < 0.45):
+            key = list(live.keys())[random.randint(len(live))]
+            del memory[key]
+            del live[key]
+            continue
+        size = int(random.randint(1, node_size))
+        used = sum(sum(offset for _, _, offset in blocks) for blocks in live.values())
+        if (used + size > node_size * nb_slaves):
+            failed += 1
+            continue
+        key = memory.malloc(size, policy=policy)
+        live[key] = memory.ask((6, [key]))[0][1][0]
+
+    used = [0] * nb_slaves
+    for blocks in live.values():
+        for rank, _, offset in blocks:
+            used[rank - 2] += offset
+    free      = [node_size - size for size in used]
+    blocks    = np.mean([len(blocks) for blocks in live.values()]) if live else 0
+    spread    = 1 - max(free) / sum(free) if sum(free) else 0
+    imbalance = (max(used) - min(used)) / node_size
+    for key in live:
+        del memory[key]
+    return failed, blocks, spread, imbalance
+
+
+def read_bandwidth(memory, policy, size, repeat):
+    """
+    Reads a whole array directly from the slaves repeat times
+
+    Params:
+        :memory -- Manager: memory manager
+        :policy -- str: placement policy
+        :size   -- int: size of the array
+        :repeat -- int: number of reads
+
+    Return:
+        :gbs    -- float: read bandwidth in GB/s
+        :slaves -- int: number of slaves holding the array
+    """
+
+    key = memory.malloc(size, policy=policy)
+    memory[key, 0: size] = np.arange(size)
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        memory[key, 0: size]
+    elapsed = time.perf_counter() - begin
+    slaves  = len(set(rank for rank, _, _ in memory.block_maps[key][1][0]))
+    del memory[key]
+    return size * 8 * repeat / 1e9 / elapsed, slaves
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} node_size steps repeat".format(sys.argv[0]))
+        exit(1)
+
+    node_size = int(sys.argv[1])
+    steps     = int(sys.argv[2])
+    repeat    = int(sys.argv[3])
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    memory    = allocator.launch(node_size, 0, direct=True,
+                                 stripe_unit=max(1, node_size // 16))
+
+    print("{:<14} {:>7} {:>7} {:>7} {:>9} {:>7} {:>9}".format("policy",
+        "failed", "blocks", "spread", "imbalance", "slaves", "read GB/s"))
+    for policy in Master.policies:
+        failed, blocks, spread, imbalance = churn(memory, policy, node_size, nb_slaves, steps)
+        gbs, slaves = read_bandwidth(memory, policy, node_size, repeat)
+        print("{:<14} {:>7} {:>7.2f} {:>7.2f} {:>9.2f} {:>7} {:>9.3f}".format(policy,
+            failed, blocks, spread, imbalance, slaves, gbs))
+    memory.close()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Packs arrays on the first slaves with first_fit, measures the throughput of
+reading all of them concurrently, rebalances the slaves by occupancy and
+measures it again. Then compares growing an array with memory.realloc
+against allocating a larger array, copying through the client and deleting.
+
+    mpirun -n 6 python3 bench/rebalance.py node_size arrays repeat
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def read_all(memory, keys, size, repeat):
+    """
+    Reads every array at once, repeat times
+
+    Params:
+        :memory -- Manager: memory manager
+        :keys   -- [int]: keys of the arrays
+        :size   -- int: size of each array
+        :repeat -- int: number of reads of each array
+
+    Return:
+        :gbs    -- float: read throughput in GB/s
+    """
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        allocator.wait_all([memory.get_async(key) for key in keys])
+    return len(keys) * size * 8 * repeat / 1e9 / (time.perf_counter() - begin)
+
+
+def copy_grow(memory, key, size):
+    """
+    Grows an array by allocating a larger one and copying through the client
+
+    Params:
+        :memory -- Manager: memory manager
+        :key    -- int: key of the array
+        :size   -- int: new size
+
+    Return:
+        :key    -- int: key of the larger array
+    """
+
+    old   = memory.size(key)
+    grown = memory.malloc(size)
+    memory[grown, 0: old] = memory[key, 0: old][0]
+    del memory[key]
+    return grown
+
+
+def timed(function, *args):
+    """
+    Calls a function and measures its duration
+
+    Params:
+        :function -- function: function to call
+        :args     -- (...): arguments of the function
+
+    Return:
+        :elapsed  -- float: seconds spent in the call
+        :result   -- any: result of the call
+    """
+
+    begin  = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - begin, result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} node_size arrays repeat".format(sys.argv[0]))
+        exit(1)
+
+    node_size = int(sys.argv[1])
+    nb_arrays = int(sys.argv[2])
+    repeat    = int(sys.argv[3])
+    # four arrays per slave, first_fit fills the first slaves
+    size      = node_size // 4
+    memory    = allocator.launch(node_size, 0, direct=True, policy="first_fit")
+    keys      = [memory.malloc(size) for _ in range(nb_arrays)]
+    for key in keys:
+        memory.random(key, key, 0, 1000)
+
+    print("{:<8} {:>10} {:>8} {:>10}  {}".format("layout", "read GB/s", "moves", "seconds", "occupancy"))
+    occupancy = memory.stats()["master"]["occupancy"]
+    print("{:<8} {:>10.3f} {:>8} {:>10}  {}".format("skewed", read_all(memory, keys, size, repeat), "", "",
+        " ".join("{:.2f}".format(value) for value in occupancy)))
+    elapsed, moves = timed(memory.rebalance)
+    occupancy = memory.stats()["master"]["occupancy"]
+    print("{:<8} {:>10.3f} {:>8} {:>10.3f}  {}".format("balanced", read_all(memory, keys, size, repeat),
+        len(moves), elapsed, " ".join("{:.2f}".format(value) for value in occupancy)))
+
+    print("\n{:<8} {:>10} {:>10}".format("grow", "size", "seconds"))
+    for key in keys:
+        del memory[key]
+    key = memory.malloc(size)
+    memory.random(key, 0, 0, 1000)
+    print("{:<8} {:>10} {:>10.4f}".format("realloc", 2 * size, timed(memory.realloc, key, 2 * size)[0]))
+    del memory[key]
+    key = memory.malloc(size)
+    memory.random(key, 0, 0, 1000)
+    print("{:<8} {:>10} {:>10.4f}".format("copy", 2 * size, timed(copy_grow, memory, key, 2 * size)[0]))
+    memory.close()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Measures a read-heavy skewed workload on replicated arrays. Every client
+reads slices of a few hot arrays chosen with a Zipf law and sometimes writes
+one, for an increasing number of copies of the arrays. Reports the aggregate
+throughput and how evenly the reads are spread over the slaves.
+
+    mpirun --oversubscribe -n 12 python3 bench/replicas.py clients arrays size requests max_replicas
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+# fraction of the requests that are sets
+write_ratio = 0.05
+# exponent of the Zipf law choosing the arrays
+skew = 1.2
+
+
+def workload(memory, keys, size, requests, seed):
+    """
+    Reads and writes random slices of arrays chosen with a Zipf law
+
+    Params:
+        :memory   -- Manager: memory manager
+        :keys     -- [int]: keys of the arrays, the first ones are the hottest
+        :size     -- int: size of each array
+        :requests -- int: number of requests
+        :seed     -- int: seed of the random generator
+
+    Return:
+        :elapsed  -- float: seconds spent
+        :nbytes   -- int: bytes read or written
+    """
+
+    random  = np.random.RandomState(seed)
+    weights = 1 / np.arange(1, len(keys) + 1) ** skew
+    chosen  = random.choice(len(keys), size=requests, p=weights / weights.sum())
+    writes  = random.rand(requests) < write_ratio
+    widths  = random.randint(size // 4, size + 1, size=requests)
+    value   = np.arange(size, dtype=np.int64)
+    nbytes  = int(widths.sum()) * value.itemsize
+
+    memory.clients.Barrier()
+    begin = time.perf_counter()
+    for index, write, width in zip(chosen, writes, widths):
+        start = random.randint(size - width + 1)
+        if (write):
+            memory[keys[index], start: start + width] = value[:width]
+        else:
+            memory[keys[index], start: start + width]
+    memory.clients.Barrier()
+    return time.perf_counter() - begin, nbytes
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 6:
+        print("Format: {} clients arrays size requests max_replicas".format(sys.argv[0]))
+        exit(1)
+
+    clients      = int(sys.argv[1])
+    nb_arrays    = int(sys.argv[2])
+    size         = int(sys.argv[3])
+    requests     = int(sys.argv[4])
+    max_replicas = int(sys.argv[5])
+    nb_slaves    = MPI.COMM_WORLD.Get_size() - clients - 1
+    memory       = allocator.launch(max(size, nb_arrays * size * max_replicas // nb_slaves + size),
+                                    0, True, policy="least_loaded", clients=clients)
+    rank         = memory.clients.Get_rank()
+
+    if (rank == 0):
+        print("{:>8} {:>8} {:>8} {:>10} {:>10} {:>12}".format("replicas", "clients", "slaves",
+            "MB/s", "req/s", "read spread"))
+    for replicas in range(1, max_replicas + 1):
+        keys = [memory.malloc(size, replicas=replicas) for _ in range(nb_arrays)] if (rank == 0) else None
+        keys = memory.clients.bcast(keys, root=0)
+        before = [slave["bytes_out"] for slave in memory.stats()["slaves"]] if (rank == 0) else None
+
+        elapsed, nbytes = workload(memory, keys, size, requests, rank * max_replicas + replicas)
+        nbytes = memory.clients.reduce(nbytes, root=0)
+        if (rank == 0):
+            served = np.array([slave["bytes_out"] for slave in memory.stats()["slaves"]]) - before
+            # share of the reads served by the busiest slave, 1 / slaves is a perfect spread
+            print("{:>8} {:>8} {:>8} {:>10.1f} {:>10.0f} {:>12.2f}".format(replicas, clients, nb_slaves,
+                nbytes / 1e6 / elapsed, requests * clients / elapsed, served.max() / served.sum()))
+            for key in keys:
+                del memory[key]
+        memory.clients.Barrier()
+    memory.close()
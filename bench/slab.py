@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Allocates and writes many small arrays of random sizes, with one malloc per
+array and with malloc_many, and reports the allocation rate and the memory
+used per array by the master and the slaves beyond its elements. Run it with
+slab_max 0 (every array gets its own blocks) and with the default slab_max.
+
+    for slab_max in 0 1024; do
+        mpirun -n 6 python3 bench/slab.py 100000 64 $slab_max
+    done
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+# arrays per malloc_many request
+batch = 1000
+
+
+def resident(memory):
+    """
+    Gets the peak resident memory of the master and of the slaves
+
+    Params:
+        :memory -- Manager: memory manager
+
+    Return:
+        :nbytes -- int: sum of the peak resident memory of the machines in bytes
+    """
+
+    stats = memory.stats()
+    return (stats["master"]["max_rss_kb"] + sum(slave["max_rss_kb"] for slave in stats["slaves"])) * 1024
+
+
+def allocate(memory, sizes, many):
+    """
+    Allocates arrays and writes each of them once
+
+    Params:
+        :memory -- Manager: memory manager
+        :sizes  -- [int]: size of each array
+        :many   -- bool: allocate batch arrays per request with malloc_many
+
+    Return:
+        :keys   -- [int]: keys of the arrays
+        :rate   -- float: allocations per second
+    """
+
+    begin = time.perf_counter()
+    if (many):
+        keys = []
+        for i in range(0, len(sizes), batch):
+            keys += memory.malloc_many(sizes[i: i + batch])
+    else:
+        keys = [memory.malloc(size) for size in sizes]
+    rate = len(sizes) / (time.perf_counter() - begin)
+    for key in keys:
+        memory[key] = 1
+    return keys, rate
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} arrays max_array slab_max".format(sys.argv[0]))
+        exit(1)
+
+    nb_arrays = int(sys.argv[1])
+    max_array = int(sys.argv[2])
+    slab_max  = int(sys.argv[3])
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    random    = np.random.RandomState(0)
+    sizes     = [int(size) for size in random.randint(1, max_array + 1, size=nb_arrays)]
+    memory    = allocator.launch(max(2 ** 20, 4 * sum(sizes) // nb_slaves), 0, direct=True,
+                                 slab_max=slab_max)
+
+    # the peak resident memory only grows, the memory per array is measured on the first pass
+    before       = resident(memory)
+    keys, single = allocate(memory, sizes, False)
+    grown        = resident(memory) - before
+    metadata     = memory.stats()["master"]["metadata"]
+    for key in keys:
+        del memory[key]
+    keys, many   = allocate(memory, sizes, True)
+    data         = sum(sizes) * 8 / nb_arrays
+
+    print("{:>8} {:>8} {:>10} {:>10} {:>12} {:>12} {:>7} {:>8}".format("slab_max", "arrays", "malloc/s",
+        "many/s", "bytes/array", "data/array", "slabs", "blocks"))
+    # bytes used by the machines beyond the elements of the arrays
+    print("{:>8} {:>8} {:>10.0f} {:>10.0f} {:>12.0f} {:>12.0f} {:>7} {:>8}".format(slab_max, nb_arrays,
+        single, many, grown / nb_arrays - data, data, metadata["slabs"], metadata["blocks"]))
+    memory.close()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the odd-even block sort previously run by main.py, where the
+client sorts overlapping node_size windows, against the sample sort run by
+the slaves with memory.sort. Then sorts a constant array and an array of
+three values, and checks that no slave merges more than twice its share.
+
+    for n in 300000 3000000 30000000; do
+        mpirun --oversubscribe -n 10 python3 bench/sort.py $n 10000 3000000
+    done
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def load(memory, key, array, node_size):
+    """
+    Sets the array by groups of node_size
+
+    Params:
+        :memory    -- Manager: memory manager
+        :key       -- int: key of the array
+        :array     -- ndarray: values to set
+        :node_size -- int: number of elements per request
+    """
+
+    allocator.wait_all([memory.set_async((key, slice(i, i + node_size)), array[i: i + node_size])
+                        for i in range(0, len(array), node_size)])
+
+
+def odd_even_sort(memory, key, size, node_size):
+    """
+    Sorts overlapping node_size windows on the client until nothing changes
+
+    Params:
+        :memory    -- Manager: memory manager
+        :key       -- int: key of the array
+        :size      -- int: size of the array
+        :node_size -- int: size of a window
+
+    Return:
+        :passes    -- int: number of passes over the array
+    """
+
+    flag   = False
+    shift  = node_size // 2
+    passes = 0
+    while not flag:
+        flag    = True
+        passes += 1
+        for start in range(0, max(1, size - shift), shift):
+            array        = memory[key, start: start + node_size][0]
+            sorted_array = np.sort(array)
+            if not np.array_equal(array, sorted_array):
+                flag = False
+                memory[key, start: start + node_size] = sorted_array
+    return passes
+
+
+def is_sorted(memory, key, size, node_size):
+    """
+    Checks that the array is sorted
+
+    Params:
+        :memory    -- Manager: memory manager
+        :key       -- int: key of the array
+        :size      -- int: size of the array
+        :node_size -- int: number of elements per request
+
+    Return:
+        :sorted    -- bool: True if the array is sorted
+    """
+
+    last = None
+    for start in range(0, size, node_size):
+        array = memory[key, start: start + node_size][0]
+        if (np.any(array[1:] < array[:-1]) or (last is not None and array[0] < last)):
+            return False
+        last = array[-1]
+    return True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} size node_size max_odd_even".format(sys.argv[0]))
+        exit(1)
+
+    size         = int(sys.argv[1])
+    node_size    = int(sys.argv[2])
+    max_odd_even = int(sys.argv[3])
+    nb_slaves    = MPI.COMM_WORLD.Get_size() - 2
+    capacity     = max(node_size, size // nb_slaves + 1)
+    memory       = allocator.launch(capacity, 0, direct=True)
+    array        = np.random.RandomState(0).randint(size, size=size).astype(np.int64)
+    key          = memory.malloc(size)
+
+    print("{:<10} {:>10} {:>8} {:>10} {:>7}".format("method", "size", "slaves", "seconds", "sorted"))
+    if (size <= max_odd_even):
+        load(memory, key, array, node_size)
+        begin   = time.perf_counter()
+        odd_even_sort(memory, key, size, node_size)
+        elapsed = time.perf_counter() - begin
+        print("{:<10} {:>10} {:>8} {:>10.3f} {:>7}".format("odd-even", size, nb_slaves,
+            elapsed, str(is_sorted(memory, key, size, node_size))))
+
+    load(memory, key, array, node_size)
+    begin   = time.perf_counter()
+    memory.sort(key)
+    elapsed = time.perf_counter() - begin
+    print("{:<10} {:>10} {:>8} {:>10.3f} {:>7}".format("sample", size, nb_slaves,
+        elapsed, str(is_sorted(memory, key, size, node_size))))
+
+    for name, values in (("constant", np.full(size, 7)), ("3 values", array % 3)):
+        load(memory, key, values, node_size)
+        begin   = time.perf_counter()
+        memory.sort(key)
+        elapsed = time.perf_counter() - begin
+        runs    = [slave["sort_run"] for slave in memory.stats()["slaves"]]
+        print("{:<10} {:>10} {:>8} {:>10.3f} {:>7}".format(name, size, nb_slaves,
+            elapsed, str(is_sorted(memory, key, size, node_size))))
+        # equal values are spread over the buckets
+        assert max(runs) <= 2 * size / nb_slaves, runs
+    memory.close()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the latency of direct sets routed with a stale block map, which the
+slaves reject and the client sends again with fresh block maps, against sets
+routed with a fresh one. In each round the second client caches the block
+map of a new small array, the first client reallocs it out of its slab slot,
+gives the slot to another array and reallocs or rebalances a large array,
+then the second client sets both arrays with its cached block maps. Every
+round checks that no set is lost and that none lands in the other array.
+
+    mpirun --oversubscribe -n 7 python3 bench/stale.py size repeat
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+# elements of the small array, in a slab until it grows
+small = 10
+
+
+def timed(function):
+    """
+    Measures the duration of a call
+
+    Params:
+        :function -- function: function called without arguments
+
+    Return:
+        :elapsed  -- float: seconds spent
+    """
+
+    begin = time.perf_counter()
+    function()
+    return time.perf_counter() - begin
+
+
+def change(memory, keys, size, i):
+    """
+    Changes the layout of the shared arrays, on the first client
+
+    Params:
+        :memory -- Manager: memory manager
+        :keys   -- [int]: keys of the small and the large arrays
+        :size   -- int: elements of the large array
+        :i      -- int: number of the round
+
+    Return:
+        :other  -- int: key of the array given the slot of the small array
+    """
+
+    memory.realloc(keys[0], small * 300)
+    other = memory.malloc(small)
+    memory[other] = -1
+    if (i % 4 == 1):
+        memory.rebalance()
+    else:
+        memory.realloc(keys[1], size if (i % 2) else size + size // 2)
+    return other
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Format: {} size repeat".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 3
+    # first fit packs the small arrays in the same slab, so that a freed slot is given to the next one
+    memory    = allocator.launch(size * 2, 0, True, clients=2, stripe_unit=size // nb_slaves + 1)
+    rank      = memory.clients.Get_rank()
+    large     = memory.clients.bcast(memory.malloc(size) if (rank == 0) else None, root=0)
+
+    stale = np.empty(repeat)
+    fresh = np.empty(repeat)
+    for i in range(repeat):
+        keys = memory.clients.bcast([memory.malloc(small), large] if (rank == 0) else None, root=0)
+        if (rank == 1):
+            memory[keys[0]] = 0
+            memory[large, 0] = 0
+        memory.clients.Barrier()
+        other = change(memory, keys, size, i) if (rank == 0) else None
+        memory.clients.Barrier()
+        if (rank == 1):
+            stale[i] = timed(lambda: memory.__setitem__((keys[0], slice(0, small)), i + 1))
+            memory[large, size - small: size] = i + 1
+            memory.add((large, np.arange(0, size, size // 16)), 1)
+            fresh[i] = timed(lambda: memory.__setitem__((keys[0], slice(0, small)), i + 1))
+            assert (memory[keys[0], 0: small][0] == i + 1).all()
+        memory.clients.Barrier()
+        if (rank == 0):
+            assert (memory[other][0] == -1).all()
+            tail = memory[large, size - small: size][0]
+            assert (tail == i + 1 + (np.arange(size - small, size) % (size // 16) == 0)).all(), tail
+            memory.add((large, np.arange(0, size, size // 16)), -1)
+            del memory[other]
+            del memory[keys[0]]
+
+    if (rank == 1):
+        print("{:<12} {:>10} {:>10}".format("small sets", "p50 us", "p99 us"))
+        for name, measured in (("stale map", stale), ("fresh map", fresh)):
+            print("{:<12} {:>10.1f} {:>10.1f}".format(name, np.percentile(measured, 50) * 1e6,
+                                                      np.percentile(measured, 99) * 1e6))
+    memory.close()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Compares the memory footprint and the transfer speed of python lists sent
+with pickle (lowercase send/recv) against typed numpy buffers (uppercase
+Send/Recv), then measures end-to-end get/set bandwidth through the allocator.
+
+    mpirun -n 4 python3 bench/storage.py size repeat
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def list_bytes_per_element(array):
+    """
+    Gets the memory used by a python list of ints per element
+
+    Params:
+        :array -- [int]: list to measure
+
+    Return:
+        :size  -- float: bytes per element (list slots and int objects)
+    """
+
+    return (sys.getsizeof(array) + sum(sys.getsizeof(x) for x in array)) / len(array)
+
+
+def transfer(comm, payload, repeat, pickled):
+    """
+    Sends payload from rank 0 to rank 1 repeat times
+
+    Params:
+        :comm    -- MPI.Comm: communicator
+        :payload -- [int] or ndarray: data sent by rank 0
+        :repeat  -- int: number of transfers
+        :pickled -- bool: use send/recv instead of Send/Recv
+
+    Return:
+        :elapsed -- float: seconds spent by rank 0
+    """
+
+    rank = comm.Get_rank()
+    comm.Barrier()
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        if (rank == 0):
+            if (pickled):
+                comm.send(payload, dest=1)
+            else:
+                comm.Send(payload, dest=1)
+            comm.recv(source=1)
+        elif (rank == 1):
+            if (pickled):
+                comm.recv(source=0)
+            else:
+                comm.Recv(payload, source=0)
+            comm.send(0, dest=0)
+    return time.perf_counter() - begin
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Format: {} size repeat".format(sys.argv[0]))
+        exit(1)
+
+    size   = int(sys.argv[1])
+    repeat = int(sys.argv[2])
+    comm   = MPI.COMM_WORLD
+    rank   = comm.Get_rank()
+    array  = np.random.RandomState(0).randint(1 << 40, size=size).astype(np.int64)
+    gbytes = size * array.itemsize * repeat / 1e9
+
+    # raw transport: pickled list against typed buffer
+    elapsed_list   = transfer(comm, array.tolist(), repeat, True)
+    elapsed_buffer = transfer(comm, array, repeat, False)
+    if (rank == 0):
+        print("{:<8} {:>12} {:>10}".format("path", "bytes/elem", "GB/s"))
+        print("{:<8} {:>12.1f} {:>10.3f}".format("list",
+            list_bytes_per_element(array.tolist()), gbytes / elapsed_list))
+        print("{:<8} {:>12.1f} {:>10.3f}".format("buffer",
+            array.itemsize, gbytes / elapsed_buffer))
+
+    # end-to-end through master and slaves, one node_size chunk per request
+    nb_slaves = comm.Get_size() - 2
+    node_size = size // nb_slaves + 1
+    memory    = allocator.launch(node_size, 0)
+    key       = memory.malloc(size)
+    chunk     = min(node_size, size)
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(0, size, chunk):
+            memory[key, i: i + chunk] = array[i: i + chunk]
+    elapsed_set = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        for i in range(0, size, chunk):
+            memory[key, i: i + chunk]
+    elapsed_get = time.perf_counter() - begin
+
+    print("{:<8} {:>12} {:>10.3f}".format("set", "", gbytes / elapsed_set))
+    print("{:<8} {:>12} {:>10.3f}".format("get", "", gbytes / elapsed_get))
+    memory.close()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Measures memory.iter and memory.writer for several prefetch depths while
+the caller processes each chunk, depth 0 being a plain loop of blocking
+gets or sets.
+
+    mpirun -n 6 python3 bench/stream.py size chunk direct
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+depths = [0, 1, 2, 4]
+
+
+def read(memory, key, chunk, depth):
+    """
+    Reads the array chunk by chunk and sorts each chunk
+
+    Params:
+        :memory -- Manager: memory manager
+        :key    -- int: key of the array
+        :chunk  -- int: number of elements per chunk
+        :depth  -- int: number of chunks in flight
+
+    Return:
+        :elapsed -- float: seconds spent
+    """
+
+    begin = time.perf_counter()
+    for array in memory.iter(key, chunk, depth):
+        np.sort(array)
+    return time.perf_counter() - begin
+
+
+def write(memory, key, size, chunk, depth):
+    """
+    Writes the array chunk by chunk, generating each chunk
+
+    Params:
+        :memory -- Manager: memory manager
+        :key    -- int: key of the array
+        :size   -- int: size of the array
+        :chunk  -- int: number of elements per chunk
+        :depth  -- int: number of chunks in flight
+
+    Return:
+        :elapsed -- float: seconds spent
+    """
+
+    random = np.random.RandomState(0)
+    begin  = time.perf_counter()
+    with memory.writer(key, chunk, max(1, depth)) as writer:
+        for i in range(0, size, chunk):
+            writer.write(np.sort(random.randint(size, size=min(chunk, size - i))))
+            if (depth == 0):
+                writer.close()
+    return time.perf_counter() - begin
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} size chunk direct".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    chunk     = int(sys.argv[2])
+    direct    = bool(int(sys.argv[3]))
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    memory    = allocator.launch(max(chunk, size // nb_slaves + 1), 0, direct)
+    key       = memory.malloc(size)
+    gbytes    = size * 8 / 1e9
+
+    print("{:>6} {:>10} {:>10} {:>10} {:>10}".format("depth", "size", "chunk", "read GB/s", "write GB/s"))
+    for depth in depths:
+        elapsed_write = write(memory, key, size, chunk, depth)
+        elapsed_read  = read(memory, key, chunk, depth)
+        print("{:>6} {:>10} {:>10} {:>10.3f} {:>10.3f}".format(depth, size, chunk,
+            gbytes / elapsed_read, gbytes / elapsed_write))
+    memory.close()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite of the basic operations. Sweeps the array size, the slice
+size, the slice step and the number of arrays per request (the slice of keys
+form of memory[keys, slice]) and records for malloc, delete, get and set the
+p50/p99 latency and the throughput. Run it once per slave count and mode, the
+results are written as JSON and two result files can be compared.
+
+    for n in 3 4 6 10; do
+        mpirun --oversubscribe -n $n python3 bench/suite.py run 1 results/direct-$n.json
+    done
+    python3 bench/suite.py compare old.json new.json
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+# sweeps of the suite
+sizes  = [10000, 100000, 1000000]
+slices = [1, 100, 10000, 100000]
+steps  = [1, 4]
+arrays = [1, 4, 16]
+# number of timed requests of a configuration, less for large requests
+min_repeat = 10
+max_repeat = 200
+elements   = 4000000
+
+
+def commit():
+    """
+    Gets the commit of the measured tree
+
+    Return:
+        :commit -- str: hash of HEAD, None outside of a git repository
+    """
+
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                        stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result(op, latencies, nbytes, **config):
+    """
+    Summarizes the latencies of a configuration
+
+    Params:
+        :op        -- str: measured operation
+        :latencies -- [float]: seconds spent in each request
+        :nbytes    -- int: bytes moved by each request, 0 if none
+        :config    -- {str: any}: parameters of the configuration
+
+    Return:
+        :result    -- {str: any}: configuration, p50/p99 latency in microseconds and MB/s
+    """
+
+    latencies = np.array(latencies)
+    entry = dict(config, op=op, count=len(latencies),
+                 p50_us=float(np.percentile(latencies, 50) * 1e6),
+                 p99_us=float(np.percentile(latencies, 99) * 1e6),
+                 mb_s=nbytes * len(latencies) / 1e6 / latencies.sum() if (nbytes) else None)
+    return entry
+
+
+def timed(function, *args):
+    """
+    Calls a function and measures its duration
+
+    Params:
+        :function -- function: function to call
+        :args     -- (...): arguments of the function
+
+    Return:
+        :elapsed  -- float: seconds spent in the call
+    """
+
+    begin = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - begin
+
+
+def allocation(memory, size, count):
+    """
+    Measures malloc and delete of an array
+
+    Params:
+        :memory  -- Manager: memory manager
+        :size    -- int: size of the array
+        :count   -- int: number of mallocs
+
+    Return:
+        :results -- [{str: any}]: malloc and delete results
+    """
+
+    mallocs = []
+    deletes = []
+    for _ in range(count):
+        begin = time.perf_counter()
+        key   = memory.malloc(size)
+        mallocs.append(time.perf_counter() - begin)
+        deletes.append(timed(memory.__delitem__, key))
+    return [result("malloc", mallocs, 0, size=size), result("delete", deletes, 0, size=size)]
+
+
+def transfer(memory, keys, size, width, step, count, random):
+    """
+    Measures get and set of a slice of several arrays at random places
+
+    Params:
+        :memory  -- Manager: memory manager
+        :keys    -- [int]: consecutive keys of the arrays
+        :size    -- int: size of each array
+        :width   -- int: number of elements of the slice
+        :step    -- int: step of the slice
+        :count   -- int: number of requests of each operation
+        :random  -- RandomState: generator of the slice places
+
+    Return:
+        :results -- [{str: any}]: set and get results
+    """
+
+    span   = (width - 1) * step + 1
+    starts = random.randint(size - span + 1, size=count)
+    value  = np.arange(width, dtype=np.int64)
+    which  = slice(keys[0], keys[-1] + 1)
+    sets   = [timed(memory.__setitem__, (which, slice(start, start + span, step)), value)
+              for start in starts]
+    gets   = [timed(memory.__getitem__, (which, slice(start, start + span, step)))
+              for start in starts]
+    nbytes = width * len(keys) * value.itemsize
+    config = dict(size=size, slice=width, step=step, arrays=len(keys))
+    return [result("set", sets, nbytes, **config), result("get", gets, nbytes, **config)]
+
+
+def run(memory, nb_slaves, direct):
+    """
+    Runs all configurations of the suite
+
+    Params:
+        :memory    -- Manager: memory manager
+        :nb_slaves -- int: number of slaves
+        :direct    -- bool: direct mode of the manager
+
+    Return:
+        :results   -- [{str: any}]: one result per operation and configuration
+    """
+
+    random  = np.random.RandomState(0)
+    results = []
+    for size in sizes:
+        results += allocation(memory, size, max_repeat)
+        for count in arrays:
+            keys = [memory.malloc(size) for _ in range(count)]
+            for width in slices:
+                for step in steps:
+                    if ((width - 1) * step + 1 > size):
+                        continue
+                    repeat = min(max_repeat, max(min_repeat, elements // (width * count)))
+                    results += transfer(memory, keys, size, width, step, repeat, random)
+            for key in keys:
+                del memory[key]
+    for entry in results:
+        entry.update(slaves=nb_slaves, direct=direct)
+    return results
+
+
+def compare(old, new):
+    """
+    Prints the p50 latency and throughput ratios of two result files
+
+    Params:
+        :old -- str: path of the reference results
+        :new -- str: path of the new results
+    """
+
+    def index(path):
+        with open(path) as f:
+            results = json.load(f)["results"]
+        return {(entry["op"], entry.get("size"), entry.get("slice"), entry.get("step"),
+                 entry.get("arrays"), entry["slaves"], entry["direct"]): entry for entry in results}
+
+    before = index(old)
+    after  = index(new)
+    print("{:<7} {:>8} {:>7} {:>5} {:>7} {:>7} {:>7} {:>10} {:>10}".format("op", "size", "slice",
+        "step", "arrays", "slaves", "direct", "p50 ratio", "MB/s ratio"))
+    for config in sorted(set(before) & set(after), key=str):
+        ratio = after[config]["p50_us"] / before[config]["p50_us"]
+        mb_s  = (after[config]["mb_s"] / before[config]["mb_s"]) if (before[config]["mb_s"]) else float("nan")
+        print("{:<7} {:>8} {:>7} {:>5} {:>7} {:>7} {:>7} {:>10.2f} {:>10.2f}".format(*[
+            "-" if (value is None) else str(value) for value in config], ratio, mb_s))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "compare":
+        compare(sys.argv[2], sys.argv[3])
+        exit(0)
+    if len(sys.argv) != 4 or sys.argv[1] != "run":
+        print("Format: {} run direct output.json\n        {} compare old.json new.json".format(
+            sys.argv[0], sys.argv[0]))
+        exit(1)
+
+    from mpi4py import MPI
+    import allocator
+
+    direct    = bool(int(sys.argv[2]))
+    output    = sys.argv[3]
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    capacity  = max(max(sizes) * max(arrays) // nb_slaves + 1, max(slices) * max(arrays))
+    memory    = allocator.launch(capacity, 0, direct)
+
+    begin   = time.perf_counter()
+    results = run(memory, nb_slaves, direct)
+    print("{:<7} {:>8} {:>7} {:>5} {:>7} {:>10} {:>10} {:>10}".format("op", "size", "slice", "step",
+        "arrays", "p50 us", "p99 us", "MB/s"))
+    for entry in results:
+        print("{:<7} {:>8} {:>7} {:>5} {:>7} {:>10.1f} {:>10.1f} {:>10}".format(entry["op"], entry["size"],
+            entry.get("slice", "-"), entry.get("step", "-"), entry.get("arrays", "-"), entry["p50_us"],
+            entry["p99_us"], "-" if (entry["mb_s"] is None) else "{:.1f}".format(entry["mb_s"])))
+
+    if (os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"commit": commit(), "slaves": nb_slaves, "direct": direct,
+                   "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": time.perf_counter() - begin,
+                   "results": results}, f, indent=1)
+    memory.close()
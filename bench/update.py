@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Measures read-modify-write updates done by the client with a get and a set
+against updates applied by the slaves with memory.add: increments of one
+counter, then histograms of random values accumulated by index.
+
+    mpirun -n 6 python3 bench/update.py bins repeat direct
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+# values added to the histogram per update
+batches = [1000, 100000]
+
+
+def timed(function, repeat):
+    """
+    Measures the mean duration of a call
+
+    Params:
+        :function -- function: function called without arguments
+        :repeat   -- int: number of calls
+
+    Return:
+        :elapsed  -- float: mean seconds per call
+    """
+
+    begin = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - begin) / repeat
+
+
+def get_set(memory, key, indices):
+    """
+    Adds one to elements of an array through the client
+
+    Params:
+        :memory  -- Manager: memory manager
+        :key     -- int: key of the array
+        :indices -- ndarray: indexes of the incremented elements, repeated indexes are all applied
+    """
+
+    array = memory[key][0]
+    np.add.at(array, indices, 1)
+    memory[key] = array
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Format: {} bins repeat direct".format(sys.argv[0]))
+        exit(1)
+
+    bins      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    direct    = bool(int(sys.argv[3]))
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    memory    = allocator.launch(max(batches[-1], bins), 0, direct, policy="round_robin",
+                                 stripe_unit=max(1, bins // nb_slaves))
+    counter   = memory.malloc(1)
+    histogram = memory.malloc(bins)
+    random    = np.random.RandomState(0)
+
+    print("{:<10} {:>8} {:>14} {:>14} {:>8}".format("update", "values", "get+set us", "add us", "speedup"))
+    manual  = timed(lambda: memory.__setitem__((counter, 0), memory[counter, 0][0] + 1), repeat)
+    applied = timed(lambda: memory.add((counter, 0), 1), repeat)
+    print("{:<10} {:>8} {:>14.1f} {:>14.1f} {:>8.2f}".format("counter", 1, manual * 1e6, applied * 1e6,
+        manual / applied))
+    for batch in batches:
+        indices = random.randint(bins, size=batch)
+        manual  = timed(lambda: get_set(memory, histogram, indices), repeat)
+        applied = timed(lambda: memory.add((histogram, indices), 1), repeat)
+        print("{:<10} {:>8} {:>14.1f} {:>14.1f} {:>8.2f}".format("histogram", batch, manual * 1e6,
+            applied * 1e6, manual / applied))
+    memory.close()
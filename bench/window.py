@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the latency of one element gets and sets and the throughput of
+whole array gets and sets of a direct client, by messages to the slaves,
+by Get and Put on the slave windows and by copies of the shared windows,
+all ranks on a single node.
+
+    for n in 6 18 50; do mpirun --oversubscribe -n $n python3 bench/window.py size repeat; done
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from mpi4py import MPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import allocator
+
+
+def latencies(function, repeat):
+    """
+    Measures the duration of calls
+
+    Params:
+        :function -- function: function called with the number of the call
+        :repeat   -- int: number of calls
+
+    Return:
+        :elapsed  -- ndarray: seconds per call
+    """
+
+    elapsed = np.empty(repeat)
+    for i in range(repeat):
+        begin = time.perf_counter()
+        function(i)
+        elapsed[i] = time.perf_counter() - begin
+    return elapsed
+
+
+def use(memory, window, path):
+    """
+    Selects the access path of the client
+
+    Params:
+        :memory -- Manager: memory manager
+        :window -- Window: windows of the slaves
+        :path   -- str: "messages", "get/put" or "load/store"
+    """
+
+    memory.window     = None if (path == "messages") else window
+    window.load_store = path == "load/store"
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Format: {} size repeat".format(sys.argv[0]))
+        exit(1)
+
+    size      = int(sys.argv[1])
+    repeat    = int(sys.argv[2])
+    nb_slaves = MPI.COMM_WORLD.Get_size() - 2
+    memory    = allocator.launch(size, 0, True, policy="round_robin", stripe_unit=size // nb_slaves + 1,
+                                 window=True)
+    window    = memory.window
+    key       = memory.malloc(size)
+    array     = np.arange(size)
+    memory[key] = array
+
+    print("{:>7} {:<11} {:>11} {:>11} {:>10} {:>10}".format("slaves", "path", "get p50 us", "set p50 us",
+        "get MB/s", "set MB/s"))
+    for path in ("messages", "get/put", "load/store"):
+        use(memory, window, path)
+        get = latencies(lambda i: memory[key, i * 7919 % size], repeat)
+        put = latencies(lambda i: memory.__setitem__((key, i * 7919 % size), i), repeat)
+        memory[key] = array
+        bulk_get = latencies(lambda i: memory[key], repeat // 100 + 1)
+        bulk_put = latencies(lambda i: memory.__setitem__(key, array), repeat // 100 + 1)
+        assert np.array_equal(memory[key][0], array)
+        print("{:>7} {:<11} {:>11.1f} {:>11.1f} {:>10.1f} {:>10.1f}".format(nb_slaves, path,
+            np.percentile(get, 50) * 1e6, np.percentile(put, 50) * 1e6,
+            array.nbytes / np.median(bulk_get) / 1e6, array.nbytes / np.median(bulk_put) / 1e6))
+    use(memory, window, "load/store")
+    memory.close()
@@ -1,15 +1,45 @@
 # -*- coding: utf-8 -*-
 
+from collections import deque
+import json
+import os
+import time
+
 from mpi4py import MPI
+import numpy as np
 
-from master import Master
+from codec import bound, codecs, decode, encode
+from master import (Master, least_served, reductions, reduce_queries, send_update, slice_size, split_blocks,
+                    split_copies, split_indices, update_parts, updates, wrap_indices)
+from slab import slab_max
 from slave import Slave
+from stats import Stats
+from window import Arena, Window, open_window, window_itemsize
 
 """
+Requests are tagged with an id in [1, max_tag], responses carry the same tag.
+
 1 - malloc
 2 - get
 3 - set
 4 - delete
+5 - locate
+6 - placements
+7 - reduce
+8 - sort
+9 - load
+10 - dump
+11 - checkpoint
+12 - stats
+13 - generate
+14 - malloc many
+15 - realloc
+16 - rebalance
+18 - gather
+19 - scatter
+20 - update
+21 - copy
+22 - window offsets (sent to the slaves)
 """
 
 
@@ -18,7 +48,7 @@ def key_to_list(val):
     Transforms key to list
 
     Params:
-        :val  -- int or slice: key to be transformed to list
+        :val  -- int or slice or list: key to be transformed to list
 
     Return:
         :list -- []: transformed list
@@ -27,13 +57,281 @@ def key_to_list(val):
     if (type(val) == int):
         return [val]
     elif (type(val) == slice):
-        step = 1 if (val.step is None) else val.step
-        return [i in range(val.start, val.stop, step)]
+        start = 0 if (val.start is None) else val.start
+        step  = 1 if (val.step is None) else val.step
+        return list(range(start, val.stop, step))
+    elif (type(val) == list):
+        return [int(i) for i in val]
+
+
+def index_array(val):
+    """
+    Transforms the index of a gather or a scatter to an array of indexes
+
+    Params:
+        :val     -- any: second item of a key
+
+    Return:
+        :indices -- ndarray: int64 indexes, positions of the True values of a boolean mask,
+                             None if val is an int or a slice
+    """
+
+    if (not isinstance(val, (list, np.ndarray))):
+        return None
+    indices = np.asarray(val)
+    if (indices.dtype == bool):
+        return np.flatnonzero(indices)
+    return np.ascontiguousarray(indices, dtype=np.int64).reshape(-1)
+
+
+class Future:
+    def __init__(self, manager, tag=None, requests=None, value=None, retry=None, op=None, merge=None, codec=None,
+                 expected=None):
+        self.manager = manager
+        # opcode and submission time, the latency is recorded on completion
+        self.op = op
+        self.sent = time.perf_counter()
+        self.tag = tag
+        self.requests = [] if (requests is None) else requests
+        self.statuses = []
+        self.completed = False
+        self.value = value
+        self.response = None
+        # reissues a direct request, or its parts that a slave rejected as routed with a stale block map,
+        # called with the requests answered by fewer bytes than expected
+        self.retry = retry
+        # bytes expected by each request of a direct request, None if only its size is bounded (encoded),
+        # 0 for the sends
+        self.expected = expected
+        # places the elements of a direct gather once they are received
+        self.merge = merge
+        # codec of the arrays of a get response, None if they are raw buffers
+        self.codec = codec
+
+    def receive(self, response):
+        """
+        Handles the master response of the request.
+            posts the receives of the arrays of a get response,
+            encoded arrays are received in buffers of their largest size and decoded on completion
+
+        Params:
+            :response -- (int, any, int): (opcode, value, epoch)
+        """
+
+        tag = self.tag
+        self.tag = None
+        self.response = response
+        if (type(response[1]) == int and response[1] < 0):
+            return
+        if (response[0] not in (2, 18, 20) or type(response[1]) != list):
+            self.value = response[1]
+            return
+
+        self.value = []
+        messages   = []
+        for dtype, size in response[1]:
+            array = np.empty(size, dtype=dtype)
+            if (self.codec is None):
+                self.requests.append(self.manager.comm.Irecv(array, source=self.manager.master, tag=tag))
+            else:
+                message = np.empty(bound(array.nbytes), dtype=np.uint8)
+                self.requests.append(self.manager.comm.Irecv(message, source=self.manager.master, tag=tag))
+                messages.append((message, array))
+            self.value.append(array)
+
+        if (messages):
+            def merge():
+                for message, array in messages:
+                    decode(message, array)
+            self.merge = merge
+
+    def complete(self):
+        """
+        Marks the request as completed and records its latency.
+        """
+
+        self.completed = True
+        if (self.merge is not None and not self.stale()):
+            self.merge()
+        if (self.op is not None):
+            self.manager.counters.record(self.op, time.perf_counter() - self.sent)
+
+    def missed(self):
+        """
+        Checks which requests a slave answered with fewer bytes than expected,
+        as it does for a request routed with a stale block map.
+
+        Return:
+            :missed -- [bool]: True for each request which must be reissued with fresh block maps
+        """
+
+        if (self.retry is None):
+            return []
+        return [status.Get_count(MPI.BYTE) < (1 if (expected is None) else expected)
+                for status, expected in zip(self.statuses, self.expected)]
+
+    def stale(self):
+        """
+        Checks if a slave rejected a part of a direct request routed with a stale block map.
+
+        Return:
+            :stale -- bool: True if the request must be reissued with fresh block maps
+        """
+
+        return any(self.missed())
+
+    def done(self):
+        """
+        Checks without blocking if the request is completed.
+
+        Return:
+            :done -- bool: True if result() will not block
+        """
+
+        self.manager.poll()
+        if (self.tag is None and not self.completed):
+            statuses = [MPI.Status() for _ in self.requests]
+            if (MPI.Request.Testall(self.requests, statuses)):
+                self.statuses  = statuses
+                self.complete()
+        return self.completed
+
+    def result(self):
+        """
+        Waits for the request to complete.
+            Receive master responses up to this request
+            Handle error
+            Wait for pending transfers
+            Retry with fresh block maps the parts a slave rejected as stale
+
+        Return:
+            :value -- any: value of the request
+        """
+
+        self.manager.receive(self)
+        if (self.response is not None):
+            self.manager.handle_errors(self.response)
+        if (not self.completed):
+            self.statuses  = [MPI.Status() for _ in self.requests]
+            MPI.Request.Waitall(self.requests, self.statuses)
+            self.complete()
+        if (self.stale()):
+            self.manager.block_maps = {}
+            self.manager.generations = {}
+            self.manager.offsets = {}
+            return self.retry(self.missed()).result()
+        return self.value
+
+
+def wait_all(futures):
+    """
+    Waits for all futures to complete.
+
+    Params:
+        :futures -- [Future]: futures to wait for
+
+    Return:
+        :results -- []: results of the futures in the same order
+    """
+
+    return [future.result() for future in futures]
+
+
+def as_completed(futures):
+    """
+    Yields futures as soon as they complete, in completion order.
+
+    Params:
+        :futures -- [Future]: futures to wait for
+
+    Return:
+        :future  -- Future: next completed future
+    """
+
+    pending = list(futures)
+    while pending:
+        completed = [future for future in pending if future.done()]
+        for future in completed:
+            pending.remove(future)
+            yield future
+        if (pending and not completed):
+            # leave the core to the slaves on an oversubscribed node
+            os.sched_yield()
+
+
+class Writer:
+    def __init__(self, manager, key, chunk_size, depth=2, start=0):
+        self.manager = manager
+        self.key = key
+        self.chunk_size = chunk_size
+        self.depth = depth
+        # index of the next element written
+        self.position = start
+        self.pending = deque()
+
+    def write(self, array):
+        """
+        Writes elements after the previous ones, by chunks of chunk_size.
+            at most depth sets are in flight, array must not be modified
+            until depth more chunks are written or the writer is closed
+
+        Params:
+            :array -- array-like: elements to write
+        """
+
+        array = np.ascontiguousarray(array)
+        for shift in range(0, len(array), self.chunk_size):
+            chunk = array[shift: shift + self.chunk_size]
+            while (len(self.pending) >= self.depth):
+                self.pending.popleft().result()
+            self.pending.append(self.manager.set_async((self.key,
+                slice(self.position, self.position + len(chunk))), chunk))
+            self.position += len(chunk)
+
+    def close(self):
+        """
+        Waits for all sets in flight.
+        """
+
+        while self.pending:
+            self.pending.popleft().result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 class Manager:
-    def __init__(self):
+    def __init__(self, direct=False, cache=True, master=1, clients=MPI.COMM_SELF, codec=None, window=None):
         self.comm = MPI.COMM_WORLD
+        self.master = master
+        # communicator of all clients, used to share keys
+        self.clients = clients
+        self.direct = direct
+        self.cache = cache
+        self.epoch = 0
+        self.block_maps = {}
+        # generation of the slave key of each cached block map, sent with direct reads
+        self.generations = {}
+        # elements read from each slave, to spread reads across copies
+        self.served = {}
+        # tags identify requests, tag 0 is used between the master and the slaves
+        self.tag = 0
+        self.max_tag = min(self.comm.Get_attr(MPI.TAG_UB), 32767)
+        self.pending = deque()
+        # latency of the requests of this client
+        self.counters = Stats()
+        # codec of the gets and sets (see codec.codecs), default and per array
+        self.codec = codec
+        self.codecs = {}
+        # one-sided access to the windows of the slaves (see window.Window), None to use messages
+        self.window = window
+        # byte offset of the slave arrays in the windows, None if a slave keeps the array in pages
+        self.offsets = {}
+        # slaves sent writes by messages since their last answer, the next one-sided access waits for them
+        self.written = set()
 
     def handle_errors(self, response):
         """
@@ -49,26 +347,210 @@ class Manager:
                 raise Exception("Not enough memory")
             elif (response[1] == -2):
                 raise Exception("Unknown key")
+            elif (response[1] == -4):
+                raise Exception("Invalid file")
             else:
                 raise Exception("Invalid request")
 
+    def next_tag(self):
+        """
+        Gets the tag of a new request.
 
-    def malloc(self, size):
+        Return:
+            :tag -- int: request id in [1, max_tag]
+        """
+
+        self.tag = self.tag % self.max_tag + 1
+        return self.tag
+
+    def submit(self, request, *buffers, codec=None):
+        """
+        Sends a request to the master without waiting for its response.
+
+        Params:
+            :request -- (...): request message
+            :buffers -- ndarray: raw buffers sent after the request, in order
+            :codec   -- str: codec of the arrays of the response, None if they are raw buffers
+
+        Return:
+            :future  -- Future: pending response of the master
+        """
+
+        tag = self.next_tag()
+        self.comm.send(request, dest=self.master, tag=tag)
+        future = Future(self, tag, op=request[0], codec=codec)
+        for buffer in buffers:
+            future.requests.append(self.comm.Isend(buffer, dest=self.master, tag=tag))
+        self.pending.append(future)
+        return future
+
+    def ask(self, request, *buffers):
+        """
+        Sends a request to the master and waits for its response.
+
+        Params:
+            :request  -- (...): request message
+            :buffers  -- ndarray: raw buffers sent after the request, in order
+
+        Return:
+            :value    -- any: response value
+        """
+
+        return self.submit(request, *buffers).result()
+
+    def accept(self, future, response):
+        """
+        Hands a master response to its future.
+            drops the cached block maps if the master epoch changed
+
+        Params:
+            :future   -- Future: future waiting for the response
+            :response -- (int, any, int): (opcode, value, epoch)
+        """
+
+        if (response[2] != self.epoch):
+            self.epoch = response[2]
+            self.block_maps = {}
+            self.generations = {}
+            self.offsets = {}
+        future.receive(response)
+
+    def receive(self, future):
+        """
+        Receives master responses until the response of future.
+            the master answers in request order
+
+        Params:
+            :future -- Future: future waiting for a response
+        """
+
+        while future.tag is not None:
+            head = self.pending.popleft()
+            self.accept(head, self.comm.recv(source=self.master, tag=head.tag))
+
+    def poll(self):
+        """
+        Receives master responses that are already available.
+        """
+
+        while self.pending and self.comm.iprobe(source=self.master, tag=self.pending[0].tag):
+            head = self.pending.popleft()
+            self.accept(head, self.comm.recv(source=self.master, tag=head.tag))
+
+    def malloc_async(self, size, dtype="int64", policy=None, replicas=1):
+        """
+        Allocates memory with requested size without waiting.
+            each slave stores its part as a contiguous typed numpy array
+
+        Params:
+            :size     -- int: size of memory that needs to be allocated
+            :dtype    -- numpy dtype: type of the array elements
+            :policy   -- str: placement policy (see Master.policies), master default if None
+            :replicas -- int: number of copies of the array, on distinct slaves
+
+        Return:
+            :future   -- Future: key identifying the array to be allocated 
+        """
+
+        return self.submit((1, size, np.dtype(dtype).str, policy, replicas))
+
+    def malloc(self, size, dtype="int64", policy=None, replicas=1):
         """
         Allocates memory with requested size
             Send message to master in order to allocate memory
+            each slave stores its part as a contiguous typed numpy array
+            sets write every copy, gets are spread across copies
 
         Params:
-            :size -- int: size of memory that needs to be allocated
+            :size     -- int: size of memory that needs to be allocated
+            :dtype    -- numpy dtype: type of the array elements
+            :policy   -- str: placement policy (see Master.policies), master default if None
+            :replicas -- int: number of copies of the array, on distinct slaves
 
         Return:
-            :key  -- int: key identifying the array to be allocated 
+            :key      -- int: key identifying the array to be allocated 
         """
         
-        self.comm.send((1, size), dest=1)
-        response = self.comm.recv(source=1)
-        self.handle_errors(response)
-        return response[1]
+        return self.malloc_async(size, dtype, policy, replicas).result()
+
+    def malloc_many(self, sizes, dtype="int64", policy=None):
+        """
+        Allocates several arrays in one round trip to the master.
+            arrays of at most slab_max elements are packed into slabs,
+            slots of a power of two elements in arrays shared by small arrays
+
+        Params:
+            :sizes    -- [int]: size of each array
+            :dtype    -- numpy dtype: type of the arrays elements
+            :policy   -- str: placement policy of the arrays too large for slabs, master default if None
+
+        Return:
+            :keys     -- [int]: keys identifying the allocated arrays, in the order of sizes
+        """
+
+        return self.ask((14, [int(size) for size in sizes], np.dtype(dtype).str, policy))
+
+    def realloc(self, key, size):
+        """
+        Resizes an array in place, keeping its first elements.
+            new elements are zeros, new blocks use the free memory of any slave,
+            the data already stored does not move
+
+        Params:
+            :key  -- int: key (id) of the array
+            :size -- int: new size of the array
+        """
+
+        self.ask((15, key, int(size)))
+
+    def rebalance(self, by="occupancy"):
+        """
+        Migrates parts of arrays between slaves to even out their load.
+            the slaves exchange the data directly, direct requests routed to a slave
+            before the migration are rejected by it and routed again by their client
+
+        Params:
+            :by    -- str: occupancy (elements allocated on each slave) or
+                           traffic (elements read and written on each slave since the last rebalance by traffic)
+
+        Return:
+            :moves -- [(int, int, int)]: [(key, source rank, destination rank)], slabs have negative keys
+        """
+
+        return self.ask((16, by))
+
+    def set_codec(self, key, codec):
+        """
+        Sets the codec of the gets and sets of an array on this client.
+            integers are narrowed or delta encoded and compressed on the sender,
+            decoded on the receiver, floats are only compressed
+
+        Params:
+            :key   -- int: key (id) of the array
+            :codec -- str: codec (see codec.codecs), None for raw buffers
+        """
+
+        if (codec is not None and codec not in codecs):
+            self.handle_errors((2, -3))
+        self.codecs[key] = codec
+
+    def codec_of(self, message, codec=None):
+        """
+        Gets the codec of a get or a set.
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :codec   -- str: codec of the request, codec of the first array or default codec if None
+
+        Return:
+            :codec   -- str: codec (see codec.codecs), None for raw buffers
+        """
+
+        if (codec is None and message):
+            codec = self.codecs.get(message[0][0], self.codec)
+        if (codec is not None and codec not in codecs):
+            self.handle_errors((2, -3))
+        return codec
 
     def parse_key(self, key):
         """
@@ -95,13 +577,42 @@ class Manager:
         elif (type(key) == tuple):
             arrays = key_to_list(key[0])
             val    = key[1]
-            start  = val     if (type(val) == int) else val.start
-            stop   = val + 1 if (type(val) == int) else val.stop
+            start  = val     if (type(val) == int) else (0 if (val.start is None) else val.start)
+            stop   = val + 1 if (type(val) == int) else (-1 if (val.stop is None) else val.stop)
             step   =       1 if (type(val) == int or val.step is None) else val.step
             for i in arrays:
                 message.append([i, start, stop, step])
         return message
 
+    def get_async(self, key, codec=None):
+        """
+        Gets values of items on requested key without waiting.
+            Parse key
+            Send request to Master or to the slaves in direct mode
+            key[1] can be a list or an array of indexes, or a boolean mask, to gather elements
+
+        Params:
+            :key    -- int or tuple or slice: requested key
+            :codec  -- str: codec of the slices (see codec.codecs), codec of the array if None
+
+        Return:
+            :future -- Future: one array per requested key
+        """
+
+        indices = index_array(key[1]) if (type(key) == tuple) else None
+        if (indices is not None):
+            keys = key_to_list(key[0])
+            if (self.direct):
+                return self.direct_gather(keys, indices)
+            return self.submit((18, keys, len(indices)), indices)
+
+        message = self.parse_key(key)
+        codec   = self.codec_of(message, codec)
+        if (self.direct):
+            future = None if (self.window is None) else self.window_getitem(message)
+            return self.direct_getitem(message, codec) if (future is None) else future
+        return self.submit((2, message, codec), codec=codec)
+
     def __getitem__(self, key):
         """
         Gets values of items on requested key.
@@ -115,32 +626,890 @@ class Manager:
             :key    -- int or tuple or slice: requested key
 
         Return:
-            :result -- [ [int] ]
+            :result -- [ndarray]: one array per requested key
         """
         
-        message  = self.parse_key(key)
-        self.comm.send((2, message), dest=1)
-        response = self.comm.recv(source=1)
-        self.handle_errors(response)
-        return response[1]
+        return self.get_async(key).result()
+
+    def set_async(self, key, value, codec=None):
+        """
+        Sets requested items to value without waiting.
+            Parse key
+            Send request to Master (arrays follow as a raw or encoded buffer)
+            or to the slaves in direct mode
+            key[1] can be a list or an array of indexes, or a boolean mask, to scatter elements
+
+        Params:
+            :key    -- int or tuple: requested key
+            :value  -- scalar or array-like: value to be set
+            :codec  -- str: codec of the slices (see codec.codecs), codec of the array if None
+
+        Return:
+            :future -- Future: completed once the value can be reused
+        """
+
+        indices = index_array(key[1]) if (type(key) == tuple) else None
+        if (indices is not None):
+            keys = key_to_list(key[0])
+            if (np.ndim(value) != 0 and len(value) != len(indices)):
+                self.handle_errors((19, -3))
+            if (self.direct):
+                return self.direct_scatter(keys, indices, value)
+            if (np.ndim(value) == 0):
+                return self.submit((19, keys, value, None, len(indices)), indices)
+            value = np.ascontiguousarray(value)
+            return self.submit((19, keys, None, value.dtype.str, len(indices)), value, indices)
+
+        message = self.parse_key(key)
+        codec   = self.codec_of(message, codec)
+        if (self.direct):
+            future = None if (self.window is None) else self.window_setitem(message, value)
+            return self.direct_setitem(message, value, codec) if (future is None) else future
+
+        if (np.ndim(value) == 0):
+            return self.submit((3, message, value, None, 0, None))
+        value = np.ascontiguousarray(value)
+        if (codec is None):
+            return self.submit((3, message, None, value.dtype.str, len(value), None), value)
+        return self.submit((3, message, None, value.dtype.str, len(value), codec), encode(value, codec))
 
     def __setitem__(self, key, value):
         """
         Sets requested items to value.
             Parse key
-            Send request to Master
+            Send request to Master (arrays follow as a raw buffer)
             Wait for response from Master
             Handle error
 
         Params:
             :key   -- int or tuple: requested key
-            :value -- int or [int]: value to be set
+            :value -- scalar or array-like: value to be set
         """
         
+        self.set_async(key, value).result()
+
+    def copy(self, dst_key, dst_slice, src_key, src_slice):
+        """
+        Copies a slice of an array to a slice of an array without routing the elements through the client.
+            the master pairs the blocks of both slices, the slaves holding a pair
+            exchange the elements directly and a pair on one slave is copied locally,
+            every copy of a replicated target is written, the slices may overlap
+
+        Params:
+            :dst_key   -- int: key (id) of the array written
+            :dst_slice -- slice or int: elements written
+            :src_key   -- int: key (id) of the array read
+            :src_slice -- slice or int: elements read, as many as written
+        """
+
+        self.ask((21, self.parse_key((dst_key, dst_slice))[0], self.parse_key((src_key, src_slice))[0]))
+
+    def size(self, key):
+        """
+        Gets the number of elements of an array.
+
+        Params:
+            :key  -- int: key (id) of the array
+
+        Return:
+            :size -- int: number of elements
+        """
+
+        if (self.cache and key in self.block_maps):
+            return self.block_maps[key][2]
+        _, copies, _ = self.ask((6, [key]))[0]
+        return copies[0].size
+
+    def iter(self, key, chunk_size, depth=2, start=0, stop=None):
+        """
+        Streams an array chunk by chunk.
+            the next depth chunks are requested before a chunk is handed over,
+            so the transfers overlap the processing of the caller
+            and the client holds at most depth + 1 chunks
+
+        Params:
+            :key        -- int: key (id) of the array
+            :chunk_size -- int: number of elements per chunk, at most max_size through the master
+            :depth      -- int: number of chunks in flight
+            :start      -- int: first index
+            :stop       -- int: last index (excluded), end of the array if None
+
+        Return:
+            :chunk      -- ndarray: next chunk_size elements
+        """
+
+        stop    = self.size(key) if (stop is None) else stop
+        pending = deque()
+        for first in range(start, stop, chunk_size):
+            pending.append(self.get_async((key, slice(first, min(stop, first + chunk_size)))))
+            if (len(pending) > depth):
+                yield pending.popleft().result()[0]
+        while pending:
+            yield pending.popleft().result()[0]
+
+    def writer(self, key, chunk_size, depth=2, start=0):
+        """
+        Opens a stream writing an array chunk by chunk from start.
+            depth sets are kept in flight, close() or a with block waits for them
+
+        Params:
+            :key        -- int: key (id) of the array
+            :chunk_size -- int: number of elements per set, at most max_size through the master
+            :depth      -- int: number of sets in flight
+            :start      -- int: index of the first written element
+
+        Return:
+            :writer     -- Writer: stream with write(array) and close()
+        """
+
+        return Writer(self, key, chunk_size, depth, start)
+
+    def locate(self, message, write=False):
+        """
+        Asks the master where the requested slices are stored.
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :write   -- bool: locate every copy of replicated arrays
+
+        Return:
+            :located -- [(str, [[int, int, int, int, int]])]: [ (dtype, [[rank, key, start, stop, step]]) ]
+                one entry per slice, or per slice and copy for a write
+        """
+
+        return self.ask((5, message, write))
+
+    def route(self, message, write=False):
+        """
+        Splits requested slices on the slaves using the cached block maps.
+            missing block maps are fetched from the master in one request
+            falls back to locate if the cache is disabled
+            reads of replicated arrays are spread across the copies
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :write   -- bool: route to every copy of replicated arrays
+
+        Return:
+            :located -- [(str, [[int, int, int, int, int]])]: [ (dtype, [[rank, key, start, stop, step]]) ]
+                one entry per slice, or per slice and copy for a write
+        """
+
+        if (not self.cache):
+            return self.locate(message, write)
+
+        missing = sorted(set(key for key, _, _, _ in message if key not in self.block_maps))
+        while missing:
+            placements = self.ask((6, missing))
+            for key, (dtype, copies, generation) in zip(missing, placements):
+                self.block_maps[key]  = (dtype, copies, copies[0].size)
+                self.generations[key] = generation
+            missing = [key for key in missing if key not in self.block_maps]
+
+        located = []
+        for key, start, stop, step in message:
+            dtype, copies, size = self.block_maps[key]
+            if (stop == -1 or stop > size):
+                stop = size
+            if (write):
+                located += [(dtype, split_blocks(blocks, [key, start, stop, step])) for blocks in copies]
+            else:
+                located.append((dtype, split_copies(copies, [key, start, stop, step], self.served)))
+        return located
+
+    def placement(self, key):
+        """
+        Gets the block maps of an array, from the cache if it is enabled.
+
+        Params:
+            :key    -- int: key (id) of the array
+
+        Return:
+            :dtype  -- str: numpy dtype string of the elements
+            :copies -- [BlockMap or Slot]: blocks of each copy of the array
+            :size   -- int: number of elements
+        """
+
+        if (self.cache and key in self.block_maps):
+            return self.block_maps[key]
+        dtype, copies, generation = self.ask((6, [key]))[0]
+        if (self.cache):
+            self.block_maps[key]  = (dtype, copies, copies[0].size)
+            self.generations[key] = generation
+        return dtype, copies, copies[0].size
+
+    def routed_generations(self, message, located, write=False):
+        """
+        Gets the generation of the block map of each routed slice.
+
+        Params:
+            :message     -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :located     -- [(str, [[int, int, int, int, int]])]: slices routed by route(message, write)
+            :write       -- bool: located holds every copy of the slices
+
+        Return:
+            :generations -- [int]: one generation per routed slice, None if the block maps are not cached
+        """
+
+        if (not self.cache):
+            return [None] * len(located)
+        return [self.generations[key] for key, _, _, _ in message
+                for _ in range(len(self.block_maps[key][1]) if (write) else 1)]
+
+    def direct_gather(self, keys, indices):
+        """
+        Gets elements of arrays at arbitrary indexes directly from the owning slaves.
+            Group indexes by slave with the cached block maps
+            Send one request and the local indexes to each slave
+            Post receives of all slave buffers, the elements are put in place on completion
+
+        Params:
+            :keys    -- [int]: keys (ids) of the arrays
+            :indices -- ndarray: int64 indexes, negative indexes count from the end
+
+        Return:
+            :future  -- Future: one array per requested key
+        """
+
+        tag      = self.next_tag()
+        result   = []
+        requests = []
+        expected = []
+        receives = []
+        for key in keys:
+            dtype, copies, size = self.placement(key)
+            wrapped = wrap_indices(indices, size)
+            if (wrapped is None):
+                self.handle_errors((18, -3))
+            array = np.empty(len(wrapped), dtype=dtype)
+            for rank, slave_key, positions, local in split_indices(least_served(copies, self.served), key, wrapped):
+                self.comm.send((18, slave_key, len(local), self.generations.get(key)), dest=rank, tag=tag)
+                self.comm.Send(local, dest=rank, tag=tag)
+                values = np.empty(len(local), dtype=dtype)
+                requests.append(self.comm.Irecv(values, source=rank, tag=tag))
+                expected.append(values.nbytes)
+                receives.append((array, positions, values))
+                self.served[rank] = self.served.get(rank, 0) + len(local)
+            result.append(array)
+
+        def merge():
+            for array, positions, values in receives:
+                array[positions] = values
+
+        return Future(self, requests=requests, value=result, op=18, merge=merge,
+                      retry=lambda missed: self.direct_gather(keys, indices), expected=expected)
+
+    def direct_scatter(self, keys, indices, value):
+        """
+        Sets elements of arrays at arbitrary indexes directly on the owning slaves.
+            Group indexes by slave with the cached block maps, for every copy
+            Send one request, the local indexes and the values to each slave
+            Post receives of the acknowledgements, the scatter is sent again if a slave rejects it as stale
+
+        Params:
+            :keys    -- [int]: keys (ids) of the arrays
+            :indices -- ndarray: int64 indexes, negative indexes count from the end
+            :value   -- scalar or array-like: value broadcasted or one value per index
+
+        Return:
+            :future  -- Future: completed once every slave applied the scatter
+        """
+
+        tag      = self.next_tag()
+        scalar   = np.ndim(value) == 0
+        requests = []
+        expected = []
+        for key in keys:
+            dtype, copies, size = self.placement(key)
+            wrapped = wrap_indices(indices, size)
+            if (wrapped is None):
+                self.handle_errors((19, -3))
+            if (not scalar):
+                values = np.asarray(value).astype(dtype, copy=False)
+            for blocks in copies:
+                for rank, slave_key, positions, local in split_indices(blocks, key, wrapped):
+                    self.comm.send((19, slave_key, len(local), value if (scalar) else None,
+                                    self.generations.get(key)), dest=rank, tag=tag)
+                    self.written.add(rank)
+                    requests.append(self.comm.Isend(local, dest=rank, tag=tag))
+                    if (not scalar):
+                        requests.append(self.comm.Isend(np.ascontiguousarray(values[positions]),
+                                                        dest=rank, tag=tag))
+                    requests.append(self.comm.Irecv(np.empty(1, dtype=np.uint8), source=rank, tag=tag))
+                    expected += [0] * (1 if (scalar) else 2) + [1]
+        # a scatter sets the same values when sent again, the whole scatter is resent
+        return Future(self, requests=requests, op=19, retry=lambda missed: self.direct_scatter(keys, indices, value),
+                      expected=expected)
+
+    def direct_update(self, target, indices, op, values, fetch):
+        """
+        Sends a read-modify-write update directly to the owning slaves.
+            Split slices or group indexes by slave with the cached block maps
+            Send one request and its buffers to each slave
+            Post receives of the values before the update if fetch, of the acknowledgements otherwise
+            Send again only the parts a slave rejects as stale, the others are already applied
+
+        Params:
+            :target  -- [ [int, int, int, int] ] or [int]: [ [key, start, stop, step] ], or keys if indices are given
+            :indices -- ndarray: int64 indexes, negative indexes count from the end, None to update slices
+            :op      -- str: update (see master.updates)
+            :values  -- [scalar or array-like]: operand, or expected and new values of a cas
+            :fetch   -- bool: get the values before the update
+
+        Return:
+            :future  -- Future: one array of values before the update per requested key if fetch
+        """
+
+        tag      = self.next_tag()
+        result   = []
+        requests = []
+        expected = []
+        receives = []
+        for item in target:
+            if (indices is None):
+                key, start, stop, step = item
+                dtype, copies, size    = self.placement(key)
+                request = [key, start, size if (stop == -1 or stop > size) else stop, step]
+                count   = slice_size(*request[1:])
+            else:
+                key                 = item
+                dtype, copies, size = self.placement(key)
+                wrapped = wrap_indices(indices, size)
+                if (wrapped is None):
+                    self.handle_errors((20, -3))
+                count   = len(wrapped)
+            if (any(np.ndim(value) != 0 and len(value) != count for value in values)):
+                self.handle_errors((20, -3))
+            array = np.empty(count, dtype=dtype)
+            for copy, blocks in enumerate(copies):
+                parts = update_parts(blocks, request) if (indices is None) else update_parts(blocks, key, wrapped)
+                self.written.update(part[0] for part in parts)
+                sent  = send_update(self.comm, dtype, parts, op, values, fetch and copy == 0, tag,
+                                    self.generations.get(key))
+                for (receive, _, old), (_, _, positions, _) in zip(sent, parts):
+                    # the part as an update of its own, to send it again with fresh block maps
+                    if (indices is None):
+                        elements = range(*request[1:])[positions]
+                        resend   = ([[key, elements.start, elements.stop, elements.step]], None)
+                    else:
+                        resend   = ([key], wrapped[positions])
+                    requests.append(receive)
+                    expected.append(1 if (old is None) else old.nbytes)
+                    receives.append((array, positions, old, resend))
+            result.append(array)
+
+        def merge():
+            for array, positions, old, _ in receives:
+                if (old is not None):
+                    array[positions] = old
+
+        def retry(missed):
+            resent = []
+            for (array, positions, old, (part_target, part_indices)), miss in zip(receives, missed):
+                if (miss):
+                    part_values = [value if (np.ndim(value) == 0) else np.asarray(value)[positions]
+                                   for value in values]
+                    resent.append((array, positions, self.direct_update(part_target, part_indices, op, part_values,
+                                                                        old is not None)))
+                elif (old is not None):
+                    array[positions] = old
+            for array, positions, future in resent:
+                old = future.result()
+                if (old is not None):
+                    array[positions] = old[0]
+            return Future(self, value=result if (fetch) else None, op=20)
+
+        return Future(self, requests=requests, value=result if (fetch) else None, op=20, merge=merge, retry=retry,
+                      expected=expected)
+
+    def direct_getitem(self, message, codec=None):
+        """
+        Gets requested slices directly from the owning slaves.
+            Route slices with the cached block maps
+            Send subrequests to all slaves
+            Post receives of all slave buffers into the result arrays,
+            or into buffers decoded on completion if a codec is given
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :codec   -- str: codec of the slave buffers (see codec.codecs), None for raw buffers
+
+        Return:
+            :future  -- Future: one array per requested key
+        """
+
+        located = self.route(message)
+        tag     = self.next_tag()
+        for generation, (_, queries) in zip(self.routed_generations(message, located), located):
+            for query in queries:
+                self.comm.send((2, query[1:], codec, generation), dest=query[0], tag=tag)
+
+        result   = []
+        requests = []
+        expected = []
+        messages = []
+        for dtype, queries in located:
+            sizes = [slice_size(*query[2:]) for query in queries]
+            array = np.empty(sum(sizes), dtype=dtype)
+            shift = 0
+            for query, size in zip(queries, sizes):
+                if (codec is None):
+                    requests.append(self.comm.Irecv(array[shift: shift + size], source=query[0], tag=tag))
+                    expected.append(size * array.itemsize)
+                else:
+                    buffer = np.empty(bound(size * array.itemsize), dtype=np.uint8)
+                    requests.append(self.comm.Irecv(buffer, source=query[0], tag=tag))
+                    expected.append(None)
+                    messages.append((buffer, array[shift: shift + size]))
+                shift += size
+            result.append(array)
+
+        def merge():
+            for buffer, out in messages:
+                decode(buffer, out)
+
+        return Future(self, requests=requests, value=result, op=2, merge=merge if (messages) else None,
+                      retry=lambda missed: self.direct_getitem(message, codec), expected=expected)
+
+    def direct_setitem(self, message, value, codec=None):
+        """
+        Sets requested slices directly on the owning slaves.
+            Route slices with the cached block maps
+            Check value size
+            Send subrequests and buffers to all slaves in parallel, each buffer encoded on its own
+            Post receives of the acknowledgements, the set is sent again if a slave rejects it as stale
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :value   -- scalar or array-like: value to be set
+            :codec   -- str: codec of the buffers (see codec.codecs), None for raw buffers
+
+        Return:
+            :future  -- Future: completed once every slave applied the set
+        """
+
+        located = self.route(message, write=True)
+        tag     = self.next_tag()
+        scalar  = np.ndim(value) == 0
+        if (not scalar):
+            value = np.ascontiguousarray(value)
+            for _, queries in located:
+                if (len(value) != sum(slice_size(*query[2:]) for query in queries)):
+                    self.handle_errors((3, -3))
+        self.written.update(query[0] for _, queries in located for query in queries)
+
+        requests = []
+        expected = []
+        for generation, (dtype, queries) in zip(self.routed_generations(message, located, write=True), located):
+            array = value if (scalar) else value.astype(dtype, copy=False)
+            shift = 0
+            for query in queries:
+                size = slice_size(*query[2:])
+                if (scalar):
+                    self.comm.send((3, query[1:], value, None, generation), dest=query[0], tag=tag)
+                else:
+                    self.comm.send((3, query[1:], None, codec, generation), dest=query[0], tag=tag)
+                    buffer = array[shift: shift + size] if (codec is None) else encode(array[shift: shift + size], codec)
+                    requests.append(self.comm.Isend(buffer, dest=query[0], tag=tag))
+                    expected.append(0)
+                requests.append(self.comm.Irecv(np.empty(1, dtype=np.uint8), source=query[0], tag=tag))
+                expected.append(1)
+                shift += size
+        # a set writes the same values when sent again, the whole set is resent
+        return Future(self, requests=requests, op=3, retry=lambda missed: self.direct_setitem(message, value, codec),
+                      expected=expected)
+
+    def window_offsets(self, queries):
+        """
+        Gets the place of the requested slave arrays in the windows of the slaves.
+            missing offsets are asked to the slaves in one message each,
+            the slaves sent writes by messages answer after applying them
+
+        Params:
+            :queries -- [[int, int, int, int, int]]: [[rank, key, start, stop, step]]
+
+        Return:
+            :placed  -- bool: True if every array is in a window
+        """
+
+        asked = {rank: [] for rank in self.written.intersection(query[0] for query in queries)}
+        for rank, key, _, _, _ in queries:
+            if ((rank, key) not in self.offsets):
+                keys = asked.setdefault(rank, [])
+                if (key not in keys):
+                    keys.append(key)
+        if (asked):
+            tag = self.next_tag()
+            for rank, keys in asked.items():
+                self.comm.send((22, keys), dest=rank, tag=tag)
+            for rank, keys in asked.items():
+                offsets = self.comm.recv(source=rank, tag=tag)
+                self.offsets.update(((rank, key), offset) for key, offset in zip(keys, offsets))
+            self.written.difference_update(asked)
+        return all(self.offsets[(query[0], query[1])] is not None for query in queries)
+
+    def window_lock(self, message, located, write=False):
+        """
+        Locks the windows of the slaves of routed slices and checks the headers of their arrays.
+            a header holds the slave key and the generation of the array, which the
+            slaves change before the layout of the array changes, stale cached maps
+            and offsets are dropped so that the request is routed again by messages
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :located -- [(str, [[int, int, int, int, int]])]: slices routed by route(message, write)
+            :write   -- bool: located holds every copy of the slices
+
+        Return:
+            :ranks   -- set: ranks of the locked slaves, None if an array is not in a window or is stale
+        """
+
+        checks = {}
+        for generation, (_, queries) in zip(self.routed_generations(message, located, write), located):
+            if (generation is None):
+                return None
+            for query in queries:
+                checks[(query[0], query[1])] = generation
+        if (not self.window_offsets([query for _, queries in located for query in queries])):
+            return None
+
+        ranks = set(rank for rank, _ in checks)
+        self.window.lock(ranks)
+        if (all(self.window.header(rank, self.offsets[(rank, key)]) == (key, generation)
+                for (rank, key), generation in checks.items())):
+            return ranks
+        self.window.unlock(ranks)
+        self.block_maps  = {}
+        self.generations = {}
+        self.offsets     = {}
+        return None
+
+    def window_getitem(self, message):
+        """
+        Gets requested slices from the windows of the owning slaves, without a message to the slaves.
+            Route slices with the cached block maps
+            Lock the slave windows and check the array headers
+            Read each slice from its slave window into the result arrays
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+
+        Return:
+            :future  -- Future: one array per requested key, None if an array is not in a window or is stale
+        """
+
+        located = self.route(message)
+        ranks   = self.window_lock(message, located)
+        if (ranks is None):
+            return None
+
+        result = []
+        for dtype, queries in located:
+            sizes = [slice_size(*query[2:]) for query in queries]
+            array = np.empty(sum(sizes), dtype=dtype)
+            shift = 0
+            for query, size in zip(queries, sizes):
+                if (size):
+                    self.window.get(query[0], self.offsets[(query[0], query[1])], array[shift: shift + size],
+                                    *query[2:])
+                shift += size
+            result.append(array)
+        self.window.unlock(ranks)
+        return Future(self, value=result, op=2)
+
+    def window_setitem(self, message, value):
+        """
+        Sets requested slices in the windows of the owning slaves, without a message to the slaves.
+            Route slices with the cached block maps, to every copy
+            Check value size
+            Lock the slave windows and check the array headers
+            Write each slice to its slave window
+
+        Params:
+            :message -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :value   -- scalar or array-like: value to be set
+
+        Return:
+            :future  -- Future: completed, None if an array is not in a window or is stale
+        """
+
+        located = self.route(message, write=True)
+        scalar  = np.ndim(value) == 0
+        if (not scalar):
+            value = np.ascontiguousarray(value)
+            for _, queries in located:
+                if (len(value) != sum(slice_size(*query[2:]) for query in queries)):
+                    self.handle_errors((3, -3))
+        ranks = self.window_lock(message, located, write=True)
+        if (ranks is None):
+            return None
+
+        for dtype, queries in located:
+            dtype = np.dtype(dtype)
+            array = value if (scalar) else value.astype(dtype, copy=False)
+            shift = 0
+            for query in queries:
+                size = slice_size(*query[2:])
+                if (size):
+                    self.window.put(query[0], self.offsets[(query[0], query[1])], dtype, *query[2:],
+                                    array if (scalar) else array[shift: shift + size])
+                shift += size
+        self.window.unlock(ranks)
+        return Future(self, op=3)
+
+    def reduce(self, key, op, bins=10, value_range=None):
+        """
+        Reduces requested items on the slaves.
+            each slave reduces its part of the slices and returns one partial
+            the partials are combined by the master, or by the client in direct mode
+            slices are not limited by max_size
+
+        Params:
+            :key         -- int or tuple or slice: requested key
+            :op          -- str: sum, min, max, count, argmin, argmax or histogram
+            :bins        -- int: number of bins of a histogram
+            :value_range -- (float, float): range of a histogram, min and max of the slice if None
+
+        Return:
+            :result      -- []: one reduction per requested key
+                                argmin/argmax are indexes in the slice
+                                histogram is (counts, bin edges) as in numpy
+        """
+
         message = self.parse_key(key)
-        self.comm.send((3, message, value), dest=1)
-        response = self.comm.recv(source=1)
-        self.handle_errors(response)
+        args    = (bins, value_range)
+        if (not self.direct):
+            return self.ask((7, message, op, args))
+
+        if (op not in reductions):
+            self.handle_errors((7, -3))
+        try:
+            tag = self.next_tag()
+            return [reduce_queries(self.comm, queries, op, args, tag)
+                    for _, queries in self.route(message)]
+        except KeyError:
+            # an array was deleted by another client, refresh block maps
+            self.block_maps = {}
+            self.generations = {}
+            self.offsets = {}
+            tag = self.next_tag()
+            return [reduce_queries(self.comm, queries, op, args, tag)
+                    for _, queries in self.route(message)]
+
+    def update_async(self, key, op, values, fetch=False):
+        """
+        Applies a read-modify-write update on the slaves without waiting.
+            Parse key
+            Send request to Master, or to the slaves in direct mode if the arrays have no replicas
+            (an update of every copy goes through the master so that all copies see the same order)
+
+        Params:
+            :key    -- int or tuple or slice: requested key, key[1] can be indexes as for a gather
+            :op     -- str: add, max, min or cas (see master.updates)
+            :values -- [scalar or array-like]: operand, or expected and new values of a cas
+            :fetch  -- bool: get the values before the update
+
+        Return:
+            :future -- Future: one array of values before the update per requested key if fetch,
+                               completed once every slave applied the update
+        """
+
+        if (op not in updates):
+            self.handle_errors((20, -3))
+        indices = index_array(key[1]) if (type(key) == tuple) else None
+        if (indices is None):
+            target = self.parse_key(key)
+            keys   = [request[0] for request in target]
+        else:
+            target = keys = key_to_list(key[0])
+        if (self.direct and all(len(self.placement(key)[1]) == 1 for key in keys)):
+            return self.direct_update(target, indices, op, values, fetch)
+
+        descriptors = []
+        buffers     = []
+        for value in values:
+            if (np.ndim(value) == 0):
+                descriptors.append((value, None, 0))
+            else:
+                value = np.ascontiguousarray(value)
+                descriptors.append((None, value.dtype.str, len(value)))
+                buffers.append(value)
+        if (indices is None):
+            return self.submit((20, target, op, descriptors, None, fetch), *buffers)
+        return self.submit((20, target, op, descriptors, len(indices), fetch), *buffers, indices)
+
+    def accumulate(self, key, value, op="add"):
+        """
+        Combines requested items with value on the slaves, in one round trip.
+            memory.accumulate(key, value) is memory[key] += value without a get and
+            without a race with other clients, "max" and "min" keep the largest or smallest
+
+        Params:
+            :key   -- int or tuple or slice: requested key, key[1] can be indexes,
+                                             repeated indexes are all applied (histograms)
+            :value -- scalar or array-like: operand broadcasted or one per element
+            :op    -- str: add, max or min
+        """
+
+        self.update_async(key, op, [value]).result()
+
+    def add(self, key, value):
+        """
+        Adds value to requested items on the slaves (see accumulate).
+
+        Params:
+            :key   -- int or tuple or slice: requested key
+            :value -- scalar or array-like: value added, broadcasted or one per element
+        """
+
+        self.accumulate(key, value, "add")
+
+    def fetch_add(self, key, value):
+        """
+        Adds value to requested items and gets their values before the addition.
+            with repeated indexes every addition is applied and each gets the value
+            before the whole request
+
+        Params:
+            :key    -- int or tuple or slice: requested key
+            :value  -- scalar or array-like: value added, broadcasted or one per element
+
+        Return:
+            :result -- [ndarray]: one array of values before the addition per requested key
+        """
+
+        return self.update_async(key, "add", [value], True).result()
+
+    def cas(self, key, expected, new):
+        """
+        Compare and swap: sets the requested items equal to expected to new.
+            an item was swapped if its returned value equals expected,
+            indexes must be distinct
+
+        Params:
+            :key      -- int or tuple or slice: requested key
+            :expected -- scalar or array-like: expected value, broadcasted or one per element
+            :new      -- scalar or array-like: new value, broadcasted or one per element
+
+        Return:
+            :result   -- [ndarray]: one array of values before the swap per requested key
+        """
+
+        return self.update_async(key, "cas", [expected, new], True).result()
+
+    def sort(self, key):
+        """
+        Sorts an array in place.
+            the slaves sort their parts and exchange buckets between them,
+            no data goes through the master or the client
+
+        Params:
+            :key -- int: key (id) of the array to be sorted
+        """
+
+        self.ask((8, key))
+
+    def fill(self, key, value):
+        """
+        Sets every element of an array to value, on the slaves.
+
+        Params:
+            :key   -- int: key (id) of the array
+            :value -- scalar: value of the elements
+        """
+
+        self.ask((13, key, "fill", (value, )))
+
+    def arange(self, key, start=0, step=1):
+        """
+        Sets element i of an array to start + i * step, on the slaves.
+
+        Params:
+            :key   -- int: key (id) of the array
+            :start -- number: value of the first element
+            :step  -- number: difference between two elements
+        """
+
+        self.ask((13, key, "arange", (start, step)))
+
+    def random(self, key, seed, low=0, high=1):
+        """
+        Fills an array with uniform random values in [low, high), on the slaves.
+            integer arrays get integers, the values only depend on the seed,
+            not on the number of slaves or the placement of the array
+
+        Params:
+            :key   -- int: key (id) of the array
+            :seed  -- int: seed of the values
+            :low   -- number: lowest value
+            :high  -- number: highest value (excluded)
+        """
+
+        self.ask((13, key, "random", (seed, low, high)))
+
+    def load(self, path, dtype=None, policy=None):
+        """
+        Allocates an array and fills it from a binary array file (see binfile).
+            each slave reads its own part of the file
+
+        Params:
+            :path   -- str: path of the file, visible by all slaves
+            :dtype  -- numpy dtype: type of the array elements, dtype of the file if None
+            :policy -- str: placement policy (see Master.policies), master default if None
+
+        Return:
+            :key    -- int: key identifying the loaded array
+        """
+
+        dtype = None if (dtype is None) else np.dtype(dtype).str
+        return self.ask((9, os.path.abspath(path), dtype, policy))
+
+    def dump(self, key, path):
+        """
+        Writes an array to a binary array file (see binfile).
+            each slave writes its own part of the file
+
+        Params:
+            :key  -- int: key (id) of the array
+            :path -- str: path of the file, visible by all slaves
+        """
+
+        self.ask((10, key, os.path.abspath(path)))
+
+    def checkpoint(self, directory, incremental=False):
+        """
+        Writes the whole memory to a directory, restored by launch(..., restore=directory)
+            each slave writes its own arrays to its own file in parallel
+
+        Params:
+            :directory   -- str: checkpoint directory, visible by all slaves
+            :incremental -- bool: only write pages modified since the last checkpoint
+                                  to the same directory
+        """
+
+        self.ask((11, os.path.abspath(directory), incremental))
+
+    def stats(self):
+        """
+        Gets the counters of this client, the master and every slave
+            for each opcode the client latency includes the time the request
+            waited in the master queue, estimated by wait_us = client mean - master mean
+
+        Return:
+            :stats -- {str: any}: {"client": latency of each opcode,
+                                   "master": service time of each opcode, bytes, split_request
+                                             and merge_responses times, occupancy of each slave,
+                                   "slaves": service time of each opcode, bytes, storage}
+        """
+
+        stats  = self.ask((12, ))
+        client = self.counters.summary()
+        for op, summary in client["ops"].items():
+            served = stats["master"]["ops"].get(op)
+            if (served is not None):
+                summary["wait_us"] = max(0.0, summary["mean_us"] - served["mean_us"])
+        stats["client"] = client
+        return stats
 
     def __delitem__(self, key):
         """
@@ -157,32 +1526,75 @@ class Manager:
         if (type(key) == tuple):
             self.handle_errors((4, -3))
 
-        message  = self.parse_key(key)
-        self.comm.send((4, message), dest=1)
-        response = self.comm.recv(source=1)
-        self.handle_errors(response)
+        message = self.parse_key(key)
+        self.ask((4, message))
 
-    def close(self):
-        self.comm.send((0, ), dest = 1)
+    def close(self, stats=None):
+        """
+        Receives pending responses and closes all machines.
+
+        Params:
+            :stats -- str: path of a JSON file where the counters are dumped (see stats)
+        """
 
-def launch(max_size=None, verbose=0):
+        while self.pending:
+            self.receive(self.pending[-1])
+        if (stats is not None):
+            with open(stats, "w") as f:
+                json.dump(self.stats(), f, indent=1)
+        self.comm.send((0, ), dest=self.master)
+
+def launch(max_size=None, verbose=0, direct=False, cache=True, policy="first_fit",
+           stripe_unit=1024, clients=1, restore=None, disk_size=0, spill_dir=None, slab_max=slab_max,
+           codec=None, window=False):
     """
     Launch all machines
+        ranks [0, clients) are clients, the next rank is the master, the others are slaves
 
     Params:
-        :max_size -- int: max_size of each machine
-        :verbose  -- int: level of verbose
+        :max_size    -- int: max_size of each machine
+        :verbose     -- int: level of verbose
+        :direct      -- bool: exchange data directly with the slaves,
+                              the master only resolves placement
+        :cache       -- bool: cache block maps to route direct requests on the client
+        :policy      -- str or function: default placement policy of the master
+        :stripe_unit -- int: stripe size in elements of the round_robin policy
+        :clients     -- int: number of client ranks
+        :restore     -- str: checkpoint directory to restore the memory from
+        :disk_size   -- int: number of elements each slave may spill to local disk
+                              once max_size elements are in RAM
+        :spill_dir   -- str: local directory of the spill files, temporary directory if None
+        :slab_max    -- int: largest array packed in a slab, 0 to give every array its own blocks
+        :codec       -- str: default codec of the gets and sets of the clients (see codec.codecs),
+                              None for raw buffers
+        :window      -- bool: place the arrays of the slaves in MPI windows of max_size 8 bytes
+                              elements that direct clients read and write one-sided (see window)
 
     Return:
-        :manager  -- Manager: an instance of the memory manager 
+        :manager     -- Manager: an instance of the memory manager 
     """
     
-    rank = MPI.COMM_WORLD.Get_rank()
+    rank    = MPI.COMM_WORLD.Get_rank()
+    color   = 0 if (rank < clients) else MPI.UNDEFINED
+    comm    = MPI.COMM_WORLD.Split(color, rank)
+    peers   = MPI.COMM_WORLD.Dup()
+    windows = open_window(max_size * window_itemsize if (rank > clients) else 0) if (window) else None
 
-    if (rank == 0):
-        return Manager()
-    elif rank == 1:
-        Master(max_size).run(verbose)
+    if (rank < clients):
+        manager = Manager(direct, cache, clients, comm, codec, None if (windows is None) else Window(*windows))
+    elif rank == clients:
+        machine = Master(max_size, policy, stripe_unit, clients, disk_size, slab_max)
     else:
-        Slave(rank, max_size).run(verbose)
+        machine = Slave(rank, max_size, clients + 1, peers, disk_size, spill_dir,
+                        None if (windows is None) else Arena(*windows[1:]))
+
+    if (restore is not None):
+        # clients wait for every machine to be restored before sending requests
+        if (rank >= clients):
+            machine.restore(os.path.abspath(restore))
+        MPI.COMM_WORLD.Barrier()
+
+    if (rank < clients):
+        return manager
+    machine.run(verbose)
     exit(0)
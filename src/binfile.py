@@ -0,0 +1,124 @@
+import os
+import struct
+
+import numpy as np
+
+"""
+Binary array file:
+    header (32 bytes): magic "DMEM", version (uint32), dtype (8 bytes), size (uint64), padding
+    data: size raw little-endian elements
+"""
+
+MAGIC       = b"DMEM"
+VERSION     = 1
+HEADER      = struct.Struct("<4sI8sQ8x")
+HEADER_SIZE = HEADER.size
+
+
+def little_endian(dtype):
+    """
+    Gets the little-endian version of a dtype
+
+    Params:
+        :dtype -- numpy dtype: type of the elements
+
+    Return:
+        :dtype -- numpy dtype: little-endian type of the elements
+    """
+
+    dtype = np.dtype(dtype)
+    return dtype.newbyteorder("<") if (dtype.byteorder == ">") else dtype
+
+
+def write_header(path, dtype, size):
+    """
+    Creates a binary array file of the right length with its header
+
+    Params:
+        :path  -- str: path of the file
+        :dtype -- numpy dtype: type of the elements
+        :size  -- int: number of elements
+    """
+
+    dtype = little_endian(dtype)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, dtype.str.encode(), size))
+        f.truncate(HEADER_SIZE + size * dtype.itemsize)
+
+
+def read_header(path):
+    """
+    Reads the header of a binary array file
+
+    Params:
+        :path  -- str: path of the file
+
+    Return:
+        :dtype -- numpy dtype: type of the elements
+        :size  -- int: number of elements
+            None if the file is not a binary array file or is shorter than its header says
+    """
+
+    try:
+        with open(path, "rb") as f:
+            magic, version, dtype, size = HEADER.unpack(f.read(HEADER_SIZE))
+            length = os.fstat(f.fileno()).st_size
+        if (magic != MAGIC or version != VERSION):
+            return None
+        dtype = np.dtype(dtype.rstrip(b"\0").decode())
+    except (OSError, struct.error, UnicodeDecodeError, TypeError):
+        return None
+    if (length < HEADER_SIZE + size * dtype.itemsize):
+        return None
+    return dtype, size
+
+
+def open_range(path, dtype, start, length, mode="r"):
+    """
+    Maps a range of elements of a binary array file
+
+    Params:
+        :path   -- str: path of the file
+        :dtype  -- numpy dtype: type of the elements in the file
+        :start  -- int: first element
+        :length -- int: number of elements
+        :mode   -- str: "r" to read, "r+" to write
+
+    Return:
+        :array  -- numpy.memmap: mapped elements
+    """
+
+    dtype = np.dtype(dtype)
+    return np.memmap(path, dtype=dtype, mode=mode,
+                     offset=HEADER_SIZE + start * dtype.itemsize, shape=(length, ))
+
+
+def save(path, array):
+    """
+    Writes an array to a binary array file
+
+    Params:
+        :path  -- str: path of the file
+        :array -- ndarray: array to write
+    """
+
+    array = np.ascontiguousarray(array, dtype=little_endian(array.dtype))
+    write_header(path, array.dtype, len(array))
+    with open(path, "r+b") as f:
+        f.seek(HEADER_SIZE)
+        array.tofile(f)
+
+
+def load(path):
+    """
+    Reads a whole binary array file
+
+    Params:
+        :path  -- str: path of the file
+
+    Return:
+        :array -- ndarray: array in the file
+    """
+
+    dtype, size = read_header(path)
+    return np.fromfile(path, dtype=dtype, count=size, offset=HEADER_SIZE)
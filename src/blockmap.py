@@ -0,0 +1,92 @@
+import numpy as np
+
+"""
+Block map of an array:
+    the blocks (rank, start, offset) are stored in one numpy table sorted by start,
+    a slice is resolved with a binary search on the starts so that its cost
+    depends on the number of blocks it covers, not on the number of blocks
+"""
+
+
+class BlockMap:
+    def __init__(self, blocks=()):
+        blocks = sorted(blocks, key=lambda block: block[1])
+        # one row per block: rank, start, offset, start on its slave
+        self.table = np.zeros((len(blocks), 4), dtype=np.int64)
+        # blocks of an array on the same slave are stored one after the other
+        local = {}
+        for i, (rank, start, offset) in enumerate(blocks):
+            self.table[i] = (rank, start, offset, local.get(rank, 0))
+            local[rank] = local.get(rank, 0) + offset
+        self.starts = self.table[:, 1].copy()
+        self.size = int(self.table[:, 2].sum())
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        return (tuple(row[:3]) for row in self.table.tolist())
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return "BlockMap({})".format(list(self))
+
+    @property
+    def nbytes(self):
+        """
+        Return:
+            :nbytes -- int: bytes used by the arrays of the map
+        """
+
+        return self.table.nbytes + self.starts.nbytes
+
+    def split(self, request):
+        """
+        Splits a request on the blocks of the array, one subrequest per block.
+
+        Params:
+            :request    -- [int, int, int, int]: [key, start, stop, step]
+
+        Return:
+            :subrequest -- [[int, int, int, int, int]]: [[rank, key, start, stop, step]]
+        """
+
+        key, start_mem, stop_mem, step_mem = request
+        if (len(self.table) == 0 or stop_mem <= start_mem):
+            return []
+        # blocks [first, last) intersect [start_mem, stop_mem)
+        first = max(0, int(self.starts.searchsorted(start_mem, "right")) - 1)
+        last  = int(self.starts.searchsorted(stop_mem, "left"))
+        subrequests = []
+        for rank_block, start_block, offset_block, local_block in self.table[first:last].tolist():
+            stop_block = start_block + offset_block
+            if (stop_block <= start_mem):
+                continue
+            # first requested index stored in this block
+            index = max(start_mem, start_block)
+            index = start_mem + (index - start_mem + step_mem - 1) // step_mem * step_mem
+            if (index >= min(stop_mem, stop_block)):
+                continue
+            subrequests.append([rank_block,
+                                key,
+                                local_block + index - start_block,
+                                local_block + min(stop_mem, stop_block) - start_block,
+                                step_mem])
+        return subrequests
+
+    def locate(self, indices):
+        """
+        Finds the slave and the local index of elements of the array.
+
+        Params:
+            :indices -- ndarray: indexes of the elements, in [0, size)
+
+        Return:
+            :ranks   -- ndarray: rank of the slave storing each element
+            :local   -- ndarray: index of each element in the array of its slave
+        """
+
+        rows = self.starts.searchsorted(indices, "right") - 1
+        return self.table[rows, 0], self.table[rows, 3] + indices - self.table[rows, 1]
@@ -0,0 +1,141 @@
+import zlib
+
+import numpy as np
+
+"""
+Encoding of the arrays sent between the machines:
+    a codec is a transform, optionally followed by zlib ("narrow+zlib"),
+        raw    -- elements as they are
+        narrow -- integers minus their minimum, in the narrowest unsigned integers holding them
+        delta  -- sorted integers as differences with the previous element, narrowed,
+                  unsorted integers are narrowed
+    floats are always sent raw before compression, a transform or a compression
+    that does not make the message smaller is skipped. A message is a header
+    followed by the payload and is never longer than bound(nbytes), so a
+    receiver can post its receive before knowing the encoded size.
+"""
+
+codecs = ("raw", "narrow", "delta", "zlib", "narrow+zlib", "delta+zlib")
+
+# header: transform, width of the narrowed integers, bits of the base, length of the compressed payload (0 if not compressed)
+header_size = 32
+
+# zlib level, fast compression
+level = 1
+
+
+def bound(nbytes):
+    """
+    Gets the largest encoded size of an array
+
+    Params:
+        :nbytes -- int: bytes of the array
+
+    Return:
+        :nbytes -- int: bytes of the largest message
+    """
+
+    return header_size + nbytes
+
+
+def width(span):
+    """
+    Gets the narrowest unsigned integer type holding [0, span]
+
+    Params:
+        :span  -- int: largest value
+
+    Return:
+        :dtype -- numpy dtype: uint8, uint16, uint32 or uint64
+    """
+
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if (span <= np.iinfo(dtype).max):
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+def encode(array, codec):
+    """
+    Encodes an array into a message
+
+    Params:
+        :array   -- ndarray: elements to send
+        :codec   -- str: codec (see codecs)
+
+    Return:
+        :message -- ndarray: uint8 header and payload, at most bound(array.nbytes) bytes
+    """
+
+    transform, _, compress = codec.partition("+")
+    if (transform == "zlib"):
+        transform, compress = "raw", "zlib"
+    array    = np.ascontiguousarray(array)
+    unsigned = np.dtype("u{}".format(array.dtype.itemsize)) if (array.dtype.kind in "iu") else None
+    header   = np.zeros(4, dtype=np.uint64)
+    payload  = array.view(np.uint8)
+
+    if (transform != "raw" and unsigned is not None and len(array) > 1):
+        # arithmetic on the unsigned view wraps around, the offsets and gaps are exact,
+        # the unsigned view is in native byte order
+        if (not array.dtype.isnative):
+            array = array.astype(array.dtype.newbyteorder("="))
+        low  = array.min()
+        base = low.view(unsigned)
+        if (transform == "delta" and (array[1:] >= array[:-1]).all()):
+            gaps  = np.diff(array.view(unsigned))
+            dtype = width(int(gaps.max()))
+            if (dtype.itemsize < array.dtype.itemsize):
+                header[:3] = (2, dtype.itemsize, base)
+                payload    = gaps.astype(dtype).view(np.uint8)
+        else:
+            dtype = width(int(array.max()) - int(low))
+            if (dtype.itemsize < array.dtype.itemsize):
+                header[:3] = (1, dtype.itemsize, base)
+                payload    = (array.view(unsigned) - base).astype(dtype).view(np.uint8)
+
+    if (compress):
+        compressed = zlib.compress(payload, level)
+        if (0 < len(compressed) < len(payload)):
+            header[3] = len(compressed)
+            payload   = np.frombuffer(compressed, dtype=np.uint8)
+
+    message = np.empty(header_size + len(payload), dtype=np.uint8)
+    message[:header_size] = header.view(np.uint8)
+    message[header_size:] = payload
+    return message
+
+
+def decode(message, out):
+    """
+    Decodes a message into an array
+
+    Params:
+        :message -- ndarray: uint8 buffer starting with the message, may be longer
+        :out     -- ndarray: array receiving the elements, of the size and dtype of the encoded array
+    """
+
+    transform, itemsize, base, compressed = (int(value) for value in message[:header_size].view(np.uint64))
+    if (transform == 0):
+        length = out.nbytes
+    else:
+        length = itemsize * (len(out) - (transform == 2))
+    payload = message[header_size: header_size + (compressed if (compressed) else length)]
+    if (compressed):
+        payload = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+
+    if (transform == 0):
+        out.view(np.uint8)[:] = payload
+        return
+    # the transforms are computed in native byte order
+    native   = out if (out.dtype.isnative) else np.empty(len(out), dtype=out.dtype.newbyteorder("="))
+    unsigned = np.dtype("u{}".format(out.dtype.itemsize))
+    values   = payload.view(np.dtype("u{}".format(itemsize))).astype(unsigned)
+    start    = np.uint64(base).astype(unsigned)
+    if (transform == 1):
+        native.view(unsigned)[:] = values + start
+    else:
+        native.view(unsigned)[0]  = start
+        native.view(unsigned)[1:] = start + np.cumsum(values, dtype=unsigned)
+    if (native is not out):
+        out[:] = native
@@ -2,15 +2,22 @@ import sys
 
 from numpy import random
 
+import binfile
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Format: %s size seed" % sys.argv[0])
+    if len(sys.argv) not in (3, 4):
+        print("Format: %s size seed [txt|bin]" % sys.argv[0])
         exit(1)
 
-    size = int(sys.argv[1])
-    seed = int(sys.argv[2])
+    size        = int(sys.argv[1])
+    seed        = int(sys.argv[2])
+    file_format = sys.argv[3] if (len(sys.argv) == 4) else "txt"
 
     random.seed(seed)
+    if file_format == "bin":
+        binfile.save("./random.bin", random.randint(size, size=size))
+        exit(0)
+
     f    = open("./random.txt", "w")
     buf  = "%d\n" % size
     f.write(buf)
@@ -9,39 +9,14 @@ if __name__ == "__main__":
 
     node_size = int(sys.argv[1])
     verbose   = int(sys.argv[2])
-    memory    = allocator.launch(node_size, verbose)
+    memory    = allocator.launch(node_size, verbose, direct=True)
 
-    # Get data from file and set memory by groups of node_size
-    f           = open("random.txt", "r")
-    memory_size = int(f.readline())
-    memory.malloc(memory_size)
-    for i in range(memory_size // node_size):
-        array_size = min(node_size, memory_size - i * node_size)
-        array      = []
-        for j in range(array_size):
-            array.append(int(f.readline()))
-        memory[0, i * node_size: i * node_size + array_size] = array
-    f.close()
+    # Each slave reads its part of the file
+    key = memory.load("random.bin")
 
-    # Sort the array
-    flag  = False
-    shift = node_size // 2
-    while not flag:
-        flag = True
-        for i in range(2 * memory_size // node_size - 2):
-            array        = memory[0, i * shift: i * shift + node_size][0]
-            sorted_array = sorted(array)
-            if array != sorted_array:
-                flag = False
-                memory[0, i * shift: i * shift + node_size] = sorted_array
+    # Sort the array on the slaves
+    memory.sort(key)
 
-    # Get the array back and write it to new file
-    f           = open("sorted.txt", "w")
-    f.write("%d\n" % memory_size)
-    for i in range(memory_size // node_size):
-        array_size = min(node_size, memory_size - i * node_size)
-        array = memory[0, i * node_size: i * node_size + array_size][0]
-        for val in array:
-            f.write("%d\n" % val)
-    f.close()
+    # Each slave writes its part of the sorted file
+    memory.dump(key, "sorted.bin")
     memory.close()
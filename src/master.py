@@ -1,219 +1,1732 @@
+from functools import partial
+import os
+import pickle
+import time
+
 from mpi4py import MPI
+import numpy as np
+
+import binfile
+from blockmap import BlockMap
+from codec import bound, codecs, decode, encode
+from slab import Slabs, Slot, size_class, slab_max, slab_size
+from stats import Stats
+from transfer import Outbox, Transfer, large_transfer, max_transfers, next_request
+
+
+def slice_size(start, stop, step):
+    """
+    Gets the number of elements in [start:stop:step]
+
+    Params:
+        :start -- int: first index
+        :stop  -- int: last index (excluded)
+        :step  -- int: step between indexes
+
+    Return:
+        :size  -- int: number of elements
+    """
+
+    if (stop <= start):
+        return 0
+    return (stop - start) // step + bool((stop - start) % step)
+
+
+def split_blocks(blocks, request):
+    """
+    Splits a request on the blocks of an array, one subrequest per block.
+        a BlockMap only visits the blocks covered by the request, a list is scanned
+        a Slot translates the request into a request on its slab
+
+    Params:
+        :blocks     -- BlockMap, Slot or [(int, int, int)]: blocks of the array [(rank, start, offset)]
+        :request    -- [int, int, int, int]: [key, start, stop, step]
+
+    Return:
+        :subrequest -- [[int, int, int, int, int]]: [[rank, key, start, stop, step]]
+    """
+
+    if (isinstance(blocks, (BlockMap, Slot))):
+        return blocks.split(request)
+    key, start_mem, stop_mem, step_mem = request
+    subrequests = []
+    # blocks of an array on the same slave are stored one after the other
+    local = {}
+    for rank_block, start_block, offset_block in blocks:
+        stop_block  = start_block + offset_block
+        local_block = local.get(rank_block, 0)
+        local[rank_block] = local_block + offset_block
+        if start_mem < stop_block and start_block < stop_mem:
+            # first requested index stored in this block
+            first = max(start_mem, start_block)
+            first = start_mem + (first - start_mem + step_mem - 1) // step_mem * step_mem
+            if first >= min(stop_mem, stop_block):
+                continue
+            # append request in slave coordinates to return array
+            subrequests.append([rank_block,
+                            key,
+                            local_block + first - start_block,
+                            local_block + min(stop_mem, stop_block) - start_block,
+                            step_mem])
+    return subrequests
+
+
+# smallest part of a read sent to one copy of a replicated array
+min_part = 4096
+
+
+def split_copies(copies, request, served):
+    """
+    Splits a read request on the copies of an array.
+        the slice is cut in up to one part per copy, each part is read
+        from the copy whose slaves served the fewest elements so far
+
+    Params:
+        :copies     -- [[(int, int, int)]]: blocks of each copy of the array [[(rank, start, offset)]]
+        :request    -- [int, int, int, int]: [key, start, stop, step]
+        :served     -- {int: int}: {rank: elements read}, updated with the chosen subrequests
+
+    Return:
+        :subrequest -- [[int, int, int, int, int]]: [[rank, key, start, stop, step]]
+    """
+
+    if (len(copies) == 1):
+        return split_blocks(copies[0], request)
+
+    key, start, stop, step = request
+    count = slice_size(start, stop, step)
+    parts = max(1, min(len(copies), count // min_part))
+    subrequests = []
+    for i in range(parts):
+        first = start + count * i // parts * step
+        last  = stop if (i == parts - 1) else start + count * (i + 1) // parts * step
+        candidates = [split_blocks(blocks, [key, first, last, step]) for blocks in copies]
+        chosen     = min(candidates, key=lambda queries: max([served.get(query[0], 0) for query in queries] or [0]))
+        for query in chosen:
+            served[query[0]] = served.get(query[0], 0) + slice_size(*query[2:])
+        subrequests += chosen
+    return subrequests
+
+
+def pair_queries(sources, targets):
+    """
+    Pairs the subrequests of a read with the subrequests of a write of the same number of elements.
+        subrequests are cut so that each part of the read goes to one part of the write
+
+    Params:
+        :sources -- [[int, int, int, int, int]]: subrequests of the read [[rank, key, start, stop, step]]
+        :targets -- [[int, int, int, int, int]]: subrequests of the write [[rank, key, start, stop, step]]
+
+    Return:
+        :pairs   -- [([int, ...], [int, ...])]: [(subrequest of the read, subrequest of the write)],
+                    of the same number of elements, in the order of the elements
+    """
+
+    pairs = []
+    i, j  = 0, 0
+    # elements of sources[i] and targets[j] already paired
+    read, written = 0, 0
+    while (i < len(sources) and j < len(targets)):
+        source, target = sources[i], targets[j]
+        count = min(slice_size(*source[2:]) - read, slice_size(*target[2:]) - written)
+        first = source[2] + read * source[4]
+        last  = target[2] + written * target[4]
+        pairs.append(([source[0], source[1], first, first + (count - 1) * source[4] + 1, source[4]],
+                      [target[0], target[1], last, last + (count - 1) * target[4] + 1, target[4]]))
+        read    += count
+        written += count
+        if (read == slice_size(*source[2:])):
+            i, read = i + 1, 0
+        if (written == slice_size(*target[2:])):
+            j, written = j + 1, 0
+    return pairs
+
+
+def wrap_indices(indices, size):
+    """
+    Checks the indexes of a gather or a scatter, negative indexes count from the end
+
+    Params:
+        :indices -- ndarray: int64 indexes of the elements
+        :size    -- int: number of elements of the array
+
+    Return:
+        :indices -- ndarray: indexes in [0, size), None if an index is out of the array
+    """
+
+    indices = np.where(indices < 0, indices + size, indices)
+    if (len(indices) and (indices.min() < 0 or indices.max() >= size)):
+        return None
+    return indices
+
+
+def least_served(copies, served):
+    """
+    Chooses the copy of an array whose slaves served the fewest elements so far
+
+    Params:
+        :copies -- [BlockMap or Slot]: blocks of each copy of the array
+        :served -- {int: int}: {rank: elements read}
+
+    Return:
+        :blocks -- BlockMap or Slot: blocks of the chosen copy
+    """
+
+    return min(copies, key=lambda blocks: max([served.get(rank, 0) for rank, _, _ in blocks] or [0]))
+
+
+def split_indices(blocks, key, indices):
+    """
+    Groups the indexes of a gather or a scatter by slave, one group per slave.
+
+    Params:
+        :blocks  -- BlockMap or Slot: blocks of one copy of the array
+        :key     -- int: key (id) of the array
+        :indices -- ndarray: int64 indexes in [0, size)
+
+    Return:
+        :groups  -- [(int, int, ndarray, ndarray)]: [(rank, key on the slave, positions in indices, local indexes)]
+    """
+
+    if (isinstance(blocks, Slot)):
+        key = blocks.key
+    ranks, local = blocks.locate(indices)
+    # a stable sort of 16 bits integers is a radix sort
+    order  = np.argsort(ranks.astype(np.uint16) if (len(ranks) and ranks.max() < 65536) else ranks, kind="stable")
+    firsts = np.flatnonzero(np.diff(ranks[order])) + 1
+    groups = []
+    for positions in np.split(order, firsts):
+        if (len(positions)):
+            groups.append((int(ranks[positions[0]]), key, positions, local[positions]))
+    return groups
+
+
+# loads evened out by rebalance
+balances = ("occupancy", "traffic")
+# fewest elements moved by a partial migration
+min_move = 65536
+
+
+def plan_moves(parts, load, free):
+    """
+    Plans the migrations evening out the load of the slaves.
+        greedy: the most loaded slave gives the least loaded slave that can take it
+        half of their gap of load, moving one of its parts whole or the end of a part
+        a part moves at most once, a slave never holds two parts of the same array
+        the load of a part is assumed even over its elements
+
+    Params:
+        :parts -- [(int, int, float, int, bool)]: [(array, rank, load, size, splittable)]
+                                                  what a slave holds of an array
+        :load  -- {int: float}: {rank: load}, updated with the moves
+        :free  -- {int: int}: {rank: free elements}, updated with the moves
+
+    Return:
+        :moves -- [(int, int, int)]: [(index of the part, destination rank, moved elements)]
+    """
+
+    holders = {}
+    for array, rank, _, _, _ in parts:
+        holders.setdefault(array, set()).add(rank)
+    moved = set()
+    moves = []
+    while True:
+        source = max(load, key=load.get)
+        chosen = None
+        for dest in sorted(load, key=load.get):
+            gap  = load[source] - load[dest]
+            best = 0
+            for i, (array, rank, weight, size, splittable) in enumerate(parts):
+                if (rank != source or i in moved or weight <= 0 or dest in holders[array]):
+                    continue
+                if (splittable):
+                    # elements carrying half the gap
+                    count = min(size, int(size * gap / 2 / weight), free[dest])
+                    if (count < min(size, min_move)):
+                        continue
+                elif (weight < gap and size <= free[dest]):
+                    count = size
+                else:
+                    continue
+                if (chosen is None or abs(gap / 2 - weight * count / size) < best):
+                    chosen = (i, dest, count)
+                    best   = abs(gap / 2 - weight * count / size)
+            if (chosen is not None):
+                break
+        if (chosen is None):
+            return moves
+        i, dest, count = chosen
+        array, _, weight, size, _ = parts[i]
+        load[source] -= weight * count / size
+        load[dest]   += weight * count / size
+        free[source] += count
+        free[dest]   -= count
+        holders[array].add(dest)
+        if (count == size):
+            holders[array].discard(source)
+        moved.add(i)
+        moves.append(chosen)
+
+
+# generators run by the slaves on their part of an array
+generators = ("fill", "arange", "random")
+
+
+# reductions computed by the slaves on their part of a slice
+reductions = ("sum", "min", "max", "count", "argmin", "argmax", "histogram")
+
+
+def combine(op, partials, args):
+    """
+    Combines the partial reductions of the slaves into one result.
+
+    Params:
+        :op       -- str: reduction (see reductions)
+        :partials -- [(int, any)]: [ (shift of the subrequest in the slice, partial) ]
+        :args     -- (int, (float, float)): (bins, range) of a histogram
+
+    Return:
+        :result   -- any: reduction of the whole slice, None if min/max of an empty slice
+    """
+
+    if (op in ("sum", "count")):
+        return sum(part for _, part in partials)
+    if (op == "histogram"):
+        bins, (low, high) = args
+        counts = np.zeros(bins, dtype=np.int64)
+        for _, part in partials:
+            counts += part
+        return counts, np.linspace(low, high, bins + 1)
+    if (len(partials) == 0):
+        return None
+    if (op == "min"):
+        return min(part for _, part in partials)
+    if (op == "max"):
+        return max(part for _, part in partials)
+    # first occurrence of the extremum, index relative to the slice
+    if (op == "argmin"):
+        return min((value, shift + index) for shift, (value, index) in partials)[1]
+    return min((-value, shift + index) for shift, (value, index) in partials)[1]
+
+
+def reduce_queries(comm, queries, op, args, tag=0):
+    """
+    Sends a reduction to the slaves owning a slice and combines their partials.
+        the range of a histogram is computed first with min and max if not given
+
+    Params:
+        :comm    -- MPI.Comm: communicator
+        :queries -- [[int, int, int, int, int]]: subrequests of the slice [[rank, key, start, stop, step]]
+        :op      -- str: reduction (see reductions)
+        :args    -- (int, (float, float)): (bins, range) of a histogram
+        :tag     -- int: tag of the request
+
+    Return:
+        :result  -- any: reduction of the slice
+
+    Raises:
+        :KeyError -- if a slave no longer holds the array
+    """
+
+    if (op == "histogram" and args[1] is None):
+        low  = reduce_queries(comm, queries, "min", args, tag)
+        high = reduce_queries(comm, queries, "max", args, tag)
+        if (low is None):
+            low, high = 0, 1
+        elif (low == high):
+            # same as numpy for a constant slice
+            low, high = low - 0.5, high + 0.5
+        args = (args[0], (low, high))
+
+    for query in queries:
+        comm.send((7, query[1:], op, args), dest=query[0], tag=tag)
+
+    partials = []
+    shift    = 0
+    for rank, _, start, stop, step in queries:
+        partials.append((shift, comm.recv(source=rank, tag=tag)))
+        shift += slice_size(start, stop, step)
+    for _, part in partials:
+        if (part is None):
+            raise KeyError(queries[0][1])
+    return combine(op, partials, args)
+
+
+# read-modify-write updates applied by the slaves to their part of an array,
+# a slave runs one request at a time so each update is atomic on its elements
+updates = ("add", "max", "min", "cas")
+
+
+def update_parts(blocks, target, indices=None):
+    """
+    Splits an update of an array on the slaves holding one copy.
+
+    Params:
+        :blocks  -- BlockMap or Slot: blocks of one copy of the array
+        :target  -- [int, int, int, int] or int: [key, start, stop, step] with stop in the array,
+                                                  or key of the array if indices are given
+        :indices -- ndarray: int64 indexes in [0, size), None to update a slice
+
+    Return:
+        :parts   -- [(int, [int, ...], slice or ndarray, ndarray)]:
+                    [(rank, [key, start, stop, step] or [key, count], positions in the update, local indexes or None)]
+    """
+
+    if (indices is not None):
+        return [(rank, [key, len(local)], positions, local)
+                for rank, key, positions, local in split_indices(blocks, target, indices)]
+    parts = []
+    shift = 0
+    for query in split_blocks(blocks, target):
+        size = slice_size(*query[2:])
+        parts.append((query[0], query[1:], slice(shift, shift + size), None))
+        shift += size
+    return parts
+
+
+def send_update(comm, dtype, parts, op, values, fetch, tag=0, generation=None):
+    """
+    Sends an update to the slaves holding one copy of an array.
+        the local indexes and the array values follow each request as raw buffers
+
+    Params:
+        :comm       -- MPI.Comm: communicator
+        :dtype      -- numpy dtype: type of the array elements
+        :parts      -- [(int, [int, ...], slice or ndarray, ndarray)]: parts of the update (see update_parts)
+        :op         -- str: update (see updates)
+        :values     -- [scalar or ndarray]: operand, or expected and new values of a cas
+        :fetch      -- bool: the slaves answer with the values before the update
+        :tag        -- int: tag of the request
+        :generation -- int: generation of the block map of the parts, None to skip the check
+
+    Return:
+        :receives   -- [(MPI.Request, slice or ndarray, ndarray)]: [(receive, positions, values before the update)]
+                       positions and values are None for the one byte acknowledgement of a slave which does not fetch,
+                       a slave answers with an empty buffer if the array changed since the generation
+    """
+
+    arrays   = [None if (np.ndim(value) == 0) else np.asarray(value).astype(dtype, copy=False) for value in values]
+    scalars  = [value if (array is None) else None for value, array in zip(values, arrays)]
+    receives = []
+    for rank, query, positions, local in parts:
+        comm.send((20, query, op, scalars, fetch, generation), dest=rank, tag=tag)
+        if (local is not None):
+            comm.Send(local, dest=rank, tag=tag)
+        for array in arrays:
+            if (array is not None):
+                comm.Send(np.ascontiguousarray(array[positions]), dest=rank, tag=tag)
+        if (fetch):
+            old = np.empty(len(local) if (local is not None) else slice_size(*query[1:]), dtype=dtype)
+            receives.append((comm.Irecv(old, source=rank, tag=tag), positions, old))
+        else:
+            receives.append((comm.Irecv(np.empty(1, dtype=np.uint8), source=rank, tag=tag), None, None))
+    return receives
+
+
+def place(result, positions, values):
+    """
+    Places the elements of a slave response in a result
+
+    Params:
+        :result    -- ndarray: result of the request
+        :positions -- slice or ndarray: positions of the elements in the result
+        :values    -- ndarray: received elements
+    """
+
+    result[positions] = values
+
+
+class Master:
+    # placement policies available in choose_slaves
+    policies = ("first_fit", "round_robin", "least_loaded", "best_fit")
+
+    def __init__(self, max_size, policy="first_fit", stripe_unit=1024, clients=1, disk_size=0,
+                 slab_max=slab_max):
+        self.comm = MPI.COMM_WORLD
+        self.max_size = max_size
+        # slaves hold max_size elements in RAM and spill up to disk_size elements to disk
+        self.capacity = max_size + disk_size
+        # clients are ranks [0, clients), the master is followed by the slaves
+        self.clients = clients
+        self.first_slave = clients + 1
+        self.policy = policy
+        self.stripe_unit = stripe_unit
+        self.next_slave = 0
+        self.key_generator = 0
+        self.block_infos = {}
+        # blocks of the copies of replicated arrays but the first one
+        self.replicas = {}
+        # elements read from each slave, to spread reads across copies
+        self.served = {}
+        self.dtypes = {}
+        # arrays of at most slab_max elements are packed in slabs, 0 disables slabs
+        self.slab_max = slab_max
+        self.slabs = Slabs()
+        self.epoch = 0
+        # generation of each slave key, bumped on its slaves before its layout changes
+        # so that they reject the requests routed with older block maps
+        self.generations = {}
+        self.slave_size = [self.capacity] * (self.comm.Get_size() - self.first_slave)
+        self.stats = Stats()
+        # gets, gathers and fetching updates waiting for slave responses
+        self.transfers = []
+        # buffers being sent to the slaves and the clients
+        self.outbox = Outbox(self.comm)
+
+    def size_of(self, key):
+        """
+        Gets the allocated size of the array.
+
+        Params:
+            :key  -- int: key (id) of the array
+
+        Return:
+            :size -- int: size of array
+        """
+
+        return self.block_infos[key].size
+
+    def fill(self, order, size):
+        """
+        Fills slaves one after the other until size is reached.
+
+        Params:
+            :order  -- [int]: slaves indexes in filling order
+            :size   -- int: size of memory that needs to be allocated
+
+        Return:
+            :slaves -- [(int, int, int)]: chosen slaves and info [(rank, start, offset)]
+        """
+
+        availables = []
+        start = 0
+        for rank in order:
+            if size == start:
+                break
+            remaining = min(self.slave_size[rank], size - start)
+            if remaining != 0:
+                availables.append((rank + self.first_slave, start, remaining))
+                start += remaining
+        return availables
+
+    def first_fit(self, size):
+        """
+        Packs the array on the lowest ranked slaves with free memory.
+
+        Params:
+            :size   -- int: size of memory that needs to be allocated
+
+        Return:
+            :slaves -- [(int, int, int)]: chosen slaves and info [(rank, start, offset)]
+        """
+
+        return self.fill(range(len(self.slave_size)), size)
+
+    def least_loaded(self, size):
+        """
+        Puts the array on the slaves with the most free memory first.
+
+        Params:
+            :size   -- int: size of memory that needs to be allocated
+
+        Return:
+            :slaves -- [(int, int, int)]: chosen slaves and info [(rank, start, offset)]
+        """
+
+        order = sorted(range(len(self.slave_size)), key=lambda rank: -self.slave_size[rank])
+        return self.fill(order, size)
+
+    def best_fit(self, size):
+        """
+        Puts the array on the slave with the least free memory that can hold it whole.
+            falls back to the least loaded slaves if no slave can hold it
+
+        Params:
+            :size   -- int: size of memory that needs to be allocated
+
+        Return:
+            :slaves -- [(int, int, int)]: chosen slaves and info [(rank, start, offset)]
+        """
+
+        fits = [rank for rank in range(len(self.slave_size)) if self.slave_size[rank] >= size]
+        if (len(fits) == 0):
+            return self.least_loaded(size)
+        return self.fill([min(fits, key=lambda rank: self.slave_size[rank])], size)
+
+    def round_robin(self, size):
+        """
+        Stripes the array across all slaves by stripe_unit elements.
+            each array starts on the slave following the previous array first slave
+            full slaves are skipped
+
+        Params:
+            :size   -- int: size of memory that needs to be allocated
+
+        Return:
+            :slaves -- [(int, int, int)]: chosen slaves and info [(rank, start, offset)]
+        """
+
+        nb_slaves  = len(self.slave_size)
+        free       = list(self.slave_size)
+        availables = []
+        start      = 0
+        rank       = self.next_slave
+        while start < size:
+            remaining = min(self.stripe_unit, free[rank], size - start)
+            if remaining != 0:
+                # merge with previous stripe if it is on the same slave
+                if availables and availables[-1][0] == rank + self.first_slave:
+                    last_rank, last_start, last_offset = availables.pop()
+                    availables.append((last_rank, last_start, last_offset + remaining))
+                else:
+                    availables.append((rank + self.first_slave, start, remaining))
+                free[rank] -= remaining
+                start += remaining
+            rank = (rank + 1) % nb_slaves
+        self.next_slave = (self.next_slave + 1) % nb_slaves
+        return availables
+
+    def choose_slaves(self, size, policy=None):
+        """
+        Chooses salves that will be used to allocate memory.
+            policy can be one of Master.policies or a function (master, size) -> slaves
+        
+        Params:
+            :size   -- int: size of memory that needs to be allocated
+            :policy -- str or function: placement policy, default policy if None
+
+        Return:
+            :slaves -- [(int, int, int)]: chosen slaves and info [(rank, start, offset)]
+        """
+
+        policy = self.policy if (policy is None) else policy
+        if (callable(policy)):
+            return policy(self, size)
+        return getattr(self, policy)(size)
+
+    def choose_copies(self, size, policy, replicas):
+        """
+        Chooses the slaves of each copy of an array.
+            the slaves of a copy are hidden from the policy when placing the next copies
+
+        Params:
+            :size     -- int: size of memory that needs to be allocated
+            :policy   -- str: placement policy, default policy if None
+            :replicas -- int: number of copies
+
+        Return:
+            :copies   -- [[(int, int, int)]]: chosen slaves of each copy [[(rank, start, offset)]]
+                None if the copies do not fit on distinct slaves
+        """
+
+        slave_size = self.slave_size
+        self.slave_size = list(slave_size)
+        copies = []
+        for _ in range(replicas):
+            if (sum(self.slave_size) < size):
+                break
+            blocks = self.choose_slaves(size, policy)
+            copies.append(blocks)
+            for rank, _, _ in blocks:
+                self.slave_size[rank - self.first_slave] = 0
+        self.slave_size = slave_size
+        return copies if (len(copies) == replicas) else None
+
+    def copies(self, key):
+        """
+        Gets the blocks of every copy of an array.
+
+        Params:
+            :key    -- int: key (id) of the array
+
+        Return:
+            :copies -- [[(int, int, int)]]: blocks of each copy [[(rank, start, offset)]]
+        """
+
+        return [self.block_infos[key]] + self.replicas.get(key, [])
+
+    def malloc(self, size, dtype, policy=None, replicas=1):
+        """
+        Send malloc message to chosen slaves. 
+            malloc message format: (1, key, offset, dtype).
+            one message per slave with the total size of its blocks
+            arrays of at most slab_max elements without replicas take a slot of a slab
+
+        Params:
+            :size     -- int: size of memory that needs to be allocated
+            :dtype    -- str: numpy dtype string of the array elements
+            :policy   -- str: placement policy, default policy if None
+            :replicas -- int: number of copies of the array, on distinct slaves
+
+        Return:
+            :key  -- int: key identifying the array to be allocated 
+                -1 if not enough memory
+                -3 if unknown policy or invalid number of replicas
+        """
+
+        if (policy is not None and policy not in self.policies):
+            return -3
+        if (type(replicas) != int or replicas < 1):
+            return -3
+        if sum(self.slave_size) < size * replicas:
+            return -1
+        key = self.key_generator
+        if (not self.place(key, size, dtype, policy, replicas)):
+            return -1
+        # update key generator
+        self.key_generator += 1
+        return key
+
+    def place(self, key, size, dtype, policy, replicas):
+        """
+        Chooses the slaves of an array and allocates its blocks on them.
+
+        Params:
+            :key      -- int: key (id) of the array
+            :size     -- int: size of memory that needs to be allocated
+            :dtype    -- str: numpy dtype string of the array elements
+            :policy   -- str: placement policy, default policy if None
+            :replicas -- int: number of copies of the array, on distinct slaves
+
+        Return:
+            :placed   -- bool: False if not enough memory
+        """
+
+        if (replicas == 1 and size <= self.slab_max and self.place_small(key, size, dtype)):
+            return True
+        copies = self.choose_copies(size, policy, replicas)
+        if (copies is None):
+            return False
+        # update block_infos
+        self.block_infos[key] = BlockMap(copies[0])
+        if (replicas > 1):
+            self.replicas[key] = [BlockMap(blocks) for blocks in copies[1:]]
+        self.dtypes[key] = np.dtype(dtype)
+        for rank, offset in self.slave_totals(key).items():
+            # synchronous so that the slave handles it before any client request
+            self.comm.ssend((1, key, offset, self.dtypes[key].str), dest=rank)
+            # update slave_size
+            self.slave_size[rank - self.first_slave] -= offset
+        return True
+
+    def place_small(self, key, size, dtype):
+        """
+        Puts a small array in a slot of a slab.
+            a new slab is allocated on the least loaded slave if no slab of
+            the size class has a free slot, slots are zeroed when freed
+            so that no message is sent when a slot is taken
+
+        Params:
+            :key    -- int: key (id) of the array
+            :size   -- int: size of memory that needs to be allocated
+            :dtype  -- str: numpy dtype string of the array elements
+
+        Return:
+            :placed -- bool: False if no slave has room for a new slab
+        """
+
+        dtype = np.dtype(dtype)
+        slot  = self.slabs.take(dtype.str, size)
+        if (slot is None):
+            blocks = self.least_loaded(slab_size)
+            if (len(blocks) != 1 or blocks[0][2] != slab_size):
+                return False
+            rank = blocks[0][0]
+            slab = self.slabs.add(rank, dtype.str, size_class(size))
+            self.comm.ssend((1, slab, slab_size, dtype.str), dest=rank)
+            self.slave_size[rank - self.first_slave] -= slab_size
+            slot = self.slabs.take(dtype.str, size)
+        self.block_infos[key] = slot
+        self.dtypes[key]      = dtype
+        return True
+
+    def malloc_many(self, sizes, dtype, policy=None):
+        """
+        Allocates several arrays in one request.
+            small arrays are packed in slabs, the others are placed by the policy
+            no array is allocated if one of them does not fit
+
+        Params:
+            :sizes  -- [int]: size of each array
+            :dtype  -- str: numpy dtype string of the arrays elements
+            :policy -- str: placement policy of the arrays not packed in slabs, default policy if None
+
+        Return:
+            :keys   -- [int]: keys identifying the allocated arrays
+                -1 if not enough memory
+                -3 if unknown policy
+        """
+
+        keys = []
+        for size in sizes:
+            key = self.malloc(size, dtype, policy)
+            if (key < 0):
+                self.delitem([[allocated, 0, 0, 0] for allocated in keys])
+                return key
+            keys.append(key)
+        return keys
+
+    def slave_key(self, key):
+        """
+        Gets the key of the slave array holding an array.
+
+        Params:
+            :key   -- int: key (id) of the array
+
+        Return:
+            :key   -- int: key of its slab for a small array, key otherwise
+        """
+
+        blocks = self.block_infos[key]
+        return blocks.key if (isinstance(blocks, Slot)) else key
+
+    def bump(self, key, ranks):
+        """
+        Bumps the generation of a slave key on the slaves holding it.
+            sent synchronously before its layout changes, a request routed
+            with an older block map is answered with an empty buffer
+
+        Params:
+            :key   -- int: key (id) of the array or of the slab on the slaves
+            :ranks -- [int]: ranks of the slaves holding the key, before or after the change
+        """
+
+        self.generations[key] = self.generations.get(key, 0) + 1
+        for rank in sorted(set(ranks)):
+            self.comm.ssend((23, key, self.generations[key]), dest=rank)
+
+    def realloc(self, key, size):
+        """
+        Resizes an array, keeping its first elements, new elements are zeros.
+            a grown copy gets blocks for the new elements on the free memory of
+            any slave but the slaves of its other copies, placed by the default policy
+            a shrunk copy gives back its blocks past the new end
+            a small array stays in its slot while it fits, it is moved otherwise
+
+        Params:
+            :key    -- int: key (id) of the array
+            :size   -- int: new size of the array
+
+        Return:
+            :status -- int: realloc status
+                 0 if realloc successful
+                -1 if not enough memory
+                -2 if no array with requested key
+                -3 if invalid size
+        """
+
+        if (key not in self.block_infos):
+            return -2
+        if (type(size) != int or size < 0):
+            return -3
+        if (isinstance(self.block_infos[key], Slot)):
+            status = self.realloc_small(key, size)
+        elif (size > self.size_of(key)):
+            status = self.grow(key, size)
+        else:
+            status = self.shrink(key, size)
+        if (status == 0):
+            # invalidates block maps cached by clients
+            self.epoch += 1
+        return status
+
+    def realloc_small(self, key, size):
+        """
+        Resizes an array stored in a slot of a slab.
+
+        Params:
+            :key    -- int: key (id) of the array
+            :size   -- int: new size of the array
+
+        Return:
+            :status -- int: 0 if successful, -1 if not enough memory
+        """
+
+        slot = self.block_infos[key]
+        if (size <= size_class(slot.size)):
+            if (size < slot.size):
+                self.bump(slot.key, [slot.rank])
+                self.comm.ssend((3, [slot.key, slot.local + size, slot.local + slot.size, 1], 0, None, None), dest=slot.rank)
+            self.block_infos[key] = Slot(slot.rank, slot.key, slot.local, size)
+            return 0
+
+        values = self.getitem([[key, 0, slot.size, 1]])[0]
+        if (not self.place(key, size, self.dtypes[key].str, None, 1)):
+            return -1
+        self.free_slot(slot)
+        self.setitem([[key, 0, len(values), 1]], values)
+        return 0
+
+    def grow(self, key, size):
+        """
+        Extends every copy of an array with new blocks.
+            blocks following a block of the same slave are merged with it
+
+        Params:
+            :key    -- int: key (id) of the array
+            :size   -- int: new size of the array
+
+        Return:
+            :status -- int: 0 if successful, -1 if not enough memory
+        """
+
+        old        = self.size_of(key)
+        copies     = [list(blocks) for blocks in self.copies(key)]
+        held       = [set(rank for rank, _, _ in blocks) for blocks in copies]
+        slave_size = self.slave_size
+        free       = list(slave_size)
+        for i, blocks in enumerate(copies):
+            # the slaves of the other copies are hidden from the policy
+            hidden = set().union(*(ranks for j, ranks in enumerate(held) if j != i))
+            self.slave_size = [0 if (rank + self.first_slave in hidden) else free[rank]
+                               for rank in range(len(free))]
+            added = self.choose_slaves(size - old) if (sum(self.slave_size) >= size - old) else []
+            self.slave_size = slave_size
+            if (sum(offset for _, _, offset in added) != size - old):
+                return -1
+            for rank, start, offset in added:
+                free[rank - self.first_slave] -= offset
+                held[i].add(rank)
+                if (blocks and blocks[-1][0] == rank and blocks[-1][1] + blocks[-1][2] == old + start):
+                    blocks[-1] = (rank, blocks[-1][1], blocks[-1][2] + offset)
+                else:
+                    blocks.append((rank, old + start, offset))
+        self.reshape(key, copies)
+        return 0
+
+    def shrink(self, key, size):
+        """
+        Cuts every copy of an array after size elements.
+
+        Params:
+            :key    -- int: key (id) of the array
+            :size   -- int: new size of the array
+
+        Return:
+            :status -- int: 0
+        """
+
+        self.reshape(key, [[(rank, start, min(offset, size - start)) for rank, start, offset in blocks
+                            if start < size] for blocks in self.copies(key)])
+        return 0
+
+    def reshape(self, key, copies):
+        """
+        Replaces the blocks of an array and resizes its part on each slave.
+            a slave only gains or loses blocks at the end of its part
+
+        Params:
+            :key    -- int: key (id) of the array
+            :copies -- [[(int, int, int)]]: new blocks of each copy [[(rank, start, offset)]]
+        """
+
+        before = self.slave_totals(key)
+        self.block_infos[key] = BlockMap(copies[0])
+        if (len(copies) > 1):
+            self.replicas[key] = [BlockMap(blocks) for blocks in copies[1:]]
+        after  = self.slave_totals(key)
+        self.bump(key, set(before) | set(after))
+        for rank in set(before) | set(after):
+            total = after.get(rank, 0)
+            # synchronous so that the slave handles it before any client request
+            if (rank not in after):
+                self.comm.ssend((4, key), dest=rank)
+            elif (rank not in before):
+                self.comm.ssend((1, key, total, self.dtypes[key].str), dest=rank)
+            elif (total != before[rank]):
+                self.comm.ssend((15, key, total), dest=rank)
+            self.slave_size[rank - self.first_slave] -= total - before.get(rank, 0)
+
+    def parts(self):
+        """
+        Gets what each slave holds of each copy of each array and of each slab.
+
+        Return:
+            :parts -- [(int, int, int, int)]: [(key, copy, rank, size)]
+                key of a slab and copy None for a slab
+        """
+
+        parts = []
+        for key in self.block_infos:
+            if (isinstance(self.block_infos[key], Slot)):
+                continue
+            for copy, blocks in enumerate(self.copies(key)):
+                totals = {}
+                for rank, _, offset in blocks:
+                    totals[rank] = totals.get(rank, 0) + offset
+                parts += [(key, copy, rank, total) for rank, total in totals.items()]
+        for slab, (rank, _, _, _, _, _) in self.slabs.slabs.items():
+            parts.append((slab, None, rank, slab_size))
+        return parts
+
+    def rebalance(self, by):
+        """
+        Migrates parts of arrays between slaves to even out their load.
+            a part is what a slave holds of one copy of an array or a slab, it moves
+            whole or, but for a slab, its last local elements move, always to a slave
+            holding nothing of the array so that the local layouts are kept
+            occupancy: elements allocated on each slave
+            traffic:   elements read and written on each slave since the last rebalance by traffic
+
+        Params:
+            :by     -- str: occupancy or traffic
+
+        Return:
+            :moves  -- [(int, int, int, int)]: [(key, source rank, destination rank, moved elements)]
+                slabs have negative keys
+                -3 if unknown load
+        """
+
+        if (by not in balances):
+            return -3
+        parts = self.parts()
+        ranks = range(self.first_slave, self.comm.Get_size())
+        free  = {rank: self.slave_size[rank - self.first_slave] for rank in ranks}
+        if (by == "occupancy"):
+            weights = [size for _, _, _, size in parts]
+        else:
+            for rank in ranks:
+                self.comm.send((17, ), dest=rank)
+            traffic = {rank: self.comm.recv(source=rank) for rank in ranks}
+            weights = [traffic[rank].get(key, 0) for key, _, rank, _ in parts]
+        load = {rank: 0 for rank in ranks}
+        for (_, _, rank, _), weight in zip(parts, weights):
+            load[rank] += weight
+
+        moves = plan_moves([(key, rank, weight, size, copy is not None)
+                            for (key, copy, rank, size), weight in zip(parts, weights)], load, free)
+        for i, dest, count in moves:
+            self.migrate(*parts[i], dest, count)
+        if (moves):
+            # invalidates block maps cached by clients
+            self.epoch += 1
+        return [(parts[i][0], parts[i][2], dest, count) for i, dest, count in moves]
+
+    def migrate(self, key, copy, source, size, dest, count):
+        """
+        Moves the last count local elements of one copy of an array, or a whole slab,
+        from a slave to another slave holding nothing of the array.
+            the slaves exchange the pages directly, then the block map is updated,
+            the block holding the first moved element is split
+
+        Params:
+            :key    -- int: key (id) of the array or of the slab
+            :copy   -- int: index of the copy in copies(key), None for a slab
+            :source -- int: rank of the slave holding the part
+            :size   -- int: number of elements of the part
+            :dest   -- int: rank of the slave receiving the elements
+            :count  -- int: number of elements moved
+        """
+
+        dtype = self.slabs.slabs[key][1] if (copy is None) else self.dtypes[key].str
+        holders = [source] if (copy is None) else [rank for blocks in self.copies(key) for rank, _, _ in blocks]
+        self.bump(key, holders + [dest])
+        self.comm.send((16, key, source, False, count, dtype), dest=dest)
+        self.comm.send((16, key, dest, True, size - count), dest=source)
+        self.comm.recv(source=dest)
+        self.comm.recv(source=source)
+        self.slave_size[source - self.first_slave] += count
+        self.slave_size[dest - self.first_slave]   -= count
+
+        if (copy is None):
+            self.slabs.slabs[key][0] = dest
+            for array, blocks in self.block_infos.items():
+                if (isinstance(blocks, Slot) and blocks.key == key):
+                    self.block_infos[array] = Slot(dest, key, blocks.local, blocks.size)
+            return
+
+        blocks = []
+        local  = 0
+        for rank, start, offset in self.copies(key)[copy]:
+            if (rank != source):
+                blocks.append((rank, start, offset))
+                continue
+            # elements of the block kept by the source
+            kept   = min(offset, max(0, size - count - local))
+            local += offset
+            if (kept > 0):
+                blocks.append((source, start, kept))
+            if (kept < offset):
+                blocks.append((dest, start + kept, offset - kept))
+        blocks = BlockMap(blocks)
+        if (copy == 0):
+            self.block_infos[key] = blocks
+        else:
+            self.replicas[key][copy - 1] = blocks
+
+    def slave_totals(self, key):
+        """
+        Gets the size stored by each slave for an array.
+
+        Params:
+            :key    -- int: key (id) of the array
+
+        Return:
+            :totals -- {int: int}: {rank: size}
+        """
+
+        totals = {}
+        for blocks in self.copies(key):
+            for rank, _, offset in blocks:
+                totals[rank] = totals.get(rank, 0) + offset
+        return totals
+
+    def is_not_conform(self, requests, limited=True):
+        """
+        Checks if requests are conform to allocator settings.
+            check if total requests size is less than total remaining slave memory.
+            check if array with that key is available (has already been allocated).
+            
+        Params:
+            :requests -- [[int, int, int, int]]: [[key, start, stop, step]]
+            :limited  -- bool: apply the max_size limit on the total size
+
+        Return:
+            :status   -- int: error message
+                 0 if no error
+                -1 if size is too big
+                -2 if key is not conform
+        """
+
+        total_size = 0
+        for i, request in enumerate(requests):
+            key, start, stop, step = request
+
+            if key not in self.block_infos:
+                return -2
+
+            if (stop == -1 or stop > self.size_of(key)):
+                stop = request[2] = self.size_of(key)
+            total_size += slice_size(start, stop, step)
+
+        if (limited and total_size > self.max_size):
+            return -1
+        return 0
+
+    def split_request(self, request):
+        """
+        Split request into multiple subrequests.
+        Finds which slaves contains the requested array and construct a request per slave
+            reads of replicated arrays are spread across the copies
+
+        Params:
+            :request    -- [int, int, int, int]: [key, start, stop, step]
+
+        Return:
+            :subrequest -- [[int, int, int, int, int]]: [[rank, key, start, stop, step]]
+        """
+
+        begin  = time.perf_counter()
+        result = split_copies(self.copies(request[0]), request, self.served)
+        self.stats.time("split_request", time.perf_counter() - begin)
+        return result
+
+    def split_writes(self, request):
+        """
+        Split a write request into subrequests for every copy of the array.
+
+        Params:
+            :request -- [int, int, int, int]: [key, start, stop, step]
+
+        Return:
+            :copies  -- [[[int, int, int, int, int]]]: subrequests of each copy [[[rank, key, start, stop, step]]]
+        """
+
+        return [split_blocks(blocks, request) for blocks in self.copies(request[0])]
+
+    def locate(self, requests, write=False):
+        """
+        Resolves the placement of requests without touching the data.
+            used by clients exchanging data directly with the slaves
+            the data never goes through the master so the size is not limited
 
-class Master:
-    def __init__(self, max_size):
-        self.comm = MPI.COMM_WORLD
-        self.max_size = max_size
-        self.key_generator = 0
-        self.block_infos = {}
-        self.slave_size = [max_size] * (self.comm.Get_size() - 2)
+        Params:
+            :requests -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :write    -- bool: locate every copy of replicated arrays
 
-    def size_of(self, key):
+        Return:
+            :results  -- [(str, [[int, int, int, int, int]])]: [ (dtype, subrequests) ]
+                one result per request, or per request and copy for a write
         """
-        Gets the allocated size of the array.
+
+        status = self.is_not_conform(requests, limited=False)
+        if (status != 0):
+            return status
+
+        if (write):
+            return [(self.dtypes[request[0]].str, queries)
+                    for request in requests for queries in self.split_writes(request)]
+        return [(self.dtypes[request[0]].str, self.split_request(request))
+                for request in requests]
+
+    def placements(self, keys):
+        """
+        Gets the block maps of arrays so that clients can route requests themselves.
+            the maps stay valid as long as the epoch does not change
 
         Params:
-            :key  -- int: key (id) of the array
+            :keys    -- [int]: keys (ids) of the arrays
 
         Return:
-            :size -- int: size of array
+            :results -- [(str, [[(int, int, int)]], int)]:
+                        [ (dtype, blocks of each copy [[(rank, start, offset)]], generation of the slave key) ]
+                -2 if no array with requested key
         """
 
-        result = 0
-        for _, _, offset in self.block_infos[key]:
-            result += offset
-        return result
+        for key in keys:
+            if (key not in self.block_infos):
+                return -2
+        return [(self.dtypes[key].str, self.copies(key), self.generations.get(self.slave_key(key), 0))
+                for key in keys]
 
-    def choose_slaves(self, size):
+    def reduce(self, requests, op, args):
         """
-        Chooses salves that will be used to allocate memory.
-        
+        Reduces requested slices on the slaves.
+            the slices are not limited by max_size, only partials are sent back
+
         Params:
-            :size   -- int: size of memory that needs to be allocated
+            :requests -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :op       -- str: reduction (see reductions)
+            :args     -- (int, (float, float)): (bins, range) of a histogram
 
         Return:
-            :slaves -- [(int, int, int)]: chosen slaves and info [(rank, start, offset)]
+            :results  -- []: one reduction per requested slice
+                -3 if unknown reduction
         """
 
-        nb_slaves = len(self.slave_size)
-        availables = []
+        if (op not in reductions):
+            return -3
+        status = self.is_not_conform(requests, limited=False)
+        if (status != 0):
+            return status
+
+        return [reduce_queries(self.comm, self.split_request(request), op, args)
+                for request in requests]
+
+    def sort_phase(self, ranks, message):
+        """
+        Sends one phase of a sort to the slaves and gathers their answers.
+
+        Params:
+            :ranks   -- [int]: ranks of the slaves
+            :message -- (...): phase message
+
+        Return:
+            :answers -- []: answer of each slave
+        """
+
+        for rank in ranks:
+            self.comm.send(message, dest=rank)
+        return [self.comm.recv(source=rank) for rank in ranks]
+
+    def sort(self, key):
+        """
+        Sorts an array in place with a sample sort run by the slaves.
+            each copy of a replicated array is sorted on its own slaves
+            a small array is sorted by the master
+
+        Params:
+            :key    -- int: key (id) of the array
+
+        Return:
+            :status -- int: sort status
+                 0 if sort successful
+                -2 if no array with requested key
+        """
+
+        if (key not in self.block_infos):
+            return -2
+        if (isinstance(self.block_infos[key], Slot)):
+            request = [key, 0, self.size_of(key), 1]
+            self.setitem([request], np.sort(self.getitem([request])[0]))
+            return 0
+        for blocks in self.copies(key):
+            self.sort_copy(key, blocks)
+        return 0
+
+    def sort_copy(self, key, blocks):
+        """
+        Sorts one copy of an array with a sample sort.
+            sample:   each slave sorts its part and sends regular samples
+            split:    splitters are chosen so that bucket i has the size of slave i part,
+                      samples are ordered by (value, slave, local position) so that equal values
+                      are spread across buckets
+            exchange: each slave sends bucket i to slave i and merges what it receives
+            place:    sorted runs are moved to the blocks holding their global positions
+
+        Params:
+            :key    -- int: key (id) of the array
+            :blocks -- [(int, int, int)]: blocks of the copy [(rank, start, offset)]
+        """
+
+        totals = {}
+        for rank, _, offset in blocks:
+            totals[rank] = totals.get(rank, 0) + offset
+        if (not totals):
+            return
+        ranks  = list(totals.keys())
+        size   = self.size_of(key)
+        stride = max(1, size // (32 * len(ranks)))
+
+        answers   = self.sort_phase(ranks, (8, key, "sample", stride))
+        values    = np.concatenate([samples for samples, _ in answers])
+        slaves    = np.concatenate([np.full(len(samples), i) for i, (samples, _) in enumerate(answers)])
+        positions = np.concatenate([sampled for _, sampled in answers])
+        order     = np.lexsort((positions, slaves, values))
+        bounds    = np.cumsum([totals[rank] for rank in ranks])[:-1]
+        chosen    = order[np.minimum(len(order) - 1, bounds * len(order) // size)]
+        counts    = self.sort_phase(ranks, (8, key, "split", (values[chosen], slaves[chosen], positions[chosen]),
+                                            ranks))
+        self.sort_phase(ranks, (8, key, "exchange", ranks, counts))
+
+        # global range of each sorted run
+        runs  = []
         start = 0
-        for rank in range(nb_slaves):
-            if size == start:
-                break
-            remaining = min(self.slave_size[rank], size - start)
-            if remaining != 0:
-                availables.append((rank + 2, start, remaining))
-                start += remaining
-        return availables
+        for i, rank in enumerate(ranks):
+            length = sum(count[i] for count in counts)
+            runs.append((rank, start, start + length))
+            start += length
+
+        # intersect runs with blocks
+        plan  = []
+        local = {}
+        for rank_block, start_block, offset_block in blocks:
+            local_block = local.get(rank_block, 0)
+            local[rank_block] = local_block + offset_block
+            for rank_run, start_run, stop_run in runs:
+                first = max(start_block, start_run)
+                last  = min(start_block + offset_block, stop_run)
+                if (first < last):
+                    plan.append((rank_run, rank_block, first - start_run,
+                                 local_block + first - start_block, last - first))
+        self.sort_phase(ranks, (8, key, "place", plan))
 
-    def malloc(self, size):
+    def local_ranges(self, key, every=False):
         """
-        Send malloc message to chosen slaves. 
-            malloc message format: (1, key, offset).
+        Gets the ranges of an array held by each slave.
 
         Params:
-            :size -- int: size of memory that needs to be allocated
+            :key    -- int: key (id) of the array
+            :every  -- bool: ranges of every copy of the array, of the first one otherwise
 
         Return:
-            :key  -- int: key identifying the array to be allocated 
+            :ranges -- {int: [(int, int, int)]}: {rank: [(start, local start, length)]}
         """
 
-        if sum(self.slave_size) < size:
-            return -1
-        key = self.key_generator
-        available_slaves = self.choose_slaves(size) 
-        # update block_infos
-        self.block_infos[key] = available_slaves 
-        for rank, start, offset in available_slaves:
-            self.comm.send((1, key, offset), dest=rank)
-            # update slave_size
-            self.slave_size[rank - 2] -= offset
-        # update key generator
-        self.key_generator += 1
+        ranges = {}
+        local  = {}
+        for blocks in (self.copies(key) if (every) else [self.block_infos[key]]):
+            if (isinstance(blocks, Slot)):
+                ranges[blocks.rank] = [(0, blocks.local, blocks.size)]
+                continue
+            for rank, start, offset in blocks:
+                ranges.setdefault(rank, []).append((start, local.get(rank, 0), offset))
+                local[rank] = local.get(rank, 0) + offset
+        return ranges
+
+    def transfer_file(self, op, key, path, dtype):
+        """
+        Makes the slaves read (op 9) or write (op 10) their blocks of an array file.
+            every copy is read, the first one is written
+            a small array is read or written in its slab
+
+        Params:
+            :op     -- int: 9 to read the file, 10 to write it
+            :key    -- int: key (id) of the array
+            :path   -- str: path of the file
+            :dtype  -- numpy dtype: type of the elements in the file
+
+        Return:
+            :status -- int: 0 if successful, -4 if a slave could not access the file
+        """
+
+        ranges = self.local_ranges(key, every=(op == 9))
+        for rank in ranges:
+            self.comm.send((op, self.slave_key(key), path, dtype.str, ranges[rank]), dest=rank)
+        return min(self.comm.recv(source=rank) for rank in ranges)
+
+    def generate(self, key, kind, args):
+        """
+        Makes the slaves fill every copy of an array on their own ranges.
+            fill:   (value, ) broadcasted to all elements
+            arange: (start, step), element i is start + i * step
+            random: (seed, low, high), uniform in [low, high), the same for any placement
+
+        Params:
+            :key    -- int: key (id) of the array
+            :kind   -- str: fill, arange or random
+            :args   -- (...): arguments of the generator
+
+        Return:
+            :status -- int: generate status
+                 0 if generate successful
+                -2 if no array with requested key
+                -3 if unknown generator or invalid arguments
+        """
+
+        if (key not in self.block_infos):
+            return -2
+        if (kind not in generators):
+            return -3
+        ranges = self.local_ranges(key, every=True)
+        for rank in ranges:
+            self.comm.send((13, self.slave_key(key), kind, args, ranges[rank]), dest=rank)
+        return min(self.comm.recv(source=rank) for rank in ranges)
+
+    def load(self, path, dtype, policy=None):
+        """
+        Allocates an array and fills it from a binary array file.
+            each slave reads its own blocks from the file
+
+        Params:
+            :path   -- str: path of the file
+            :dtype  -- str: numpy dtype string of the array, dtype of the file if None
+            :policy -- str: placement policy, default policy if None
+
+        Return:
+            :key    -- int: key identifying the loaded array
+                -1 if not enough memory
+                -4 if the file is not a binary array file
+        """
+
+        header = binfile.read_header(path)
+        if (header is None):
+            return -4
+        file_dtype, size = header
+        key = self.malloc(size, file_dtype if (dtype is None) else dtype, policy)
+        if (key < 0):
+            return key
+        status = self.transfer_file(9, key, path, file_dtype)
+        if (status != 0):
+            # a failed load leaves no array behind
+            self.delitem([[key, 0, -1, 1]])
+            return status
         return key
 
-    def is_not_conform(self, requests):
+    def dump(self, key, path):
         """
-        Checks if requests are conform to allocator settings.
-            check if total requests size is less than total remaining slave memory.
-            check if array with that key is available (has already been allocated).
-            
+        Writes an array to a binary array file.
+            the master writes the header, each slave writes its own blocks
+
         Params:
-            :requests -- [[int, int, int, int]]: [[key, start, stop, step]]
+            :key    -- int: key (id) of the array
+            :path   -- str: path of the file
 
         Return:
-            :status   -- int: error message
-                 0 if no error
-                -1 if size is too big
-                -2 if key is not conform
+            :status -- int: dump status
+                 0 if dump successful
+                -2 if no array with requested key
+                -4 if the file could not be written
         """
 
-        total_size = 0
-        for i, request in enumerate(requests):
-            key, start, stop, step = request
+        if (key not in self.block_infos):
+            return -2
+        dtype = binfile.little_endian(self.dtypes[key])
+        try:
+            binfile.write_header(path, dtype, self.size_of(key))
+        except OSError:
+            return -4
+        return self.transfer_file(10, key, path, dtype)
 
-            if key not in self.block_infos:
-                return -2
+    def checkpoint(self, directory, incremental):
+        """
+        Writes the whole memory to a directory.
+            each slave writes its own arrays to its own files in parallel,
+            then the master writes the block map once every slave succeeded
 
-            if (stop == -1):
-                request[2] = self.size_of(key)
-            total_size += (stop - start) // step       \
-                       +  bool((stop - start) % step)
+        Params:
+            :directory   -- str: checkpoint directory
+            :incremental -- bool: slaves only write pages modified since their last checkpoint
 
-        if (total_size > self.max_size):
-            return -1
+        Return:
+            :status      -- int: checkpoint status
+                 0 if checkpoint successful
+                -4 if the checkpoint could not be written
+        """
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            return -4
+        ranks = range(self.first_slave, self.comm.Get_size())
+        for rank in ranks:
+            self.comm.send((11, directory, incremental), dest=rank)
+        status = min(self.comm.recv(source=rank) for rank in ranks)
+        if (status < 0):
+            return status
+
+        meta = {"slaves": len(self.slave_size), "capacity": self.capacity,
+                "block_infos": self.block_infos, "replicas": self.replicas, "slabs": self.slabs,
+                "dtypes": {key: dtype.str for key, dtype in self.dtypes.items()},
+                "slave_size": self.slave_size, "key_generator": self.key_generator,
+                "next_slave": self.next_slave, "epoch": self.epoch}
+        path = os.path.join(directory, "master.meta")
+        try:
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(meta, f)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return -4
         return 0
 
-    def split_request(self, request):
+    def restore(self, directory):
         """
-        Split request into multiple subrequests.
-        Finds which slaves contains the requested array and construct a request per slave
+        Reads the block map written by checkpoint
 
         Params:
-            :request    -- [int, int, int, int]: [key, start, stop, step]
+            :directory -- str: checkpoint directory
+        """
+
+        with open(os.path.join(directory, "master.meta"), "rb") as f:
+            meta = pickle.load(f)
+        if (meta["slaves"] != len(self.slave_size)):
+            raise Exception("Checkpoint of {} slaves restored on {} slaves".format(meta["slaves"],
+                len(self.slave_size)))
+        if (meta["capacity"] > self.capacity):
+            raise Exception("Checkpoint of slaves of size {} restored on slaves of size {}".format(
+                meta["capacity"], self.capacity))
+        used = self.capacity - meta["capacity"]
+        self.block_infos   = {key: blocks if (isinstance(blocks, Slot)) else BlockMap(blocks)
+                              for key, blocks in meta["block_infos"].items()}
+        self.replicas      = {key: [BlockMap(blocks) for blocks in copies]
+                              for key, copies in meta.get("replicas", {}).items()}
+        self.slabs         = meta.get("slabs", Slabs())
+        self.dtypes        = {key: np.dtype(dtype) for key, dtype in meta["dtypes"].items()}
+        self.slave_size    = [size + used for size in meta["slave_size"]]
+        self.key_generator = meta["key_generator"]
+        self.next_slave    = meta["next_slave"]
+        # the epoch keeps growing so that no client map survives a restore
+        self.epoch         = meta["epoch"] + 1
+
+    def metadata(self):
+        """
+        Gets the memory used by the metadata of the master
 
         Return:
-            :subrequest -- [[int, int, int, int, int]]: [[rank, key, start, stop, step]]
+            :footprint -- {str: int}: number of arrays, copies and blocks, bytes of the block maps,
+                                      number of slabs, of arrays in slabs and elements of their slots
         """
 
-        key, start_mem, stop_mem, step_mem = request
-        subrequests = []
-        cumulated_offset = 0
-        for rank_block, start_block, offset_block in self.block_infos[key]:
-            if start_mem < start_block + offset_block and start_mem < stop_mem:
-                # get slave request parameters 
-                step_slave   = cumulated_offset % step_mem
-                start_slave  = start_mem - start_block + step_slave 
-                offset_slave = min(offset_block - start_slave, stop_mem - start_mem) 
-                # append request to return array
-                subrequests.append([rank_block,
-                                key,
-                                start_slave,
-                                start_slave + offset_slave - step_slave,
-                                step_mem])
-                # update parameters
-                start_mem += offset_slave
-                cumulated_offset += offset_block
-        return subrequests
-
-    def merge_responses(self, responses):
-        """
-        Merge responses returned by slaves into one response. 
-            Group responses by key:
-                [ (rank, (key, array)) ]   --> { key: [ (rank, array) ] } 
-            Order by key, Concatenate arrays with same key: 
-                { key: [ (rank, array) ] } --> [ arrays concatenation ordered by key ]
-
-        Params:
-            :responses -- [(int, (int, [])] : [ (rank, (key, slave response array)) ]
-    
-        Return:
-            :results   -- [[]] : [ arrays concatenation ordered by key ]
-        """
-
-        # group respones by key
-        arrays = {}
-        for rank, response in responses:
-            key, array = response
-            if key not in arrays:
-                arrays[key] = []
-            arrays[key].append((rank, array))
-
-        # order arrays by key 
-        # concatenate arrays with same key
-        results = []
-        for key in sorted(arrays.keys()):
-            result = []
-            for response in sorted(arrays[key]):
-                result += response[1]
-            results.append(result)
-        return results
+        maps = [blocks for key in self.block_infos for blocks in self.copies(key)]
+        footprint = {"arrays": len(self.block_infos), "copies": len(maps),
+                     "blocks": sum(len(blocks) for blocks in maps),
+                     "block_map_bytes": sum(blocks.nbytes for blocks in maps if isinstance(blocks, BlockMap))}
+        footprint.update(self.slabs.footprint())
+        return footprint
+
+    def summary(self):
+        """
+        Gets the counters of the master and of every slave
+
+        Return:
+            :stats -- {str: any}: {"master": counters and occupancy of each slave,
+                                   "slaves": counters and storage of each slave}
+                see stats.Stats.summary and store.Store.stats
+        """
+
+        ranks = range(self.first_slave, self.comm.Get_size())
+        for rank in ranks:
+            self.comm.send((12, ), dest=rank)
+        slaves = [self.comm.recv(source=rank) for rank in ranks]
 
-    def getitem(self, requests):
+        master = self.stats.summary()
+        master["metadata"]  = self.metadata()
+        master["occupancy"] = [(self.capacity - free) / self.capacity if (self.capacity) else 0.0
+                               for free in self.slave_size]
+        return {"master": master, "slaves": slaves}
+
+    def getitem(self, requests, codec=None, finish=None):
         """
         Take requests, parse them and send subrequests to concerned slaves.
             requests can be one or more array
             each array can be hole or sliced [start:stop:step]
+            the subrequests of all arrays are sent before any response is received,
+            slave responses are received as raw buffers directly into the result arrays,
+            or decoded into them in the order they arrive if a codec is given
 
         Params:
             :requests -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
+            :codec    -- str: codec of the slave responses (see codec.codecs), None for raw buffers
+            :finish   -- function: called with the results once they are received,
+                                   the responses are then received by the main loop, None to wait for them
 
         Return:
-            :results  -- [[]] : [ requested arrays ]
+            :results  -- [ndarray] : [ requested arrays ]
+                -3 if unknown codec
         """
 
+        if (codec is not None and codec not in codecs):
+            return -3
         status = self.is_not_conform(requests)
         if (status != 0):
             return status
 
-        queries = [subrequest for request    in requests
-                              for subrequest in self.split_request(request)]
+        results  = []
+        receives = []
+        for request in requests:
+            key, start, stop, step = request
+            result  = np.empty(slice_size(start, stop, step), dtype=self.dtypes[key])
+            shift   = 0
+            for query in self.split_request(request):
+                self.comm.send((2, query[1:], codec, None), dest=query[0])
+                size = slice_size(*query[2:])
+                if (codec is None):
+                    receives.append((self.comm.Irecv(result[shift: shift + size], source=query[0]), None))
+                else:
+                    message = np.empty(bound(size * result.itemsize), dtype=np.uint8)
+                    receives.append((self.comm.Irecv(message, source=query[0]),
+                                     partial(decode, message, result[shift: shift + size])))
+                shift += size
+            results.append(result)
+
+        self.complete(receives, results, finish)
+        return results
+
+    def gather(self, keys, indices, finish=None):
+        """
+        Gets the elements of arrays at arbitrary indexes.
+            the indexes are grouped by slave, each slave gets one request per array
+            with its local indexes and answers with the elements in the same order,
+            the elements of each slave are placed as soon as they arrive
+
+        Params:
+            :keys    -- [int]: keys (ids) of the arrays
+            :indices -- ndarray: int64 indexes of the elements, negative indexes count from the end
+            :finish  -- function: called with the results once they are received,
+                                  the responses are then received by the main loop, None to wait for them
+
+        Return:
+            :results -- [ndarray]: [ elements of each array ]
+                -1 if the elements do not fit in max_size
+                -2 if no array with requested key
+                -3 if an index is out of an array
+        """
+
+        for key in keys:
+            if (key not in self.block_infos):
+                return -2
+        if (len(indices) * len(keys) > self.max_size):
+            return -1
+        wrapped = [wrap_indices(indices, self.size_of(key)) for key in keys]
+        if (any(array is None for array in wrapped)):
+            return -3
+
+        results  = []
+        receives = []
+        for key, array in zip(keys, wrapped):
+            result = np.empty(len(array), dtype=self.dtypes[key])
+            blocks = least_served(self.copies(key), self.served)
+            for rank, slave_key, positions, local in split_indices(blocks, key, array):
+                self.comm.send((18, slave_key, len(local), None), dest=rank)
+                self.outbox.send(local, rank)
+                values = np.empty(len(local), dtype=self.dtypes[key])
+                receives.append((self.comm.Irecv(values, source=rank), partial(place, result, positions, values)))
+                self.served[rank] = self.served.get(rank, 0) + len(local)
+            results.append(result)
+
+        self.complete(receives, results, finish)
+        return results
+
+    def scatter(self, keys, indices, value):
+        """
+        Sets the elements of arrays at arbitrary indexes, in every copy.
+            with repeated indexes the last value is kept
+
+        Params:
+            :keys    -- [int]: keys (ids) of the arrays
+            :indices -- ndarray: int64 indexes of the elements, negative indexes count from the end
+            :value   -- scalar or ndarray: value broadcasted or one value per index
+
+        Return:
+            :status  -- int: status value
+                 0 if the set is successful
+                -2 if no array with requested key
+                -3 if an index is out of an array or value and indices have not same size
+        """
+
+        for key in keys:
+            if (key not in self.block_infos):
+                return -2
+        scalar = np.ndim(value) == 0
+        if (not scalar and len(value) != len(indices)):
+            return -3
+        wrapped = [wrap_indices(indices, self.size_of(key)) for key in keys]
+        if (any(array is None for array in wrapped)):
+            return -3
+
+        for key, array in zip(keys, wrapped):
+            if (not scalar):
+                values = value.astype(self.dtypes[key], copy=False)
+            for blocks in self.copies(key):
+                for rank, slave_key, positions, local in split_indices(blocks, key, array):
+                    self.comm.send((19, slave_key, len(local), value if (scalar) else None, None), dest=rank)
+                    self.outbox.send(local, rank)
+                    if (not scalar):
+                        self.outbox.send(np.ascontiguousarray(values[positions]), rank)
+        return 0
+
+    def copy(self, target, source):
+        """
+        Copies a slice of an array to a slice of an array, in every copy of the target.
+            the read is paired with the write of each copy of the target, the slaves
+            holding a pair exchange the elements directly, a pair on one slave is a
+            local copy, overlapping slices of one array are copied as with memmove
 
-        for query in queries:
-            rank    = query[0]
-            message = query[1:]
-            self.comm.isend((2, message), dest=rank)
+        Params:
+            :target -- [int, int, int, int]: [key, start, stop, step] written
+            :source -- [int, int, int, int]: [key, start, stop, step] read
+
+        Return:
+            :status -- int: status value
+                 0 if the copy is successful
+                -2 if no array with requested key
+                -3 if the slices have not same size
+        """
 
-        responses = []
-        for rank, _, _, _, _ in queries:
-            responses.append((rank, self.comm.recv(source=rank)))
+        status = self.is_not_conform([target, source], limited=False)
+        if (status != 0):
+            return status
+        if (slice_size(*target[1:]) != slice_size(*source[1:])):
+            return -3
 
-        return self.merge_responses(responses)
+        sources = self.split_request(source)
+        pairs   = []
+        for queries in self.split_writes(target):
+            pairs += pair_queries(sources, queries)
+        # a slice moved towards the end of its array is copied from its end
+        reverse = target[0] == source[0] and target[1] > source[1]
+        if (reverse):
+            pairs.reverse()
 
+        # each slave gets its parts in the order of the pairs, so that two slaves meet on each pair
+        plans = {}
+        dtype = self.dtypes[source[0]].str
+        for read, write in pairs:
+            if (read[0] == write[0]):
+                plans.setdefault(read[0], []).append((read[1:], write[1:], None, None))
+            else:
+                plans.setdefault(read[0], []).append((read[1:], None, write[0], None))
+                plans.setdefault(write[0], []).append((None, write[1:], read[0], dtype))
+        for rank, plan in plans.items():
+            self.comm.send((21, plan, reverse), dest=rank)
+        for rank in plans:
+            self.comm.recv(source=rank)
+        return 0
 
-    def setitem(self, requests, value):
+    def setitem(self, requests, value, codec=None):
         """
         Sets requested items to value
             requests can be one array or slice of arrays
             requested array can be hole or sliced [start:stop:step]
-            value can be an integer which will be broadcasted int arrays
+            value can be a scalar which will be broadcasted by the slaves
             value can be an array of the same size of the slice
             if request contains multiple arrays, they will all be set to the same value
+            each subrequest is encoded on its own with codec
 
         Params:
             :requests -- [ [int, int, int, int] ]: [ [key, start, stop, step] ]
-            :value    -- int or [int]:
+            :value    -- scalar or ndarray:
+            :codec    -- str: codec of the buffers sent to the slaves (see codec.codecs), None for raw buffers
 
         Return:
             :status   -- int: status value
@@ -225,36 +1738,172 @@ class Master:
             return status
 
         _, start, stop, step = requests[0]
-        total_size = (stop - start)     // step \
-                   + bool((stop - start) % step)
-        if type(value) == int:
-            value = [value] * total_size
+        total_size = slice_size(start, stop, step)
+        scalar     = np.ndim(value) == 0
+        if (not scalar and len(value) != total_size):
+            return -3
+
+        for request in requests:
+            key = request[0]
+            if (not scalar):
+                array = value.astype(self.dtypes[key], copy=False)
+            for queries in self.split_writes(request):
+                shift = 0
+                for query in queries:
+                    rank, key, start, stop, step = query
+                    size = slice_size(start, stop, step)
+                    if (scalar):
+                        self.comm.send((3, query[1:], value, None, None), dest=rank)
+                    elif (codec is None):
+                        self.comm.send((3, query[1:], None, None, None), dest=rank)
+                        self.outbox.send(array[shift: shift + size], rank)
+                    else:
+                        self.comm.send((3, query[1:], None, codec, None), dest=rank)
+                        self.outbox.send(encode(array[shift: shift + size], codec), rank)
+                    shift += size
+        return 0
+
+    def update(self, target, op, values, indices, fetch, finish=None):
+        """
+        Applies a read-modify-write update to slices or indexes of arrays, in every copy.
+            add, max and min combine the elements with values, repeated indexes are all applied
+            cas sets the elements equal to the expected values to the new values
+            the values before the update are read from the first copy
+
+        Params:
+            :target  -- [ [int, int, int, int] ] or [int]: [ [key, start, stop, step] ],
+                                                           or keys if indices are given
+            :op      -- str: update (see updates)
+            :values  -- [scalar or ndarray]: operand, or expected and new values of a cas
+            :indices -- ndarray: int64 indexes, negative indexes count from the end, None to update slices
+            :fetch   -- bool: return the values before the update
+            :finish  -- function: called with the results once the values before the update are received,
+                                  the responses are then received by the main loop, None to wait for them
+
+        Return:
+            :results -- [ndarray] or int: values before the update of each array if fetch, 0 otherwise
+                -1 if the fetched values do not fit in max_size
+                -2 if no array with requested key
+                -3 if unknown update, an index is out of an array or values have not the right size
+        """
+
+        if (op not in updates or len(values) != (2 if (op == "cas") else 1)):
+            return -3
+        if (indices is None):
+            status = self.is_not_conform(target, limited=fetch)
+            if (status != 0):
+                return status
+            keys    = [request[0] for request in target]
+            counts  = [slice_size(*request[1:]) for request in target]
         else:
-            if len(value) != total_size:
+            keys    = target
+            if (any(key not in self.block_infos for key in keys)):
+                return -2
+            if (fetch and len(indices) * len(keys) > self.max_size):
+                return -1
+            wrapped = [wrap_indices(indices, self.size_of(key)) for key in keys]
+            if (any(array is None for array in wrapped)):
+                return -3
+            counts  = [len(indices)] * len(keys)
+        for value in values:
+            if (np.ndim(value) != 0 and any(len(value) != count for count in counts)):
                 return -3
 
-        queries = [subrequest for request    in requests
-                              for subrequest in self.split_request(request)]
+        results  = []
+        receives = []
+        for i, key in enumerate(keys):
+            result = np.empty(counts[i], dtype=self.dtypes[key])
+            for copy, blocks in enumerate(self.copies(key)):
+                if (indices is None):
+                    parts = update_parts(blocks, target[i])
+                else:
+                    parts = update_parts(blocks, key, wrapped[i])
+                for receive, positions, old in send_update(self.comm, self.dtypes[key], parts, op, values,
+                                                           fetch and copy == 0):
+                    receives.append((receive, None if (old is None) else partial(place, result, positions, old)))
+            results.append(result)
+
+        results = results if (fetch) else 0
+        self.complete(receives, results, finish)
+        return results
+
+    def recv_values(self, descriptors, source, tag):
+        """
+        Receives the values of an update
+            arrays are sent by the client as raw buffers following the request, in order
+
+        Params:
+            :descriptors -- [(scalar, str, int)]: [(value, dtype, size)], value is None for an array
+            :source      -- int: rank of the client
+            :tag         -- int: tag of the request
 
-        shift    = 0
-        last_key = None
-        for query in queries:
-            rank, key, start, stop, step = query
+        Return:
+            :values      -- [scalar or ndarray]: values of the update
+        """
 
-            if last_key != key:
-                shift    = 0
-                last_key = key
+        return [self.recv_value((None, None) + tuple(descriptor), source, tag) for descriptor in descriptors]
 
-            message    = query[1:]
-            total_size = (stop - start) // step       \
-                       +  bool((stop - start) % step)
+    def recv_value(self, request, source, tag, codec=None):
+        """
+        Receives the value of a set request
+            arrays are sent by the client as a raw buffer following the request
 
-            sub_value = value[shift: shift + total_size]
-            self.comm.send((3, message, sub_value), dest=rank)
+        Params:
+            :request -- (int, [], scalar, str, int): (3, requests, value, dtype, size, codec)
+            :source  -- int: rank of the client
+            :tag     -- int: tag of the request
+            :codec   -- str: codec of the buffer (see codec.codecs), None if not encoded
 
-            shift += total_size
-        return 0
+        Return:
+            :value   -- scalar or ndarray: value to be set
+        """
+
+        value, dtype, size = request[2:5]
+        if (value is None):
+            value = np.empty(size, dtype=dtype)
+            if (codec is None):
+                self.comm.Recv(value, source=source, tag=tag)
+                self.stats.bytes_in += value.nbytes
+            else:
+                status = MPI.Status()
+                self.comm.Probe(source=source, tag=tag, status=status)
+                message = np.empty(status.Get_count(MPI.BYTE), dtype=np.uint8)
+                self.comm.Recv(message, source=source, tag=tag)
+                self.stats.bytes_in += message.nbytes
+                decode(message, value)
+        return value
+
+    def drop_buffer(self, source, tag):
+        """
+        Receives and drops a buffer which can not be used
+
+        Params:
+            :source -- int: rank of the client
+            :tag    -- int: tag of the request
+        """
+
+        status = MPI.Status()
+        self.comm.Probe(source=source, tag=tag, status=status)
+        self.comm.Recv(bytearray(status.Get_count(MPI.BYTE)), source=source, tag=tag)
+
+    def recv_indices(self, count, source, tag):
+        """
+        Receives the indexes of a gather or a scatter request
+            sent by the client as a raw buffer following the request
+
+        Params:
+            :count   -- int: number of indexes
+            :source  -- int: rank of the client
+            :tag     -- int: tag of the request
+
+        Return:
+            :indices -- ndarray: int64 indexes
+        """
 
+        indices = np.empty(count, dtype=np.int64)
+        self.comm.Recv(indices, source=source, tag=tag)
+        self.stats.bytes_in += indices.nbytes
+        return indices
 
     def delitem(self, requests):
         """
@@ -274,12 +1923,39 @@ class Master:
             if (not key in self.block_infos):
                 status = -2
                 break
-            for rank, _, _ in self.block_infos[key]:
-                self.comm.send((4, key), dest=rank)
+            if (isinstance(self.block_infos[key], Slot)):
+                self.free_slot(self.block_infos[key])
+            else:
+                for rank, offset in self.slave_totals(key).items():
+                    self.comm.ssend((4, key), dest=rank)
+                    # give memory back to the slave
+                    self.slave_size[rank - self.first_slave] += offset
             del self.block_infos[key]
+            self.replicas.pop(key, None)
+            self.generations.pop(key, None)
+            del self.dtypes[key]
+            # invalidates block maps cached by clients
+            self.epoch += 1
 
         return status
 
+    def free_slot(self, slot):
+        """
+        Gives the slot of a deleted small array back to its slab.
+            the slot is zeroed for the next array, an empty slab is deleted
+
+        Params:
+            :slot -- Slot: placement of the array
+        """
+
+        self.bump(slot.key, [slot.rank])
+        if (self.slabs.free(slot)):
+            self.comm.ssend((4, slot.key), dest=slot.rank)
+            self.slave_size[slot.rank - self.first_slave] += slab_size
+        else:
+            stop = slot.local + size_class(slot.size)
+            self.comm.ssend((3, [slot.key, slot.local, stop, 1], 0, None, None), dest=slot.rank)
+
     def speak(self, request, verbose):
         """
         Prints requested action based on verbose level
@@ -292,22 +1968,148 @@ class Master:
             if request[0] == 0:
                 print("Master:\t\tclosing")
             elif request[0] == 1:
-                print("Master:\t\tmalloc of size {}".format(request[1]))
+                print("Master:\t\tmalloc of size {} ({}, {}, {} copies)".format(request[1],
+                    request[2],
+                    request[3] or self.policy,
+                    request[4]))
             elif request[0] == 2:
                 print("Master:\t\tget items\n{}".format(request[1]))
             elif request[0] == 3:
                 print("Master:\t\tset items\n{}".format(request[1]))
             elif request[0] == 4:
                 print("Master:\t\tdel items\n{}".format(request[1]))
+            elif request[0] == 5:
+                print("Master:\t\tlocate items\n{}".format(request[1]))
+            elif request[0] == 6:
+                print("Master:\t\tplacements of {}".format(request[1]))
+            elif request[0] == 7:
+                print("Master:\t\t{} of items\n{}".format(request[2], request[1]))
+            elif request[0] == 8:
+                print("Master:\t\tsort {}".format(request[1]))
+            elif request[0] == 9:
+                print("Master:\t\tload {}".format(request[1]))
+            elif request[0] == 10:
+                print("Master:\t\tdump {} to {}".format(request[1], request[2]))
+            elif request[0] == 11:
+                print("Master:\t\tcheckpoint to {}".format(request[1]))
+            elif request[0] == 12:
+                print("Master:\t\tstats")
+            elif request[0] == 13:
+                print("Master:\t\t{} {}".format(request[2], request[1]))
+            elif request[0] == 14:
+                print("Master:\t\tmalloc of {} arrays ({})".format(len(request[1]), request[2]))
+            elif request[0] == 15:
+                print("Master:\t\trealloc {} to {}".format(request[1], request[2]))
+            elif request[0] == 16:
+                print("Master:\t\trebalance by {}".format(request[1]))
+            elif request[0] == 18:
+                print("Master:\t\tgather {} indexes of {}".format(request[2], request[1]))
+            elif request[0] == 19:
+                print("Master:\t\tscatter {} indexes of {}".format(request[4], request[1]))
+            elif request[0] == 20:
+                print("Master:\t\t{} {} of items\n{}".format("fetch and " if (request[5]) else "",
+                    request[2],
+                    request[1]))
+            elif request[0] == 21:
+                print("Master:\t\tcopy of items\n{}\nto\n{}".format(request[2], request[1]))
             else:
                 print("Master:\t\tUnknown Request")
 
+    def complete(self, receives, results, finish):
+        """
+        Handles the slave responses of a request in the order they are received
+            without finish, or if the responses are small, they are waited for here,
+            otherwise the request is left to the main loop, which calls finish
+            once they are all handled
+
+        Params:
+            :receives -- [(MPI.Request, function)]: [(receive, function handling the response or None)]
+            :results  -- [ndarray] or int: results filled by the responses
+            :finish   -- function: called with the results, None to wait for the responses
+        """
+
+        nbytes = 0 if (type(results) == int) else sum(result.nbytes for result in results)
+        if (finish is not None and nbytes >= large_transfer):
+            while (len(self.transfers) >= max_transfers):
+                self.transfers.pop(0).wait()
+            self.transfers.append(Transfer(receives, partial(finish, results)))
+            return
+        begin = time.perf_counter()
+        Transfer(receives).wait()
+        self.stats.time("merge_responses", time.perf_counter() - begin)
+        if (finish is not None):
+            finish(results)
+
+    def progress(self):
+        """
+        Handles the slave responses already received and drops the completed sends, without blocking
+        """
+
+        self.transfers = [transfer for transfer in self.transfers if not transfer.test()]
+        self.outbox.test()
+
+    def busy(self):
+        """
+        Return:
+            :busy -- bool: True while responses are awaited or buffers are being sent
+        """
+
+        return bool(self.transfers) or self.outbox.busy()
+
+    def flush(self):
+        """
+        Waits for every request left to the main loop and every send
+        """
+
+        for transfer in self.transfers:
+            transfer.wait()
+        self.transfers = []
+        self.outbox.flush()
+
+    def reply(self, op, val, dest, tag):
+        """
+        Sends a response to a client
+            the current epoch is attached so that clients can drop stale block maps
+
+        Params:
+            :op   -- int: request opcode
+            :val  -- any: response value
+            :dest -- int: rank of the client
+            :tag  -- int: tag of the request
+        """
+
+        self.comm.send((op, val, self.epoch), dest=dest, tag=tag)
+
+    def reply_arrays(self, op, val, dest, tag, codec=None):
+        """
+        Sends the arrays of a get or a gather to a client
+            the dtypes and sizes are sent first, then each array as a raw buffer,
+            the main loop serves the next requests while the arrays are sent
+
+        Params:
+            :op    -- int: request opcode
+            :val   -- [ndarray] or int: arrays or error status
+            :dest  -- int: rank of the client
+            :tag   -- int: tag of the request
+            :codec -- str: codec of the buffers (see codec.codecs), None for raw buffers
+        """
+
+        if (type(val) == int):
+            self.reply(op, val, dest, tag)
+            return
+        self.reply(op, [(array.dtype.str, len(array)) for array in val], dest, tag)
+        for array in val:
+            if (codec is not None):
+                array = encode(array, codec)
+            self.outbox.send(array, dest, tag)
+            self.stats.bytes_out += array.nbytes
+
     def close_all(self):
         """
         Sends close message to all slaves
         """
         
-        for rank in range(2, self.comm.Get_size()):
+        for rank in range(self.first_slave, self.comm.Get_size()):
             self.comm.send((0, ), dest=rank)
 
     def run(self, verbose):
@@ -318,21 +2120,100 @@ class Master:
             :verbose -- int: level of verbose
         """
         
+        status = MPI.Status()
+        closed = 0
+        req    = None
         while True:
-            req = self.comm.recv(source=0)
+            begin = time.perf_counter()
+            if (req is not None):
+                self.stats.record(req[0], begin - received)
+            # responses and sends in flight progress while the next request is awaited
+            req      = next_request(self.comm, status, self.progress, self.busy)
+            received = time.perf_counter()
+            self.stats.idle += received - begin
+            source   = status.Get_source()
+            tag      = status.Get_tag()
             self.speak(req, verbose)
             if req[0] == 0:
-               self.close_all()
-               break
+                # slaves are closed once every client is done
+                closed += 1
+                if (closed == self.clients):
+                    self.flush()
+                    self.close_all()
+                    break
             elif req[0] == 1:
-                key = self.malloc(req[1])
-                self.comm.send((1, key), dest=0)
+                key = self.malloc(req[1], req[2], req[3], req[4])
+                self.reply(1, key, source, tag)
             elif req[0] == 2:
-                val = self.getitem(req[1])
-                self.comm.send((2, val), dest=0)
+                val = self.getitem(req[1], req[2], partial(self.reply_arrays, 2, dest=source, tag=tag, codec=req[2]))
+                if (type(val) == int):
+                    self.reply(2, val, source, tag)
             elif req[0] == 3:
-                val = self.setitem(req[1], req[2])
-                self.comm.send((3, val), dest=0)
+                if (req[5] is not None and req[5] not in codecs):
+                    # the buffer can not be decoded
+                    if (req[2] is None):
+                        self.drop_buffer(source, tag)
+                    val = -3
+                else:
+                    value = self.recv_value(req, source, tag, req[5])
+                    val   = self.setitem(req[1], value, req[5])
+                self.reply(3, val, source, tag)
             elif req[0] == 4:
                 val = self.delitem(req[1])
-                self.comm.send((4, val), dest=0)
+                self.reply(4, val, source, tag)
+            elif req[0] == 5:
+                val = self.locate(req[1], req[2])
+                self.reply(5, val, source, tag)
+            elif req[0] == 6:
+                val = self.placements(req[1])
+                self.reply(6, val, source, tag)
+            elif req[0] == 7:
+                val = self.reduce(req[1], req[2], req[3])
+                self.reply(7, val, source, tag)
+            elif req[0] == 8:
+                val = self.sort(req[1])
+                self.reply(8, val, source, tag)
+            elif req[0] == 9:
+                val = self.load(req[1], req[2], req[3])
+                self.reply(9, val, source, tag)
+            elif req[0] == 10:
+                val = self.dump(req[1], req[2])
+                self.reply(10, val, source, tag)
+            elif req[0] == 11:
+                val = self.checkpoint(req[1], req[2])
+                self.reply(11, val, source, tag)
+            elif req[0] == 12:
+                val = self.summary()
+                self.reply(12, val, source, tag)
+            elif req[0] == 13:
+                val = self.generate(req[1], req[2], req[3])
+                self.reply(13, val, source, tag)
+            elif req[0] == 14:
+                val = self.malloc_many(req[1], req[2], req[3])
+                self.reply(14, val, source, tag)
+            elif req[0] == 15:
+                val = self.realloc(req[1], req[2])
+                self.reply(15, val, source, tag)
+            elif req[0] == 16:
+                val = self.rebalance(req[1])
+                self.reply(16, val, source, tag)
+            elif req[0] == 18:
+                indices = self.recv_indices(req[2], source, tag)
+                val     = self.gather(req[1], indices, partial(self.reply_arrays, 18, dest=source, tag=tag))
+                if (type(val) == int):
+                    self.reply(18, val, source, tag)
+            elif req[0] == 19:
+                value   = self.recv_value(req, source, tag)
+                indices = self.recv_indices(req[4], source, tag)
+                val     = self.scatter(req[1], indices, value)
+                self.reply(19, val, source, tag)
+            elif req[0] == 20:
+                values  = self.recv_values(req[3], source, tag)
+                indices = None if (req[4] is None) else self.recv_indices(req[4], source, tag)
+                val     = self.update(req[1], req[2], values, indices, req[5],
+                                          partial(self.reply_arrays, 20, dest=source, tag=tag))
+                if (type(val) == int and val < 0):
+                    self.reply(20, val, source, tag)
+            elif req[0] == 21:
+                val = self.copy(req[1], req[2])
+                self.reply(21, val, source, tag)
@@ -0,0 +1,193 @@
+import numpy as np
+
+from store import page_size
+
+"""
+Slabs of small arrays:
+    arrays of at most slab_max elements are packed into slabs, plain arrays of
+    slab_size elements stored whole on one slave, a slab is cut in slots of one
+    size class (a power of two) and a small array takes one slot of the smallest
+    class holding it, so it costs no slave array, no malloc message and no block map
+"""
+
+# largest array packed in a slab
+slab_max = 1024
+# smallest slot
+min_class = 8
+# number of elements of a slab, one page of the slave store
+slab_size = page_size
+
+
+def size_class(size):
+    """
+    Gets the slot size of an array
+
+    Params:
+        :size -- int: number of elements
+
+    Return:
+        :slot -- int: smallest power of two >= size, at least min_class
+    """
+
+    return max(min_class, 1 << max(0, size - 1).bit_length())
+
+
+class Slot:
+    """
+    Placement of a small array, used in place of its BlockMap:
+        the array is the range [local, local + size) of the slab key on rank
+    """
+
+    __slots__ = ("rank", "key", "local", "size")
+
+    def __init__(self, rank, key, local, size):
+        self.rank = rank
+        self.key = key
+        self.local = local
+        self.size = size
+
+    def __len__(self):
+        return 1
+
+    def __iter__(self):
+        return iter([(self.rank, 0, self.size)])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return "Slot({}, {}, {}, {})".format(self.rank, self.key, self.local, self.size)
+
+    def __getstate__(self):
+        return (self.rank, self.key, self.local, self.size)
+
+    def __setstate__(self, state):
+        self.rank, self.key, self.local, self.size = state
+
+    def split(self, request):
+        """
+        Translates a request on the array into a request on its slab.
+
+        Params:
+            :request    -- [int, int, int, int]: [key, start, stop, step]
+
+        Return:
+            :subrequest -- [[int, int, int, int, int]]: [[rank, slab key, start, stop, step]]
+        """
+
+        _, start, stop, step = request
+        stop = min(stop, self.size)
+        if (start >= stop):
+            return []
+        return [[self.rank, self.key, self.local + start, self.local + stop, step]]
+
+    def locate(self, indices):
+        """
+        Finds the slave and the index in the slab of elements of the array.
+
+        Params:
+            :indices -- ndarray: indexes of the elements, in [0, size)
+
+        Return:
+            :ranks   -- ndarray: rank of the slave storing each element
+            :local   -- ndarray: index of each element in the slab
+        """
+
+        return np.full(len(indices), self.rank, dtype=np.int64), self.local + indices
+
+
+class Slabs:
+    def __init__(self):
+        # slabs have negative keys so that the keys of the arrays stay consecutive
+        self.key_generator = -1
+        # slab key: [rank, dtype, slot size, slots in use, next never used slot, freed slots]
+        self.slabs = {}
+        # (dtype, slot size): keys of the slabs with a free slot
+        self.open = {}
+
+    def __len__(self):
+        return len(self.slabs)
+
+    def take(self, dtype, size):
+        """
+        Takes a free slot in an open slab, freed slots first
+
+        Params:
+            :dtype -- str: numpy dtype string of the array
+            :size  -- int: number of elements of the array
+
+        Return:
+            :slot  -- Slot: placement of the array, None if no open slab has a free slot
+        """
+
+        keys = self.open.get((dtype, size_class(size)))
+        if (not keys):
+            return None
+        key  = keys[-1]
+        slab = self.slabs[key]
+        rank, _, slot_size, used, fresh, freed = slab
+        if (freed):
+            local = freed.pop()
+        else:
+            local   = fresh * slot_size
+            slab[4] = fresh + 1
+        slab[3] = used + 1
+        if (not freed and slab[4] * slot_size == slab_size):
+            keys.pop()
+        return Slot(rank, key, local, size)
+
+    def add(self, rank, dtype, slot_size):
+        """
+        Registers a new empty slab
+
+        Params:
+            :rank      -- int: rank of the slave holding the slab
+            :dtype     -- str: numpy dtype string of the slab
+            :slot_size -- int: size class of the slab
+
+        Return:
+            :key       -- int: key of the slab array
+        """
+
+        key = self.key_generator
+        self.key_generator -= 1
+        self.slabs[key] = [rank, dtype, slot_size, 0, 0, []]
+        self.open.setdefault((dtype, slot_size), []).append(key)
+        return key
+
+    def free(self, slot):
+        """
+        Gives the slot of a deleted array back to its slab
+
+        Params:
+            :slot  -- Slot: placement of the array
+
+        Return:
+            :empty -- bool: True if the slab holds no more arrays, it is then forgotten
+        """
+
+        slab = self.slabs[slot.key]
+        rank, dtype, slot_size, used, fresh, freed = slab
+        keys = self.open[(dtype, slot_size)]
+        if (used == 1):
+            del self.slabs[slot.key]
+            if (slot.key in keys):
+                keys.remove(slot.key)
+            return True
+        if (not freed and fresh * slot_size == slab_size):
+            keys.append(slot.key)
+        freed.append(slot.local)
+        slab[3] = used - 1
+        return False
+
+    def footprint(self):
+        """
+        Gets the occupancy of the slabs
+
+        Return:
+            :footprint -- {str: int}: number of slabs, arrays in slabs and elements of their slots
+        """
+
+        return {"slabs": len(self.slabs),
+                "slab_arrays": sum(slab[3] for slab in self.slabs.values()),
+                "slab_slot_elements": sum(slab[2] * slab[3] for slab in self.slabs.values())}
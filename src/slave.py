@@ -1,48 +1,789 @@
+import os
+import pickle
+import time
+
 from mpi4py import MPI
+import numpy as np
+
+import binfile
+from codec import decode, encode
+from stats import Stats
+from store import Store, page_count, page_size
+from transfer import Outbox, next_request
+
+# random fills draw the elements of [i * random_chunk, (i + 1) * random_chunk) from seed (seed, i)
+# so that they do not depend on the placement of the array
+random_chunk = 65536
+
+# elementwise functions of the updates (see master.updates), cas is applied with np.where
+ufuncs = {"add": np.add, "max": np.maximum, "min": np.minimum}
+
+# requests which do not modify the arrays, served while the responses of earlier reads are sent,
+# the others wait for these sends since a response may be a view of a page
+reads = (2, 7, 12, 17, 18, 22)
+
+
+def random_values(seed, low, high, start, stop, dtype):
+    """
+    Draws the elements [start:stop] of a seeded uniform random array
+
+    Params:
+        :seed   -- int: seed of the array
+        :low    -- number: lowest value
+        :high   -- number: highest value (excluded)
+        :start  -- int: first index
+        :stop   -- int: last index (excluded)
+        :dtype  -- numpy dtype: type of the elements
+
+    Return:
+        :values -- ndarray: elements [start:stop]
+    """
+
+    values = np.empty(stop - start, dtype=dtype)
+    for chunk in range(start // random_chunk, (stop - 1) // random_chunk + 1):
+        generator = np.random.default_rng([seed, chunk])
+        if (np.issubdtype(dtype, np.integer)):
+            drawn = generator.integers(low, high, size=random_chunk, dtype=dtype)
+        else:
+            drawn = generator.uniform(low, high, size=random_chunk).astype(dtype)
+        first = max(start, chunk * random_chunk)
+        last  = min(stop, (chunk + 1) * random_chunk)
+        values[first - start: last - start] = drawn[first - chunk * random_chunk: last - chunk * random_chunk]
+    return values
+
+
+def acknowledgement(applied):
+    """
+    Builds the answer of a slave to a write of a client
+
+    Params:
+        :applied -- bool: the write was applied, False if it was routed with a stale block map
+
+    Return:
+        :ack     -- ndarray: one byte if applied, empty otherwise so that the client resends the write
+    """
+
+    return np.ones(1 if (applied) else 0, dtype=np.uint8)
+
+
+def chunks(query, reverse=False):
+    """
+    Cuts a slice in slices of at most page_size elements
+
+    Params:
+        :query   -- [int, int, int, int]: [key, start, stop, step]
+        :reverse -- bool: last slice first
+
+    Return:
+        :slices  -- [(int, int, int)]: [(start, stop, step)]
+    """
+
+    key, start, stop, step = query
+    count  = len(range(start, stop, step))
+    slices = [(start + first * step, start + (min(first + page_size, count) - 1) * step + 1, step)
+              for first in range(0, count, page_size)]
+    return slices[::-1] if (reverse) else slices
+
 
 class Slave:
-    def __init__(self, rank, max_size):
+    def __init__(self, rank, max_size, first_slave=2, peers=None, disk_size=0, spill_dir=None, window=None):
         self.comm = MPI.COMM_WORLD
-        self.rank = rank - 2
+        # communicator for slave to slave data, never read by the main loop
+        self.peers = MPI.COMM_WORLD if (peers is None) else peers
+        self.rank = rank - first_slave
+        # writes sent by any other rank come from a direct client and are acknowledged
+        self.master = first_slave - 1
         self.max_size = max_size
-        self.memory = {}
+        # pages beyond max_size elements are spilled to local disk,
+        # arrays which fit in the window are placed in it for the one-sided accesses of the clients
+        self.memory = Store(max_size, disk_size, spill_dir, "slave-{}".format(self.rank), window)
+        self.runs = {}
+        # elements merged by this slave in the last sort
+        self.sort_run = 0
+        # pages modified since the last checkpoint, written by incremental checkpoints
+        self.dirty = {}
+        self.checkpointed = None
+        # generation of the keys set by the master, requests routed with older block maps carry an older one
+        self.generations = {}
+        # elements read or written in each array since the last rebalance
+        self.traffic = {}
+        self.stats = Stats()
+        # responses being sent to the master and the clients
+        self.outbox = Outbox(self.comm)
 
-    def malloc(self, key, size):
+    def malloc(self, key, size, dtype):
         """
-        Allocates array with requested size and key
+        Allocates a contiguous typed array with requested size and key
 
         Params:
-            :key  -- int: array key (id) 
-            :size -- int: size of memory that needs to be allocated
+            :key   -- int: array key (id) 
+            :size  -- int: size of memory that needs to be allocated
+            :dtype -- str: numpy dtype string of the array elements
         """
 
-        self.memory[key] = [None] * size 
+        self.memory.malloc(key, size, dtype, self.generations.get(key, 0))
+        self.dirty[key] = np.ones(page_count(size), dtype=bool)
+
+    def touch(self, key, start=0, stop=None):
+        """
+        Marks pages of an array as modified since the last checkpoint
 
-    def getitem(self, query):
+        Params:
+            :key   -- int: array key (id)
+            :start -- int: first modified index
+            :stop  -- int: last modified index (excluded), end of array if None
+        """
+
+        size = self.memory.size(key)
+        stop = size if (stop is None) else min(stop, size)
+        if (start < stop):
+            self.dirty[key][start // page_size: (stop - 1) // page_size + 1] = True
+
+    def stale(self, key, generation):
+        """
+        Checks a request against the generation of its key
+
+        Params:
+            :key        -- int: array key (id)
+            :generation -- int: generation of the block map of the request, None to skip the check
+
+        Return:
+            :stale      -- bool: True if the array was deleted or its layout changed since the block map
+        """
+
+        return key not in self.memory or (generation is not None and generation != self.generations.get(key, 0))
+
+    def getitem(self, query, generation=None):
         """
         Returns requested slice of requested array
 
         Params:
-            :query -- [int, int, int, int]: [key, start, stop, step]
+            :query      -- [int, int, int, int]: [key, start, stop, step]
+            :generation -- int: generation of the block map of the request, None to skip the check
 
         Return:
-            :array -- [int]: requested slice of requested array
+            :array      -- ndarray: contiguous copy or view of the requested slice
+                None if the array was deleted, resized or moved (stale client block map)
         """
 
         key, start, stop, step = query
-        return (key, self.memory[key][start:stop:step])
+        if (self.stale(key, generation) or stop > self.memory.size(key)):
+            return None
+        array = self.memory.read(key, start, stop, step)
+        self.traffic[key] = self.traffic.get(key, 0) + len(array)
+        return array
 
-    def setitem(self, query, value):
+    def setitem(self, query, value, source, tag, codec=None, generation=None):
         """
         Sets requested slice of requested array to value
+            if value is None the values are received as a raw buffer from source
+
+        Params:
+            :query      -- [int, int, int, int]: [key, start, stop, step]
+            :value      -- scalar or None: value broadcasted into the slice
+            :source     -- int: rank sending the buffer
+            :tag        -- int: tag of the request
+            :codec      -- str: codec of the buffer (see codec.codecs), None if not encoded
+            :generation -- int: generation of the block map of the request, None to skip the check
+
+        Return:
+            :applied    -- bool: False if the array was deleted, resized or moved (stale client block map)
+        """
+
+        key, start, stop, step = query
+        if (self.stale(key, generation) or (generation is not None and stop > self.memory.size(key))):
+            # the value is dropped, a direct client resends it with fresh block maps
+            if (value is None):
+                status = MPI.Status()
+                self.comm.Probe(source=source, tag=tag, status=status)
+                self.comm.Recv(bytearray(status.Get_count(MPI.BYTE)), source=source, tag=tag)
+            return False
+        self.touch(key, start, stop)
+        if (value is None):
+            stop  = min(stop, self.memory.size(key))
+            value = np.empty(len(range(start, stop, step)), dtype=self.memory.dtype(key))
+            if (codec is None):
+                self.comm.Recv(value, source=source, tag=tag)
+                self.stats.bytes_in += value.nbytes
+            else:
+                decode(np.frombuffer(self.recv_buffer(source, tag), dtype=np.uint8), value)
+        self.memory.write(key, start, stop, step, value)
+        self.traffic[key] = self.traffic.get(key, 0) + len(range(start, stop, step))
+        return True
+
+    def recv_indices(self, key, count, source, tag):
+        """
+        Receives the local indexes of a gather or a scatter as a raw buffer from source
+
+        Params:
+            :key     -- int: array key (id)
+            :count   -- int: number of indexes
+            :source  -- int: rank sending the buffer
+            :tag     -- int: tag of the request
+
+        Return:
+            :indices -- ndarray: int64 indexes, None if the array was deleted or resized
+                                 (stale client block map)
+        """
+
+        indices = np.empty(count, dtype=np.int64)
+        self.comm.Recv(indices, source=source, tag=tag)
+        if (key not in self.memory or (count and indices.max() >= self.memory.size(key))):
+            return None
+        return indices
+
+    def recv_buffer(self, source, tag):
+        """
+        Receives a raw buffer of any size from source
 
         Params:
-            :query -- [int, int, int, int]: [key, start, stop, step]
-            :value -- [int]: array of same size of slice
+            :source -- int: rank sending the buffer
+            :tag    -- int: tag of the request
+
+        Return:
+            :buffer -- bytearray: bytes of the buffer
+        """
+
+        status = MPI.Status()
+        self.comm.Probe(source=source, tag=tag, status=status)
+        buffer = bytearray(status.Get_count(MPI.BYTE))
+        self.comm.Recv(buffer, source=source, tag=tag)
+        self.stats.bytes_in += len(buffer)
+        return buffer
+
+    def gather(self, key, count, source, tag, generation=None):
+        """
+        Returns the elements of an array at the indexes received from source
+
+        Params:
+            :key        -- int: array key (id)
+            :count      -- int: number of indexes
+            :source     -- int: rank sending the indexes
+            :tag        -- int: tag of the request
+            :generation -- int: generation of the block map of the request, None to skip the check
+
+        Return:
+            :array      -- ndarray: elements in the order of the indexes,
+                empty if the array was deleted, resized or moved (stale client block map)
+        """
+
+        indices = self.recv_indices(key, count, source, tag)
+        if (indices is None or self.stale(key, generation)):
+            return np.empty(0, dtype=np.uint8)
+        self.traffic[key] = self.traffic.get(key, 0) + count
+        return self.memory.gather(key, indices)
+
+    def scatter(self, key, count, value, source, tag, generation=None):
+        """
+        Sets the elements of an array at the indexes received from source
+            if value is None the values follow the indexes as a raw buffer from source
+
+        Params:
+            :key        -- int: array key (id)
+            :count      -- int: number of indexes
+            :value      -- scalar or None: value broadcasted to the elements
+            :source     -- int: rank sending the buffers
+            :tag        -- int: tag of the request
+            :generation -- int: generation of the block map of the request, None to skip the check
+
+        Return:
+            :applied    -- bool: False if the array was deleted, resized or moved (stale client block map)
+        """
+
+        indices = self.recv_indices(key, count, source, tag)
+        if (value is None):
+            buffer = self.recv_buffer(source, tag)
+        if (indices is None or self.stale(key, generation)):
+            # the values are dropped, a direct client resends them with fresh block maps
+            return False
+        if (value is None):
+            value = np.frombuffer(buffer, dtype=self.memory.dtype(key))
+        self.dirty[key][indices // page_size] = True
+        self.memory.scatter(key, indices, value)
+        self.traffic[key] = self.traffic.get(key, 0) + count
+        return True
+
+    def update(self, query, op, values, fetch, source, tag, generation=None):
+        """
+        Applies a read-modify-write update to a slice or to indexes of an array
+            the local indexes, then the array values, follow as raw buffers from source
+            requests are run one at a time so the update is atomic on the elements of this slave
+
+        Params:
+            :query  -- [int, int, int, int] or [int, int]: [key, start, stop, step] or [key, number of indexes]
+            :op     -- str: add, max, min or cas
+            :values -- [scalar or None]: operand, or expected and new values of a cas,
+                                         None for values received as a raw buffer
+            :fetch  -- bool: return the values before the update
+            :source -- int: rank sending the request
+            :tag    -- int: tag of the request
+            :generation -- int: generation of the block map of the request, None to skip the check
+
+        Return:
+            :array  -- ndarray: values before the update if fetch, an acknowledgement otherwise,
+                empty if the array was deleted, resized or moved (stale client block map)
+        """
+
+        key = query[0]
+        if (len(query) == 2):
+            indices = self.recv_indices(key, query[1], source, tag)
+            valid   = indices is not None
+        else:
+            valid   = key in self.memory
+        buffers = [self.recv_buffer(source, tag) if (value is None) else None for value in values]
+        if (not valid or self.stale(key, generation)):
+            # the update is dropped, a direct client resends it with fresh block maps
+            return acknowledgement(False)
+
+        dtype  = self.memory.dtype(key)
+        values = [np.frombuffer(buffer, dtype=dtype) if (value is None) else np.array(value, dtype=dtype)
+                  for value, buffer in zip(values, buffers)]
+        if (len(query) == 2):
+            old = self.memory.gather(key, indices) if (fetch or op == "cas") else None
+            if (op == "cas"):
+                expected, new = values
+                swap = old == expected
+                self.memory.scatter(key, indices[swap], new if (np.ndim(new) == 0) else new[swap])
+            else:
+                self.memory.accumulate(key, indices, ufuncs[op], values[0])
+            self.dirty[key][indices // page_size] = True
+            count = len(indices)
+        else:
+            _, start, stop, step = query
+            stop = min(stop, self.memory.size(key))
+            old  = self.memory.read(key, start, stop, step)
+            if (fetch):
+                # a slice in one page is read as a view of the page
+                old = old.copy()
+            if (op == "cas"):
+                expected, new = values
+                self.memory.write(key, start, stop, step, np.where(old == expected, new, old))
+            else:
+                self.memory.write(key, start, stop, step, ufuncs[op](old, values[0]))
+            self.touch(key, start, stop)
+            count = len(old)
+        self.traffic[key] = self.traffic.get(key, 0) + count
+        return old if (fetch) else acknowledgement(True)
+
+    def reduce(self, query, op, args):
+        """
+        Reduces requested slice of requested array
+
+        Params:
+            :query   -- [int, int, int, int]: [key, start, stop, step]
+            :op      -- str: reduction (see master.reductions)
+            :args    -- (int, (float, float)): (bins, range) of a histogram
+
+        Return:
+            :partial -- any: reduction of the slice, (value, index) for argmin/argmax
+                None if the array was deleted (stale client block map)
         """
 
         key, start, stop, step = query
-        self.memory[key][start:stop:step] = value
+        if (key not in self.memory):
+            return None
+        view = self.memory.read(key, start, stop, step)
+        if (op == "sum"):
+            return view.sum()
+        elif (op == "min"):
+            return view.min()
+        elif (op == "max"):
+            return view.max()
+        elif (op == "count"):
+            return len(view)
+        elif (op == "argmin"):
+            index = int(view.argmin())
+            return (view[index], index)
+        elif (op == "argmax"):
+            index = int(view.argmax())
+            return (view[index], index)
+        elif (op == "histogram"):
+            bins, value_range = args
+            return np.histogram(view, bins, value_range)[0]
+
+    def sort_sample(self, key, stride):
+        """
+        Sorts the local part of an array and samples it
+            the local part is held in RAM until the sort is placed
+
+        Params:
+            :key     -- int: key (id) of array
+            :stride  -- int: distance between two samples
+
+        Return:
+            :samples   -- ndarray: regular samples of the sorted local part
+            :positions -- ndarray: local positions of the samples, which break ties between equal samples
+        """
+
+        local = self.memory.read(key)
+        local.sort()
+        self.runs[key] = local
+        return local[stride // 2::stride].copy(), np.arange(stride // 2, len(local), stride)
+
+    def sort_split(self, key, splitters, ranks):
+        """
+        Splits the sorted local part of an array into buckets
+            elements are ordered by value, then by slave, then by local position,
+            so that runs of equal values are split across buckets
+
+        Params:
+            :key       -- int: key (id) of array
+            :splitters -- (ndarray, ndarray, ndarray): values, slave indexes in ranks and local positions
+                                                       of the upper bounds of the buckets but the last one
+            :ranks     -- [int]: ranks of the slaves
+
+        Return:
+            :counts    -- [int]: number of local elements in each bucket
+        """
+
+        local  = self.runs[key]
+        me     = ranks.index(self.comm.Get_rank())
+        values, slaves, positions = splitters
+        low    = np.searchsorted(local, values, side="left")
+        high   = np.searchsorted(local, values, side="right")
+        cuts   = np.where(slaves > me, high, np.where(slaves < me, low, np.clip(positions + 1, low, high)))
+        bounds = [0] + list(cuts) + [len(local)]
+        self.runs[key] = (local, bounds)
+        return [int(bounds[i + 1] - bounds[i]) for i in range(len(bounds) - 1)]
+
+    def sort_exchange(self, key, ranks, counts):
+        """
+        Sends each bucket to its slave and merges the received buckets into a sorted run
+
+        Params:
+            :key    -- int: key (id) of array
+            :ranks  -- [int]: ranks of the slaves, bucket i goes to ranks[i]
+            :counts -- [[int]]: counts[i][j] elements of slave i are in bucket j
+        """
+
+        local, bounds = self.runs[key]
+        me       = ranks.index(self.comm.Get_rank())
+        pieces   = []
+        requests = []
+        for i, rank in enumerate(ranks):
+            if (i == me):
+                pieces.append(local[bounds[i]: bounds[i + 1]])
+            elif (counts[i][me] != 0):
+                piece = np.empty(counts[i][me], dtype=local.dtype)
+                requests.append(self.peers.Irecv(piece, source=rank))
+                pieces.append(piece)
+            if (i != me and counts[me][i] != 0):
+                requests.append(self.peers.Isend(local[bounds[i]: bounds[i + 1]], dest=rank))
+        MPI.Request.Waitall(requests)
+        # buckets are sorted runs, a stable sort merges them
+        run = np.sort(np.concatenate(pieces), kind="stable")
+        self.runs[key] = (local, run)
+        self.sort_run  = len(run)
+
+    def sort_place(self, key, plan):
+        """
+        Moves the sorted runs to their final place in the blocks of the array
+
+        Params:
+            :key  -- int: key (id) of array
+            :plan -- [(int, int, int, int, int)]: [(source, dest, run start, local start, length)]
+        """
+
+        local, run = self.runs.pop(key)
+        me       = self.comm.Get_rank()
+        requests = []
+        for source, dest, run_start, local_start, length in plan:
+            if (source == me and dest == me):
+                local[local_start: local_start + length] = run[run_start: run_start + length]
+            elif (source == me):
+                requests.append(self.peers.Isend(run[run_start: run_start + length], dest=dest))
+            elif (dest == me):
+                requests.append(self.peers.Irecv(local[local_start: local_start + length], source=source))
+        MPI.Request.Waitall(requests)
+        self.memory.write(key, 0, len(local), 1, local)
+        self.touch(key)
+
+    def sort(self, key, phase, args):
+        """
+        Runs one phase of a distributed sort
+
+        Params:
+            :key   -- int: key (id) of array
+            :phase -- str: sample, split, exchange or place
+            :args  -- (...): arguments of the phase
+
+        Return:
+            :val   -- any: result of the phase sent back to the master
+        """
+
+        if (phase == "sample"):
+            return self.sort_sample(key, *args)
+        elif (phase == "split"):
+            return self.sort_split(key, *args)
+        elif (phase == "exchange"):
+            return self.sort_exchange(key, *args)
+        elif (phase == "place"):
+            return self.sort_place(key, *args)
+
+    def generate(self, key, kind, args, ranges):
+        """
+        Fills blocks of an array, one page at a time
+
+        Params:
+            :key    -- int: key (id) of array
+            :kind   -- str: fill, arange or random (see master.generators)
+            :args   -- (...): (value, ), (start, step) or (seed, low, high)
+            :ranges -- [(int, int, int)]: [(start, local start, length)]
+
+        Return:
+            :status -- int: 0 if successful, -3 if the arguments are invalid
+        """
+
+        dtype = self.memory.dtype(key)
+        try:
+            for start, local_start, length in ranges:
+                for shift in range(0, length, page_size):
+                    first = start + shift
+                    last  = start + min(length, shift + page_size)
+                    if (kind == "fill"):
+                        values = args[0]
+                    elif (kind == "arange"):
+                        values = (args[0] + np.arange(first, last) * args[1]).astype(dtype)
+                    else:
+                        values = random_values(args[0], args[1], args[2], first, last, dtype)
+                    self.memory.write(key, local_start + shift, local_start + shift + last - first, 1, values)
+        except (TypeError, ValueError, OverflowError):
+            return -3
+        self.touch(key)
+        return 0
+
+    def load(self, key, path, dtype, ranges):
+        """
+        Reads blocks of an array from a binary array file
+
+        Params:
+            :key    -- int: key (id) of array
+            :path   -- str: path of the file
+            :dtype  -- str: numpy dtype string of the elements in the file
+            :ranges -- [(int, int, int)]: [(file start, local start, length)]
+
+        Return:
+            :status -- int: 0 if successful, -4 if the file could not be read
+        """
+
+        try:
+            for start, local_start, length in ranges:
+                self.memory.write(key, local_start, local_start + length, 1,
+                                  binfile.open_range(path, dtype, start, length))
+        except (OSError, ValueError):
+            return -4
+        self.touch(key)
+        return 0
+
+    def dump(self, key, path, dtype, ranges):
+        """
+        Writes blocks of an array to a binary array file created by the master
+
+        Params:
+            :key    -- int: key (id) of array
+            :path   -- str: path of the file
+            :dtype  -- str: numpy dtype string of the elements in the file
+            :ranges -- [(int, int, int)]: [(file start, local start, length)]
+
+        Return:
+            :status -- int: 0 if successful, -4 if the file could not be written
+        """
+
+        try:
+            for start, local_start, length in ranges:
+                mapped = binfile.open_range(path, dtype, start, length, "r+")
+                self.memory.read(key, local_start, local_start + length, out=mapped)
+                mapped.flush()
+        except (OSError, ValueError):
+            return -4
+        return 0
+
+    def checkpoint_paths(self, directory):
+        """
+        Gets the checkpoint files of the slave
+
+        Params:
+            :directory -- str: checkpoint directory
+
+        Return:
+            :data      -- str: path of the raw arrays, one after the other
+            :index     -- str: path of the index {key: (dtype, byte offset, size)}
+        """
+
+        name = os.path.join(directory, "slave-{}".format(self.rank))
+        return name + ".data", name + ".index"
+
+    def checkpoint(self, directory, incremental):
+        """
+        Writes all arrays of the slave to its checkpoint files
+            an incremental checkpoint in the directory of the last checkpoint only
+            writes dirty pages of arrays already in it, new arrays are appended
+
+        Params:
+            :directory   -- str: checkpoint directory
+            :incremental -- bool: only write what changed since the last checkpoint
+
+        Return:
+            :status      -- int: 0 if successful, -4 if the files could not be written
+        """
+
+        data_path, index_path = self.checkpoint_paths(directory)
+        # the clients write the arrays of the window without the slave knowing
+        for key in self.memory.keys():
+            if (self.memory.offset(key) is not None):
+                self.touch(key)
+        previous = {}
+        end      = 0
+        try:
+            if (incremental and self.checkpointed == directory and os.path.exists(index_path)):
+                with open(index_path, "rb") as f:
+                    previous, end = pickle.load(f)
+            else:
+                open(data_path, "wb").close()
+
+            index = {}
+            with open(data_path, "r+b") as f:
+                for key in self.memory.keys():
+                    dtype = self.memory.dtype(key)
+                    size  = self.memory.size(key)
+                    entry = previous.get(key)
+                    if (entry is not None and entry[0] == dtype.str and entry[2] == size):
+                        offset = entry[1]
+                        pages  = np.flatnonzero(self.dirty[key])
+                    else:
+                        offset = end
+                        pages  = range(page_count(size))
+                        end   += size * dtype.itemsize
+                    for page in pages:
+                        f.seek(offset + int(page) * page_size * dtype.itemsize)
+                        self.memory.peek(key, page).tofile(f)
+                    index[key] = (dtype.str, offset, size)
+
+            # index is replaced last so that a failed checkpoint keeps the previous one
+            with open(index_path + ".tmp", "wb") as f:
+                pickle.dump((index, end), f)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError:
+            return -4
+
+        for pages in self.dirty.values():
+            pages[:] = False
+        self.checkpointed = directory
+        return 0
+
+    def restore(self, directory):
+        """
+        Reads all arrays of the slave from its checkpoint files
+
+        Params:
+            :directory -- str: checkpoint directory
+        """
+
+        data_path, index_path = self.checkpoint_paths(directory)
+        with open(index_path, "rb") as f:
+            index, _ = pickle.load(f)
+        for key, (dtype, offset, size) in index.items():
+            self.memory.malloc(key, size, dtype)
+            if (size > 0):
+                data = np.memmap(data_path, dtype=dtype, mode="r", offset=offset, shape=(size, ))
+                for start in range(0, size, page_size):
+                    self.memory.write(key, start, start + page_size, 1, data[start: start + page_size])
+            self.dirty[key] = np.zeros(page_count(size), dtype=bool)
+        self.checkpointed = directory
+        # restoring is not an access of the working set
+        self.memory.hits   = 0
+        self.memory.misses = 0
+
+    def resize(self, key, size):
+        """
+        Grows an array with zeros or cuts its end
+
+        Params:
+            :key  -- int: key (id) of array
+            :size -- int: new local size
+        """
+
+        old = self.memory.size(key)
+        self.memory.resize(key, size)
+        dirty = np.ones(page_count(size), dtype=bool)
+        # pages before the one holding the old end are unchanged
+        kept  = min(old, size) // page_size
+        dirty[:kept] = self.dirty[key][:kept]
+        self.dirty[key] = dirty
+
+    def migrate(self, key, peer, send, size, dtype=None):
+        """
+        Moves the end of the local part of an array to another slave, page by page.
+            the sender keeps its first size elements, the receiver allocates the moved ones
+
+        Params:
+            :key   -- int: key (id) of array
+            :peer  -- int: rank of the other slave
+            :send  -- bool: send to peer, receive from peer otherwise
+            :size  -- int: number of elements kept by the sender, or received
+            :dtype -- str: numpy dtype string of the elements received
+
+        Return:
+            :status -- int: 0 once the elements are moved
+        """
+
+        if (send):
+            for start in range(size, self.memory.size(key), page_size):
+                self.peers.Send(self.memory.read(key, start, start + page_size), dest=peer)
+            if (size == 0):
+                self.delitem(key)
+            else:
+                self.resize(key, size)
+            return 0
+
+        self.malloc(key, size, dtype)
+        for start in range(0, size, page_size):
+            page = np.empty(min(page_size, size - start), dtype=dtype)
+            self.peers.Recv(page, source=peer)
+            self.memory.write(key, start, start + len(page), 1, page)
+        return 0
+
+    def copy(self, plan, reverse):
+        """
+        Copies slices of arrays, slave to slave or locally, page by page.
+            a part with a source and a target is a local copy, a part with a source
+            is sent to peer, a part with a target is received from peer
+
+        Params:
+            :plan    -- [([int, int, int, int], [int, int, int, int], int, str)]:
+                        [(source [key, start, stop, step] or None, target or None, rank of the peer, dtype of the source)]
+            :reverse -- bool: copy the parts from their end
+
+        Return:
+            :count   -- int: number of elements written
+        """
+
+        count = 0
+        for source, target, peer, dtype in plan:
+            if (target is None):
+                for start, stop, step in chunks(source, reverse):
+                    self.peers.Send(self.memory.read(source[0], start, stop, step), dest=peer)
+                self.traffic[source[0]] = self.traffic.get(source[0], 0) + len(range(*source[1:]))
+                continue
+
+            writes = chunks(target, reverse)
+            reads  = [None] * len(writes) if (source is None) else chunks(source, reverse)
+            for read, (start, stop, step) in zip(reads, writes):
+                if (read is None):
+                    value = np.empty(len(range(start, stop, step)), dtype=dtype)
+                    self.peers.Recv(value, source=peer)
+                else:
+                    value = self.memory.read(source[0], *read)
+                    if (source[0] == target[0]):
+                        # a view of a page may be overwritten by the first pages written
+                        value = value.copy()
+                self.touch(target[0], start, stop)
+                self.memory.write(target[0], start, stop, step, value)
+            written = len(range(*target[1:]))
+            for key in ([target[0]] if (source is None) else [source[0], target[0]]):
+                self.traffic[key] = self.traffic.get(key, 0) + written
+            count += written
+        return count
 
     def delitem(self, key):
         """
@@ -52,7 +793,10 @@ class Slave:
             :key -- int: key (id) of array
         """
         
-        del self.memory[key]
+        self.memory.delete(key)
+        del self.dirty[key]
+        self.generations.pop(key, None)
+        self.traffic.pop(key, None)
 
     def speak(self, request, verbose):
         """
@@ -67,8 +811,9 @@ class Slave:
                 print("Slave {}:\tclosing".format(self.rank))
         if verbose >= 2:
             if request[0] == 1:
-                print("Slave {}:\tmalloc of size {} for key {}".format(self.rank,
+                print("Slave {}:\tmalloc of size {} ({}) for key {}".format(self.rank,
                     request[2],
+                    request[3],
                     request[1]))
             elif request[0] == 2:
                 print("Slave {}:\tget item {}".format(self.rank, request[1]))
@@ -76,6 +821,40 @@ class Slave:
                 print("Slave {}:\tset item {}".format(self.rank, request[1]))
             elif request[0] == 4:
                 print("Slave {}:\tdel item {}".format(self.rank, request[1]))
+            elif request[0] == 7:
+                print("Slave {}:\t{} of item {}".format(self.rank, request[2], request[1]))
+            elif request[0] == 8:
+                print("Slave {}:\tsort {} of {}".format(self.rank, request[2], request[1]))
+            elif request[0] == 9:
+                print("Slave {}:\tload {} from {}".format(self.rank, request[1], request[2]))
+            elif request[0] == 10:
+                print("Slave {}:\tdump {} to {}".format(self.rank, request[1], request[2]))
+            elif request[0] == 11:
+                print("Slave {}:\tcheckpoint to {}".format(self.rank, request[1]))
+            elif request[0] == 12:
+                print("Slave {}:\tstats".format(self.rank))
+            elif request[0] == 13:
+                print("Slave {}:\t{} {}".format(self.rank, request[2], request[1]))
+            elif request[0] == 15:
+                print("Slave {}:\tresize {} to {}".format(self.rank, request[1], request[2]))
+            elif request[0] == 16:
+                print("Slave {}:\tmigrate {} {} {}".format(self.rank, request[1],
+                    "to" if (request[3]) else "from",
+                    request[2]))
+            elif request[0] == 17:
+                print("Slave {}:\ttraffic".format(self.rank))
+            elif request[0] == 18:
+                print("Slave {}:\tgather {} indexes of {}".format(self.rank, request[2], request[1]))
+            elif request[0] == 19:
+                print("Slave {}:\tscatter {} indexes of {}".format(self.rank, request[2], request[1]))
+            elif request[0] == 20:
+                print("Slave {}:\t{} of item {}".format(self.rank, request[2], request[1]))
+            elif request[0] == 21:
+                print("Slave {}:\tcopy of {} parts".format(self.rank, len(request[1])))
+            elif request[0] == 22:
+                print("Slave {}:\twindow offsets of {}".format(self.rank, request[1]))
+            elif request[0] == 23:
+                print("Slave {}:\tgeneration {} of {}".format(self.rank, request[2], request[1]))
 
     def run(self, verbose):
         """
@@ -85,19 +864,92 @@ class Slave:
             :verbose -- int: level of verbose
         """
  
+        status = MPI.Status()
+        req    = None
         while True:
-            req = self.comm.recv(source=1)
+            begin = time.perf_counter()
+            if (req is not None):
+                self.stats.record(req[0], begin - received)
+            # requests come from the master or directly from a client
+            req      = next_request(self.comm, status, self.outbox.test, self.outbox.busy)
+            received = time.perf_counter()
+            self.stats.idle += received - begin
+            source   = status.Get_source()
+            tag      = status.Get_tag()
             self.speak(req, verbose)
+            if (req[0] not in reads):
+                self.outbox.flush()
             if req[0] == 0:
+                self.memory.close()
                 break
             elif req[0] == 1:
-                self.malloc(req[1], req[2])
+                self.malloc(req[1], req[2], req[3])
             elif req[0] == 2:
-                val = self.getitem(req[1])
-                self.comm.send(val, dest=1)
+                val = self.getitem(req[1], req[3])
+                if (val is None):
+                    # an empty response makes the client refresh its block maps
+                    val = np.empty(0, dtype=np.uint8)
+                elif (req[2] is not None):
+                    val = encode(val, req[2])
+                self.outbox.send(val, source, tag)
+                self.stats.bytes_out += val.nbytes
             elif req[0] == 3:
-                self.setitem(req[1], req[2])
+                val = self.setitem(req[1], req[2], source, tag, req[3], req[4])
+                if (source != self.master):
+                    self.outbox.send(acknowledgement(val), source, tag)
             elif req[0] == 4:
                 self.delitem(req[1])
+            elif req[0] == 7:
+                val = self.reduce(req[1], req[2], req[3])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 8:
+                val = self.sort(req[1], req[2], req[3:])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 9:
+                val = self.load(req[1], req[2], req[3], req[4])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 10:
+                val = self.dump(req[1], req[2], req[3], req[4])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 11:
+                val = self.checkpoint(req[1], req[2])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 12:
+                val = self.stats.summary()
+                val["store"] = self.memory.stats()
+                val["sort_run"] = self.sort_run
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 13:
+                val = self.generate(req[1], req[2], req[3], req[4])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 15:
+                self.resize(req[1], req[2])
+            elif req[0] == 16:
+                val = self.migrate(*req[1:])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 17:
+                self.comm.send(self.traffic, dest=source, tag=tag)
+                self.traffic = {}
+            elif req[0] == 18:
+                val = self.gather(req[1], req[2], source, tag, req[3])
+                self.outbox.send(val, source, tag)
+                self.stats.bytes_out += val.nbytes
+            elif req[0] == 19:
+                val = self.scatter(req[1], req[2], req[3], source, tag, req[4])
+                if (source != self.master):
+                    self.outbox.send(acknowledgement(val), source, tag)
+            elif req[0] == 20:
+                # the response is sent once the update is applied, readers after it see the update
+                val = self.update(req[1], req[2], req[3], req[4], source, tag, req[5])
+                self.outbox.send(val, source, tag)
+                self.stats.bytes_out += val.nbytes
+            elif req[0] == 21:
+                val = self.copy(req[1], req[2])
+                self.comm.send(val, dest=source, tag=tag)
+            elif req[0] == 22:
+                self.comm.send([self.memory.offset(key) for key in req[1]], dest=source, tag=tag)
+            elif req[0] == 23:
+                self.generations[req[1]] = req[2]
+                self.memory.stamp(req[1], req[2])
 
 
@@ -0,0 +1,168 @@
+import math
+import resource
+import time
+
+import numpy as np
+
+"""
+Counters and latency histograms of a machine:
+    durations are appended to a list by the main loop and folded in batches
+    into histograms of buckets of powers of two microseconds
+"""
+
+# bucket i counts latencies in [2^(i-1), 2^i) microseconds
+buckets = 40
+# number of durations recorded before they are folded into the histograms
+batch = 4096
+
+opcodes = {0: "close", 1: "malloc", 2: "get", 3: "set", 4: "delete", 5: "locate",
+           6: "placements", 7: "reduce", 8: "sort", 9: "load", 10: "dump",
+           11: "checkpoint", 12: "stats", 13: "generate", 14: "malloc_many",
+           15: "realloc", 16: "rebalance", 17: "traffic", 18: "gather",
+           19: "scatter", 20: "update", 21: "copy", 22: "window",
+           23: "generation"}
+
+
+def bucket(seconds):
+    """
+    Gets the histogram buckets of latencies
+
+    Params:
+        :seconds -- ndarray: latencies
+
+    Return:
+        :bucket  -- ndarray: index of the bucket of each latency
+    """
+
+    micros = np.maximum(seconds * 1e6, 1)
+    return np.minimum(buckets - 1, np.floor(np.log2(micros)).astype(np.int64) + (seconds * 1e6 >= 1))
+
+
+def percentile(histogram, fraction):
+    """
+    Estimates a percentile from a histogram
+
+    Params:
+        :histogram -- ndarray: counts of each bucket
+        :fraction  -- float: fraction of the latencies below the percentile
+
+    Return:
+        :micros    -- int: upper bound of the bucket of the percentile in microseconds
+    """
+
+    rank  = math.ceil(int(histogram.sum()) * fraction)
+    total = 0
+    for i, count in enumerate(histogram):
+        total += count
+        if (count and total >= rank):
+            return 1 << i
+    return 0
+
+
+class Timer:
+    """
+    Histogram of the durations of one kind of work
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.histogram = np.zeros(buckets, dtype=np.int64)
+
+    def add(self, seconds):
+        """
+        Records durations
+
+        Params:
+            :seconds -- ndarray: durations
+        """
+
+        self.count += len(seconds)
+        self.total += float(seconds.sum())
+        self.histogram += np.bincount(bucket(seconds), minlength=buckets)
+
+    def summary(self):
+        """
+        Gets the counters of the timer
+
+        Return:
+            :summary -- {str: number}: count, total seconds, mean, p50 and p99 in microseconds
+        """
+
+        return {"count": self.count, "seconds": self.total,
+                "mean_us": self.total / self.count * 1e6 if (self.count) else 0.0,
+                "p50_us": percentile(self.histogram, 0.5), "p99_us": percentile(self.histogram, 0.99)}
+
+
+class Stats:
+    def __init__(self):
+        self.created = time.perf_counter()
+        # service time of each opcode
+        self.ops = {}
+        # named parts of the work, e.g. split_request
+        self.timers = {}
+        # (opcode or part name, seconds) not folded yet
+        self.samples = []
+        # time spent waiting for a request
+        self.idle = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, op, seconds):
+        """
+        Records the service time of a request
+
+        Params:
+            :op      -- int: opcode
+            :seconds -- float: service time
+        """
+
+        self.samples.append((op, seconds))
+        if (len(self.samples) >= batch):
+            self.fold()
+
+    def time(self, name, seconds):
+        """
+        Records the duration of a named part of the work
+
+        Params:
+            :name    -- str: name of the part
+            :seconds -- float: duration
+        """
+
+        self.samples.append((name, seconds))
+        if (len(self.samples) >= batch):
+            self.fold()
+
+    def fold(self):
+        """
+        Adds the recorded durations to the histograms
+        """
+
+        groups = {}
+        for name, seconds in self.samples:
+            groups.setdefault(name, []).append(seconds)
+        self.samples = []
+        for name, durations in groups.items():
+            timers = self.timers if (type(name) == str) else self.ops
+            if (name not in timers):
+                timers[name] = Timer()
+            timers[name].add(np.array(durations))
+
+    def summary(self):
+        """
+        Gets all counters
+
+        Return:
+            :summary -- {str: any}: uptime, busy fraction, bytes, peak resident memory in KB,
+                                    opcode and timer summaries
+        """
+
+        self.fold()
+        uptime = time.perf_counter() - self.created
+        return {"uptime": uptime, "idle": self.idle,
+                "busy": 1 - self.idle / uptime if (uptime) else 0.0,
+                "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                "ops": {opcodes.get(op, str(op)): timer.summary() for op, timer in self.ops.items()},
+                "timers": {name: timer.summary() for name, timer in self.timers.items()}}
@@ -0,0 +1,464 @@
+from collections import OrderedDict
+import os
+import tempfile
+
+import numpy as np
+
+"""
+Paged storage of the arrays of a slave:
+    arrays are split in pages of page_size elements, at most ram_size elements
+    of pages are kept in RAM, cold pages chosen by CLOCK are evicted to a memory
+    mapped spill file per array on local disk and read back on the next access,
+    with an arena the arrays are placed contiguously in the window of the slave
+    (see window.Arena), their pages are views of it which are never evicted
+"""
+
+# number of elements of a page
+page_size = 65536
+
+
+def page_count(size):
+    """
+    Gets the number of pages of an array
+
+    Params:
+        :size  -- int: number of elements
+
+    Return:
+        :count -- int: number of pages
+    """
+
+    return (size + page_size - 1) // page_size
+
+
+def page_spans(start, stop, step):
+    """
+    Splits a slice along pages
+
+    Params:
+        :start -- int: first index
+        :stop  -- int: last index (excluded)
+        :step  -- int: step of the slice
+
+    Return:
+        :spans -- [(int, int, int, int)]: [(page, first index in page, last index in page, first output index)]
+    """
+
+    spans = []
+    index = start
+    while (index < stop):
+        page   = index // page_size
+        offset = page * page_size
+        end    = min(stop, offset + page_size)
+        spans.append((page, index - offset, end - offset, (index - start) // step))
+        # first index of the slice in the next page
+        index += ((end - index + step - 1) // step) * step
+    return spans
+
+
+class Store:
+    def __init__(self, ram_size, disk_size=0, directory=None, name="slave", arena=None):
+        self.ram_size = ram_size
+        self.disk_size = disk_size
+        self.directory = tempfile.gettempdir() if (directory is None) else directory
+        self.name = name
+        self.dtypes = {}
+        self.sizes = {}
+        # pages of each array, None if the page is on disk
+        self.pages = {}
+        # memory mapped spill file of each array, created on its first eviction
+        self.spills = {}
+        # pages in RAM in CLOCK order with their reference bit
+        self.resident = OrderedDict()
+        # pages whose copy in the spill file is up to date
+        self.clean = set()
+        # window of the slave and byte offset of the arrays placed in it
+        self.arena = arena
+        self.placed = {}
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writebacks = 0
+
+    def __contains__(self, key):
+        return key in self.sizes
+
+    def keys(self):
+        return self.sizes.keys()
+
+    def size(self, key):
+        return self.sizes[key]
+
+    def dtype(self, key):
+        return self.dtypes[key]
+
+    def stamp(self, key, generation):
+        """
+        Sets the generation of an array in its header, if it is in the window
+
+        Params:
+            :key        -- int: array key (id)
+            :generation -- int: generation of the key
+        """
+
+        if (key in self.placed):
+            self.arena.stamp(self.placed[key], key, generation)
+
+    def offset(self, key):
+        """
+        Gets the place of an array in the window
+
+        Params:
+            :key    -- int: array key (id)
+
+        Return:
+            :offset -- int: byte offset of the array in the window, None if it is kept in pages
+        """
+
+        return self.placed.get(key)
+
+    def page_length(self, key, page):
+        """
+        Gets the number of elements of a page, the last page of an array may be shorter
+
+        Params:
+            :key    -- int: array key (id)
+            :page   -- int: page number
+
+        Return:
+            :length -- int: number of elements
+        """
+
+        return min(page_size, self.sizes[key] - page * page_size)
+
+    def malloc(self, key, size, dtype, generation=0):
+        """
+        Allocates an array of zeros, pages are created on their first access
+            or at once in the window if it fits in the arena
+
+        Params:
+            :key        -- int: array key (id)
+            :size       -- int: number of elements
+            :dtype      -- str: numpy dtype string of the elements
+            :generation -- int: generation of the key, written in the header of an array of the window
+        """
+
+        self.dtypes[key] = np.dtype(dtype)
+        self.sizes[key]  = size
+        self.pages[key]  = [None] * page_count(size)
+        nbytes = size * self.dtypes[key].itemsize
+        offset = None if (self.arena is None or size == 0) else self.arena.alloc(nbytes)
+        if (offset is not None):
+            array = self.arena.buffer[offset: offset + nbytes].view(self.dtypes[key])
+            array[:] = 0
+            self.pages[key]  = [array[start: start + page_size] for start in range(0, size, page_size)]
+            self.placed[key] = offset
+            self.used       += size
+            self.arena.stamp(offset, key, generation)
+            self.evict(0)
+
+    def resize(self, key, size):
+        """
+        Grows an array with zeros or cuts its end, in place
+
+        Params:
+            :key  -- int: array key (id)
+            :size -- int: new number of elements
+        """
+
+        old   = self.sizes[key]
+        if (key in self.placed):
+            # the array is placed again, in the window if it still fits
+            dtype      = self.dtypes[key]
+            generation = self.arena.generation(self.placed[key])
+            kept       = np.array(self.read(key, 0, min(old, size)))
+            self.delete(key)
+            self.malloc(key, size, dtype, generation)
+            self.write(key, 0, len(kept), 1, kept)
+            return
+
+        pages = self.pages[key]
+        # pages past the new end are dropped
+        for page in range(page_count(size), len(pages)):
+            if (pages[page] is not None):
+                del self.resident[(key, page)]
+                self.used -= len(pages[page])
+            self.clean.discard((key, page))
+        del pages[page_count(size):]
+        pages.extend([None] * (page_count(size) - len(pages)))
+        self.sizes[key] = size
+
+        spill = self.spills.pop(key, None)
+        if (spill is not None):
+            # the spill file is cut or extended with zeros to the new size
+            path = spill.filename
+            del spill
+            os.truncate(path, size * self.dtypes[key].itemsize)
+            if (size > 0):
+                self.spills[key] = np.memmap(path, dtype=self.dtypes[key], mode="r+", shape=(size, ))
+            else:
+                os.remove(path)
+
+        # the page holding the old end changes length
+        page = (min(old, size) - 1) // page_size
+        if (0 <= page < len(pages) and pages[page] is not None):
+            frame = np.zeros(self.page_length(key, page), dtype=self.dtypes[key])
+            kept  = min(len(frame), len(pages[page]))
+            frame[:kept] = pages[page][:kept]
+            self.used   += len(frame) - len(pages[page])
+            pages[page]  = frame
+            self.clean.discard((key, page))
+            self.evict(0)
+
+    def delete(self, key):
+        """
+        Deletes an array and its spill file
+
+        Params:
+            :key -- int: array key (id)
+        """
+
+        if (key in self.placed):
+            # no client holding the old header accesses the range once it is released
+            self.arena.stamp(self.placed[key], key, -1)
+            self.arena.release(self.placed.pop(key))
+            self.used -= self.sizes[key]
+            del self.pages[key]
+            del self.dtypes[key]
+            del self.sizes[key]
+            return
+
+        for page, frame in enumerate(self.pages.pop(key)):
+            if (frame is not None):
+                del self.resident[(key, page)]
+                self.used -= len(frame)
+            self.clean.discard((key, page))
+        spill = self.spills.pop(key, None)
+        if (spill is not None):
+            path = spill.filename
+            del spill
+            os.remove(path)
+        del self.dtypes[key]
+        del self.sizes[key]
+
+    def close(self):
+        """
+        Deletes all arrays and their spill files
+        """
+
+        for key in list(self.keys()):
+            self.delete(key)
+
+    def spill_path(self, key):
+        return os.path.join(self.directory, "{}-{}-{}.spill".format(self.name, os.getpid(), key))
+
+    def evict(self, needed):
+        """
+        Evicts pages with CLOCK until needed elements fit in RAM
+            a referenced page gets a second chance and goes back at the end of the clock
+
+        Params:
+            :needed -- int: number of elements to fit
+        """
+
+        while (self.used + needed > self.ram_size and self.resident):
+            victim, referenced = self.resident.popitem(last=False)
+            if (referenced):
+                self.resident[victim] = False
+                continue
+            key, page = victim
+            frame = self.pages[key][page]
+            if (victim not in self.clean):
+                if (key not in self.spills):
+                    self.spills[key] = np.memmap(self.spill_path(key), dtype=self.dtypes[key],
+                                                 mode="w+", shape=(self.sizes[key], ))
+                self.spills[key][page * page_size: page * page_size + len(frame)] = frame
+                self.clean.add(victim)
+                self.writebacks += 1
+            self.pages[key][page] = None
+            self.used      -= len(frame)
+            self.evictions += 1
+
+    def frame(self, key, page):
+        """
+        Gets a page in RAM, reading it from the spill file or creating it on a miss
+
+        Params:
+            :key   -- int: array key (id)
+            :page  -- int: page number
+
+        Return:
+            :frame -- ndarray: elements of the page
+        """
+
+        frame = self.pages[key][page]
+        if (frame is not None):
+            if (key not in self.placed):
+                self.resident[(key, page)] = True
+            self.hits += 1
+            return frame
+        self.misses += 1
+        length = self.page_length(key, page)
+        self.evict(length)
+        if ((key, page) in self.clean):
+            frame = np.array(self.spills[key][page * page_size: page * page_size + length])
+        else:
+            frame = np.zeros(length, dtype=self.dtypes[key])
+        self.pages[key][page]      = frame
+        self.resident[(key, page)] = False
+        self.used                 += length
+        return frame
+
+    def read(self, key, start=0, stop=None, step=1, out=None):
+        """
+        Reads a slice of an array
+
+        Params:
+            :key   -- int: array key (id)
+            :start -- int: first index
+            :stop  -- int: last index (excluded), end of the array if None
+            :step  -- int: step of the slice
+            :out   -- ndarray: array receiving the elements, allocated if None
+
+        Return:
+            :array -- ndarray: contiguous elements, a view of the page if they are in one page
+        """
+
+        stop  = self.sizes[key] if (stop is None) else min(stop, self.sizes[key])
+        spans = page_spans(start, stop, step)
+        if (len(spans) == 1 and out is None):
+            page, first, last, _ = spans[0]
+            return np.ascontiguousarray(self.frame(key, page)[first:last:step])
+        result = np.empty(len(range(start, stop, step)), dtype=self.dtypes[key]) if (out is None) else out
+        for page, first, last, out in spans:
+            values = self.frame(key, page)[first:last:step]
+            result[out: out + len(values)] = values
+        return result
+
+    def write(self, key, start, stop, step, value):
+        """
+        Writes a slice of an array
+
+        Params:
+            :key   -- int: array key (id)
+            :start -- int: first index
+            :stop  -- int: last index (excluded)
+            :step  -- int: step of the slice
+            :value -- scalar or ndarray: value broadcasted or elements of the slice
+        """
+
+        stop   = min(stop, self.sizes[key])
+        scalar = np.ndim(value) == 0
+        for page, first, last, out in page_spans(start, stop, step):
+            frame = self.frame(key, page)
+            view  = frame[first:last:step]
+            view[...] = value if (scalar) else value[out: out + len(view)]
+            self.clean.discard((key, page))
+
+    def page_groups(self, indices):
+        """
+        Groups indexes by page
+
+        Params:
+            :indices -- ndarray: int64 indexes
+
+        Return:
+            :groups  -- [(int, ndarray)]: [(page, positions in indices of the indexes in the page)]
+        """
+
+        pages  = indices // page_size
+        # a stable sort of 16 bits integers is a radix sort
+        order  = np.argsort(pages.astype(np.uint16) if (len(pages) and pages.max() < 65536) else pages, kind="stable")
+        firsts = np.flatnonzero(np.diff(pages[order])) + 1
+        return [(int(pages[positions[0]]), positions) for positions in np.split(order, firsts) if len(positions)]
+
+    def gather(self, key, indices):
+        """
+        Reads the elements of an array at arbitrary indexes, one access per page
+
+        Params:
+            :key     -- int: array key (id)
+            :indices -- ndarray: int64 indexes in [0, size)
+
+        Return:
+            :array   -- ndarray: elements in the order of indices
+        """
+
+        result = np.empty(len(indices), dtype=self.dtypes[key])
+        for page, positions in self.page_groups(indices):
+            result[positions] = self.frame(key, page)[indices[positions] - page * page_size]
+        return result
+
+    def scatter(self, key, indices, value):
+        """
+        Writes the elements of an array at arbitrary indexes, one access per page
+            with repeated indexes the last value is kept
+
+        Params:
+            :key     -- int: array key (id)
+            :indices -- ndarray: int64 indexes in [0, size)
+            :value   -- scalar or ndarray: value broadcasted or one value per index
+        """
+
+        scalar = np.ndim(value) == 0
+        for page, positions in self.page_groups(indices):
+            frame = self.frame(key, page)
+            frame[indices[positions] - page * page_size] = value if (scalar) else value[positions]
+            self.clean.discard((key, page))
+
+    def accumulate(self, key, indices, ufunc, value):
+        """
+        Combines the elements of an array at arbitrary indexes with values, one access per page
+            every repeated index is applied, as with numpy ufunc.at
+
+        Params:
+            :key     -- int: array key (id)
+            :indices -- ndarray: int64 indexes in [0, size)
+            :ufunc   -- numpy ufunc: binary function combining an element and a value
+            :value   -- scalar or ndarray: value broadcasted or one value per index
+        """
+
+        scalar = np.ndim(value) == 0
+        for page, positions in self.page_groups(indices):
+            frame = self.frame(key, page)
+            ufunc.at(frame, indices[positions] - page * page_size, value if (scalar) else value[positions])
+            self.clean.discard((key, page))
+
+    def peek(self, key, page):
+        """
+        Gets a page without loading it in RAM nor counting the access
+
+        Params:
+            :key   -- int: array key (id)
+            :page  -- int: page number
+
+        Return:
+            :frame -- ndarray: elements of the page, read only
+        """
+
+        frame = self.pages[key][page]
+        if (frame is not None):
+            return frame
+        if ((key, page) in self.clean):
+            return self.spills[key][page * page_size: page * page_size + self.page_length(key, page)]
+        return np.zeros(self.page_length(key, page), dtype=self.dtypes[key])
+
+    def stats(self):
+        """
+        Gets the counters of the store
+
+        Return:
+            :stats -- {str: number}: RAM and disk usage, hits, misses and hit rate
+        """
+
+        accesses = self.hits + self.misses
+        return {"ram_size": self.ram_size, "ram_used": self.used,
+                "disk_size": self.disk_size,
+                "disk_used": sum(self.page_length(key, page) for key, page in self.clean
+                                 if self.pages[key][page] is None),
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / accesses if (accesses) else 1.0,
+                "evictions": self.evictions, "writebacks": self.writebacks,
+                "window_size": 0 if (self.arena is None) else len(self.arena.buffer),
+                "window_used": 0 if (self.arena is None) else self.arena.used()}
@@ -0,0 +1,136 @@
+import os
+
+from mpi4py import MPI
+
+"""
+Transfers in flight of the event loops of the master and the slaves:
+    a Transfer gathers the receives of the slave responses of one request, each
+    response is handled as soon as it is received and the reply is sent once
+    they all are, an Outbox holds the buffers being sent until their sends complete,
+    so that a loop serves the next request instead of waiting on a slow peer.
+    Transfers smaller than large_transfer bytes are completed at once: polling from
+    Python costs more than they take
+"""
+
+# bytes from which a transfer progresses in the main loop
+large_transfer = 1 << 20
+# large transfers in flight in the master, each one holds its results in memory
+max_transfers = 4
+
+
+class Transfer:
+    def __init__(self, receives, finish=None):
+        # receive of each response and function handling it once received, or None
+        self.requests = [request for request, _ in receives]
+        self.handlers = [handler for _, handler in receives]
+        self.remaining = len(self.requests)
+        # called once every response is handled
+        self.finish = finish
+
+    def handle(self, indices):
+        """
+        Handles received responses
+
+        Params:
+            :indices -- [int]: indexes of the completed receives
+        """
+
+        for index in indices:
+            if (self.handlers[index] is not None):
+                self.handlers[index]()
+        self.remaining -= len(indices)
+        if (self.remaining == 0 and self.finish is not None):
+            self.finish()
+
+    def test(self):
+        """
+        Handles the responses already received, without blocking
+
+        Return:
+            :done -- bool: True if every response is handled
+        """
+
+        if (self.remaining):
+            indices = MPI.Request.Testsome(self.requests)
+            if (indices):
+                self.handle(indices)
+        return self.remaining == 0
+
+    def wait(self):
+        """
+        Handles the responses in the order they are received, until the last one
+        """
+
+        while (self.remaining):
+            self.handle([MPI.Request.Waitany(self.requests)])
+
+
+class Outbox:
+    def __init__(self, comm):
+        self.comm = comm
+        # sends in flight with their buffer, kept alive until the send completes
+        self.sends = []
+
+    def send(self, buffer, dest, tag=0):
+        """
+        Sends a raw buffer, a large buffer is only started
+
+        Params:
+            :buffer -- ndarray: elements to send, must not be modified until the send completes
+            :dest   -- int: rank of the receiver
+            :tag    -- int: tag of the message
+        """
+
+        if (buffer.nbytes < large_transfer):
+            self.comm.Send(buffer, dest=dest, tag=tag)
+        else:
+            self.sends.append((self.comm.Isend(buffer, dest=dest, tag=tag), buffer))
+
+    def busy(self):
+        """
+        Return:
+            :busy -- bool: True while buffers are being sent
+        """
+
+        return bool(self.sends)
+
+    def test(self):
+        """
+        Drops the completed sends, without blocking
+        """
+
+        self.sends = [(request, buffer) for request, buffer in self.sends if not request.Test()]
+
+    def flush(self):
+        """
+        Waits for every send in flight
+        """
+
+        MPI.Request.Waitall([request for request, _ in self.sends])
+        self.sends = []
+
+
+def next_request(comm, status, progress, busy):
+    """
+    Receives the next request of an event loop
+        while transfers are in flight they progress between probes,
+        otherwise the loop blocks in recv
+
+    Params:
+        :comm     -- MPI.Comm: communicator
+        :status   -- MPI.Status: filled with the source and tag of the request
+        :progress -- function: handles the transfers that completed, without blocking
+        :busy     -- function: True while transfers are in flight
+
+    Return:
+        :request  -- (...): request message
+    """
+
+    while (busy()):
+        message = comm.improbe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status)
+        if (message is not None):
+            return message.recv()
+        progress()
+        # leave the core to the peers on an oversubscribed node
+        os.sched_yield()
+    return comm.recv(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG, status=status)
@@ -0,0 +1,316 @@
+from mpi4py import MPI
+import numpy as np
+
+"""
+One-sided access to the arrays of the slaves:
+    every slave allocates a shared memory window at launch and places its arrays
+    contiguously in it, clients read and write them with Get and Put, or with plain
+    copies when the slave runs on the same node, without waking the slave loop.
+    Arrays that do not fit in the window are kept in pages and served by messages.
+    Each array is preceded in the window by a header holding its slave key and
+    generation: the slave rewrites it under an exclusive lock of its window when
+    the master bumps the generation, before the layout changes, and clients check
+    it under a shared lock before reading or writing the array
+"""
+
+# bytes of the window of a slave per element of max_size
+window_itemsize = 8
+# alignment in bytes of the arrays in a window
+alignment = 64
+# bytes of the header preceding each array in a window, (slave key, generation) as int64
+header_size = alignment
+
+
+def open_window(nbytes):
+    """
+    Allocates the windows of all ranks, collective over COMM_WORLD
+        ranks of one node share one window, a window over COMM_WORLD
+        is only created if the ranks span several nodes
+
+    Params:
+        :nbytes -- int: bytes exposed by this rank, 0 for the clients and the master
+
+    Return:
+        :node   -- MPI.Comm: ranks on the node of this rank
+        :shared -- MPI.Win: shared memory window of the node
+        :world  -- MPI.Win: window of all ranks, None on a single node
+    """
+
+    node   = MPI.COMM_WORLD.Split_type(MPI.COMM_TYPE_SHARED)
+    shared = MPI.Win.Allocate_shared(nbytes, 1, comm=node)
+    world  = None
+    if (node.Get_size() < MPI.COMM_WORLD.Get_size()):
+        world = MPI.Win.Create(shared.tomemory() if (nbytes) else None, 1, comm=MPI.COMM_WORLD)
+    return node, shared, world
+
+
+class Arena:
+    def __init__(self, shared, world=None):
+        # windows of the slave and its rank in each of them, locked while a header is written
+        self.windows = [(shared, shared.Get_group().Get_rank())]
+        if (world is not None):
+            self.windows.append((world, MPI.COMM_WORLD.Get_rank()))
+        # bytes of the window of the slave
+        self.buffer = np.frombuffer(shared.tomemory(), dtype=np.uint8)
+        # free ranges [(byte offset, bytes)] sorted by offset
+        self.free = [(0, len(self.buffer))]
+        # bytes of each allocated range by offset
+        self.ranges = {}
+
+    def alloc(self, nbytes):
+        """
+        Allocates a range of the window with first fit, after room for its header
+
+        Params:
+            :nbytes -- int: bytes of the range
+
+        Return:
+            :offset -- int: byte offset of the range, None if no free range is large enough
+        """
+
+        nbytes = header_size + (nbytes + alignment - 1) // alignment * alignment
+        for i, (offset, size) in enumerate(self.free):
+            if (size >= nbytes):
+                if (size == nbytes):
+                    del self.free[i]
+                else:
+                    self.free[i] = (offset + nbytes, size - nbytes)
+                self.ranges[offset] = nbytes
+                return offset + header_size
+        return None
+
+    def release(self, offset):
+        """
+        Frees a range of the window, merged with its free neighbours
+
+        Params:
+            :offset -- int: byte offset of the range
+        """
+
+        offset -= header_size
+        nbytes  = self.ranges.pop(offset)
+        i = 0
+        while (i < len(self.free) and self.free[i][0] < offset):
+            i += 1
+        if (i < len(self.free) and offset + nbytes == self.free[i][0]):
+            nbytes += self.free.pop(i)[1]
+        if (i > 0 and self.free[i - 1][0] + self.free[i - 1][1] == offset):
+            offset, size = self.free.pop(i - 1)
+            nbytes += size
+            i -= 1
+        self.free.insert(i, (offset, nbytes))
+
+    def used(self):
+        return sum(self.ranges.values())
+
+    def stamp(self, offset, key, generation):
+        """
+        Writes the header of an array, once no client accesses the window of the slave
+
+        Params:
+            :offset     -- int: byte offset of the array
+            :key        -- int: key of the array on the slave
+            :generation -- int: generation of the key
+        """
+
+        for win, rank in self.windows:
+            win.Lock(rank, MPI.LOCK_EXCLUSIVE)
+        self.buffer[offset - header_size: offset].view(np.int64)[:2] = (key, generation)
+        for win, rank in self.windows[::-1]:
+            win.Unlock(rank)
+
+    def generation(self, offset):
+        """
+        Gets the generation written in the header of an array
+
+        Params:
+            :offset     -- int: byte offset of the array
+
+        Return:
+            :generation -- int: generation of the key of the array
+        """
+
+        return int(self.buffer[offset - header_size: offset].view(np.int64)[1])
+
+
+class Window:
+    def __init__(self, node, shared, world=None):
+        self.shared = shared
+        self.world = world
+        # rank in the node of the slaves on the node of the client
+        ranks = MPI.Group.Translate_ranks(MPI.COMM_WORLD.Get_group(), range(MPI.COMM_WORLD.Get_size()),
+                                          node.Get_group())
+        self.local = {rank: local for rank, local in enumerate(ranks) if local != MPI.UNDEFINED}
+        # copy the segments of the slaves of the node with numpy, Get and Put otherwise
+        self.load_store = True
+        # bytes of the window of each slave of the node
+        self.segments = {}
+        # buffers and datatypes of the transfers in flight, kept until the windows are unlocked
+        self.pending = []
+
+    def segment(self, rank):
+        """
+        Gets the window of a slave of the node as bytes
+
+        Params:
+            :rank    -- int: rank of the slave
+
+        Return:
+            :segment -- ndarray: uint8 view of the window of the slave
+        """
+
+        if (rank not in self.segments):
+            memory, _ = self.shared.Shared_query(self.local[rank])
+            self.segments[rank] = np.frombuffer(memory, dtype=np.uint8)
+        return self.segments[rank]
+
+    def elements(self, rank, offset, dtype, start, stop, step):
+        """
+        Gets a slice of an array of a slave of the node
+
+        Params:
+            :rank   -- int: rank of the slave
+            :offset -- int: byte offset of the array in the window
+            :dtype  -- numpy dtype: type of the elements
+            :start  -- int: first index
+            :stop   -- int: last index (excluded)
+            :step   -- int: step of the slice
+
+        Return:
+            :view   -- ndarray: view of the slice in the window
+        """
+
+        return self.segment(rank)[offset: offset + stop * dtype.itemsize].view(dtype)[start:stop:step]
+
+    def place(self, rank):
+        """
+        Gets the window holding the memory of a slave
+
+        Params:
+            :rank -- int: rank of the slave
+
+        Return:
+            :win  -- MPI.Win: shared window if the slave is on the node of the client, world window otherwise
+            :rank -- int: rank of the slave in the window
+        """
+
+        return (self.shared, self.local[rank]) if (rank in self.local) else (self.world, rank)
+
+    def lock(self, ranks):
+        """
+        Starts the accesses to the windows of slaves, the slaves wait for them to end to change a header
+
+        Params:
+            :ranks -- [int]: ranks of the slaves
+        """
+
+        for rank in sorted(ranks):
+            win, target = self.place(rank)
+            win.Lock(target, MPI.LOCK_SHARED)
+
+    def unlock(self, ranks):
+        """
+        Ends the accesses to the windows of slaves, the gets and puts are complete once it returns
+
+        Params:
+            :ranks -- [int]: ranks of the slaves
+        """
+
+        for rank in sorted(ranks):
+            win, target = self.place(rank)
+            win.Unlock(target)
+        for item in self.pending:
+            if (isinstance(item, MPI.Datatype)):
+                item.Free()
+        self.pending = []
+
+    def header(self, rank, offset):
+        """
+        Reads the header of an array of a slave, its window must be locked
+
+        Params:
+            :rank   -- int: rank of the slave
+            :offset -- int: byte offset of the array in the window
+
+        Return:
+            :key        -- int: key of the array on the slave
+            :generation -- int: generation of the key
+        """
+
+        if (self.load_store and rank in self.local):
+            header = self.segment(rank)[offset - header_size: offset].view(np.int64)
+        else:
+            header = np.empty(2, dtype=np.int64)
+            win, target = self.place(rank)
+            win.Get([header, MPI.BYTE], target, (offset - header_size, header.nbytes, MPI.BYTE))
+            win.Flush(target)
+        return int(header[0]), int(header[1])
+
+    def target(self, rank, offset, dtype, start, stop, step):
+        """
+        Gets the window and the target of a slice
+
+        Params:
+            :rank   -- int: rank of the slave
+            :offset -- int: byte offset of the array in the window
+            :dtype  -- numpy dtype: type of the elements
+            :start  -- int: first index
+            :stop   -- int: last index (excluded)
+            :step   -- int: step of the slice
+
+        Return:
+            :win    -- MPI.Win: window holding the slave memory
+            :rank   -- int: rank of the slave in the window
+            :target -- (int, int, MPI.Datatype): (byte displacement, count, datatype)
+        """
+
+        win, rank = self.place(rank)
+        count     = len(range(start, stop, step))
+        if (step == 1):
+            return win, rank, (offset + start * dtype.itemsize, count * dtype.itemsize, MPI.BYTE)
+        datatype = MPI.BYTE.Create_vector(count, dtype.itemsize, step * dtype.itemsize).Commit()
+        self.pending.append(datatype)
+        return win, rank, (offset + start * dtype.itemsize, 1, datatype)
+
+    def get(self, rank, offset, out, start, stop, step):
+        """
+        Reads a slice of an array of a slave, complete once its window is unlocked
+
+        Params:
+            :rank   -- int: rank of the slave
+            :offset -- int: byte offset of the array in the window
+            :out    -- ndarray: contiguous array receiving the elements
+            :start  -- int: first index
+            :stop   -- int: last index (excluded)
+            :step   -- int: step of the slice
+        """
+
+        if (self.load_store and rank in self.local):
+            out[...] = self.elements(rank, offset, out.dtype, start, stop, step)
+            return
+        win, rank, target = self.target(rank, offset, out.dtype, start, stop, step)
+        win.Get([out, MPI.BYTE], rank, target)
+        self.pending.append(out)
+
+    def put(self, rank, offset, dtype, start, stop, step, value):
+        """
+        Writes a slice of an array of a slave, complete once its window is unlocked
+
+        Params:
+            :rank   -- int: rank of the slave
+            :offset -- int: byte offset of the array in the window
+            :dtype  -- numpy dtype: type of the elements
+            :start  -- int: first index
+            :stop   -- int: last index (excluded)
+            :step   -- int: step of the slice
+            :value  -- scalar or ndarray: value broadcasted or contiguous elements of the slice
+        """
+
+        if (self.load_store and rank in self.local):
+            self.elements(rank, offset, dtype, start, stop, step)[...] = value
+            return
+        if (np.ndim(value) == 0):
+            value = np.full(len(range(start, stop, step)), value, dtype=dtype)
+        win, rank, target = self.target(rank, offset, dtype, start, stop, step)
+        win.Put([value, MPI.BYTE], rank, target)
+        self.pending.append(value)